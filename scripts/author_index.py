@@ -0,0 +1,33 @@
+import sys
+sys.path.insert(0, '../')
+import time
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from sentiment.authors import AUTHOR_INDEX_PATH, AuthorIndex
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the integer-coded author index used for weighted sentiment.")
+    parser.add_argument("--csv", help="seed from authors_data.csv instead of the database")
+    parser.add_argument("--path", default=AUTHOR_INDEX_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = AuthorIndex.load(args.path)
+    before = len(index)
+    if args.csv:
+        changed = 0
+        for chunk in pd.read_csv(args.csv, chunksize=100_000):
+            changed += len(index.update(chunk))
+    else:
+        changed = index.refresh()
+    index.save(args.path)
+    print(f"Author index: {len(index)} authors ({len(index) - before} new, {changed} updated) "
+          f"in {time.perf_counter() - start:.1f}s; watermark {index.watermark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+sys.path.insert(0, '../')
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+from sentiment import benchmark
+
+load_dotenv()
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CPU benchmark of the sentiment models (speed, memory, cold start, quality).")
+    parser.add_argument("--models", nargs="*", default=list(benchmark.MODELS),
+                        help="names from the notebook benchmark, or any cached model id / local directory")
+    parser.add_argument("--variants", default="torch", help=f"comma-separated: {','.join(benchmark.VARIANTS)}")
+    parser.add_argument("--batch-sizes", type=int_list, default=[1, 8, 32])
+    parser.add_argument("--threads", type=int_list, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--max-lengths", type=int_list, default=[64, 128])
+    parser.add_argument("--repeats", type=int, default=benchmark.BENCHMARK_REPEATS)
+    parser.add_argument("--sample", default=benchmark.BENCHMARK_SAMPLE)
+    parser.add_argument("--out", default="../data/results", help="directory for the JSON report")
+    parser.add_argument("--baseline", help="previous report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    parser.add_argument("--f1-tolerance", type=float, default=0.01, help="absolute weighted-F1 drop counted as a regression")
+    args = parser.parse_args()
+
+    variants = [v for v in args.variants.split(",") if v]
+    unknown = [v for v in variants if v not in benchmark.VARIANTS]
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(unknown)}")
+    models = {name: benchmark.MODELS.get(name, name) for name in args.models}
+    configs = list(benchmark.configurations(models, variants, args.batch_sizes, args.threads, args.max_lengths))
+
+    def report(result):
+        if result['status'] != 'ok':
+            print(f"{result['key']}: {result['error']}")
+            return
+        print(f"{result['key']}: {result['texts_per_sec']:.1f} texts/s, "
+              f"p50 {result['latency_ms']['p50']:.1f} ms, p95 {result['latency_ms']['p95']:.1f} ms, "
+              f"cold start {result['cold_start']['total_seconds']:.1f}s, peak RSS {result['rss_mb']['peak']:.0f} MB, "
+              f"F1 {result['quality']['f1_weighted']:.3f}")
+
+    print(f"Benchmarking {len(configs)} configurations")
+    results = benchmark.run(configs, sample=args.sample, repeats=args.repeats, on_result=report)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Report -> {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = benchmark.compare(results, json.load(f), args.tolerance, args.f1_tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['key']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
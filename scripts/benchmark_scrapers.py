@@ -0,0 +1,312 @@
+"""
+Offline benchmark of the scrapers against the synthetic Stocktwits stand-in.
+
+    python benchmark_scrapers.py --workers 1,2,4 --symbols 8 --messages 300 --latency-ms 50
+
+For every worker count the runner creates a fresh database in a disposable
+Postgres cluster (initdb/pg_ctl in a temporary directory, removed at the
+end), seeds it, and runs scraping_tweets, scraping_authors and
+scraping_metrics as the production entry points, in subprocesses pointed at
+the local mock server. Per scraper and worker count it reports items/sec,
+DB round trips per item, time spent sleeping (rate limiter and backoff) and
+the peak memory of the browser processes, and writes a JSON report.
+"""
+import os
+import sys
+sys.path.insert(0, '../')
+import glob
+import json
+import time
+import shutil
+import socket
+import tempfile
+import argparse
+import threading
+import subprocess
+import psycopg2
+from mock_stocktwits import make_server
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CREATE_SQL = os.path.join(SCRIPTS_DIR, 'config', 'sql', 'create.sql')
+
+TICKERS = ['AAPL', 'TSLA', 'NVDA', 'AMZN', 'MSFT', 'META', 'AMD', 'GME', 'SPY', 'QQQ', 'NFLX', 'PLTR']
+
+# script, counter of processed items (name, labels), env var with the number of worker processes
+SCRAPERS = {
+    'tweets': ('scraping_tweets.py', ('posts', {'result': 'new'}), 'MAX_WORKERS'),
+    'authors': ('scraping_authors.py', ('authors', {}), 'MAX_WORKERS'),
+    'metrics': ('scraping_metrics.py', ('post_metrics', {}), 'METRICS_WORKERS'),
+}
+
+# Run before each scraper, on top of the previous one's output
+SEED_SQL = {
+    'authors': "INSERT INTO stocktwits_authors (author) SELECT DISTINCT post_author FROM stocktwits_posts",
+    'metrics': "UPDATE stocktwits_posts SET post_likes = NULL, post_comments = NULL, post_reshares = NULL",
+}
+
+BROWSER_PROCESS_NAMES = ('chrom', 'headless_shell')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def find_pg_bin(explicit=None) -> str:
+    if explicit:
+        return explicit
+    initdb = shutil.which('initdb')
+    if initdb:
+        return os.path.dirname(initdb)
+    candidates = sorted(glob.glob('/usr/lib/postgresql/*/bin/initdb') + glob.glob('/usr/local/opt/postgresql*/bin/initdb'))
+    if not candidates:
+        raise RuntimeError("initdb not found; install PostgreSQL or pass --pg-bin")
+    return os.path.dirname(candidates[-1])
+
+
+class DisposablePostgres:
+    """A throwaway cluster: trust auth on a free localhost port, deleted by close()."""
+
+    def __init__(self, pg_bin=None):
+        self.pg_bin = find_pg_bin(pg_bin)
+        self.port = free_port()
+        self.dir = tempfile.mkdtemp(prefix='bench-pg-')
+        self.data = os.path.join(self.dir, 'data')
+
+    def _run(self, tool, *args):
+        subprocess.run([os.path.join(self.pg_bin, tool), *args], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def start(self):
+        self._run('initdb', '-D', self.data, '-U', 'postgres', '-A', 'trust', '--no-sync')
+        options = f"-p {self.port} -k {self.dir} -c listen_addresses=127.0.0.1"
+        self._run('pg_ctl', '-D', self.data, '-l', os.path.join(self.dir, 'postgres.log'), '-o', options, '-w', 'start')
+        return self
+
+    def connect(self, database='postgres'):
+        conn = psycopg2.connect(host='127.0.0.1', port=self.port, user='postgres', dbname=database)
+        conn.autocommit = True
+        return conn
+
+    def create_database(self, name):
+        """Fresh database `name` with the scrapers' schema."""
+        with self.connect() as conn, conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+            cur.execute(f'CREATE DATABASE "{name}"')
+        conn.close()
+        with open(CREATE_SQL) as f:
+            self.execute(name, f.read())
+
+    def execute(self, database, sql, params=None):
+        conn = self.connect(database)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+        finally:
+            conn.close()
+
+    def env(self, database) -> dict:
+        return {'DB_HOST': '127.0.0.1', 'DB_PORT': str(self.port), 'DB_NAME': database,
+                'DB_USER': 'postgres', 'DB_PASSWORD': ''}
+
+    def close(self):
+        try:
+            self._run('pg_ctl', '-D', self.data, '-m', 'fast', '-w', 'stop')
+        except (subprocess.CalledProcessError, OSError):
+            pass
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _proc_tree():
+    """pid -> (ppid, name, rss MB) of every process (Linux /proc)."""
+    procs = {}
+    for status in glob.glob('/proc/[0-9]*/status'):
+        try:
+            with open(status) as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        rss = fields.get('VmRSS', '0 kB').split()[0]
+        procs[int(status.split('/')[2])] = (int(fields['PPid']), fields['Name'].strip(), int(rss) / 1024)
+    return procs
+
+
+class MemorySampler(threading.Thread):
+    """Peak RSS of a process tree, split into browser processes and the rest (the scraper itself)."""
+
+    def __init__(self, root_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_browser_mb = 0.0
+        self.peak_scraper_mb = 0.0
+        self._done = threading.Event()
+
+    def sample(self):
+        procs = _proc_tree()
+        children = {}
+        for pid, (ppid, _, _) in procs.items():
+            children.setdefault(ppid, []).append(pid)
+        browser = scraper = 0.0
+        stack = [self.root_pid]
+        while stack:
+            pid = stack.pop()
+            if pid in procs:
+                _, name, rss = procs[pid]
+                if any(part in name.lower() for part in BROWSER_PROCESS_NAMES):
+                    browser += rss
+                else:
+                    scraper += rss
+            stack.extend(children.get(pid, []))
+        self.peak_browser_mb = max(self.peak_browser_mb, browser)
+        self.peak_scraper_mb = max(self.peak_scraper_mb, scraper)
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def _counter(report, name, labels):
+    return sum(c['value'] for c in report.get('counters', [])
+               if c['name'] == name and all(c['labels'].get(k) == v for k, v in labels.items()))
+
+
+def _waits(report):
+    waits = {}
+    for h in report.get('histograms', []):
+        if h['name'] == 'wait_seconds':
+            kind = h['labels'].get('kind', '')
+            waits[kind] = waits.get(kind, 0.0) + h['sum']
+    return waits
+
+
+def run_scraper(scraper, workers, env, work_dir) -> dict:
+    script, (item_name, item_labels), workers_var = SCRAPERS[scraper]
+    metrics_dir = os.path.join(work_dir, f"metrics-{scraper}-{workers}")
+    env = dict(env, METRICS_DIR=metrics_dir, **{workers_var: str(workers)})
+    log_path = os.path.join(work_dir, f"{scraper}-{workers}.log")
+
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen([sys.executable, script], cwd=SCRIPTS_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        sampler = MemorySampler(process.pid)
+        sampler.start()
+        returncode = process.wait()
+        sampler.stop()
+    seconds = time.perf_counter() - start
+
+    result = {'scraper': scraper, 'workers': workers, 'seconds': seconds, 'returncode': returncode,
+              'peak_browser_rss_mb': sampler.peak_browser_mb, 'peak_scraper_rss_mb': sampler.peak_scraper_mb}
+    report_path = os.path.join(metrics_dir, 'run.json')
+    if returncode != 0 or not os.path.exists(report_path):
+        with open(log_path) as f:
+            result.update(status='error', log_tail=f.read()[-2000:])
+        return result
+
+    with open(report_path) as f:
+        report = json.load(f)
+    items = _counter(report, item_name, item_labels)
+    round_trips = _counter(report, 'db_round_trips', {})
+    waits = _waits(report)
+    result.update(
+        status='ok',
+        items=items,
+        items_per_sec=items / seconds if seconds else 0.0,
+        db_round_trips=round_trips,
+        db_round_trips_per_item=round_trips / items if items else None,
+        sleep_seconds=waits.get('rate_limit', 0.0) + waits.get('backoff', 0.0),
+        wait_seconds=waits,
+        errors=_counter(report, 'errors', {}),
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against the local Stocktwits stand-in.")
+    parser.add_argument("--scrapers", default="tweets,authors,metrics",
+                        help="comma-separated; tweets always runs first to fill the database")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--symbols", type=int, default=6)
+    parser.add_argument("--messages", type=int, default=300, help="messages per symbol")
+    parser.add_argument("--authors", type=int, default=200, help="author pool of the synthetic site")
+    parser.add_argument("--image-every", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=25)
+    parser.add_argument("--mode", default="dom", choices=("dom", "network"), help="SCRAPE_MODE")
+    parser.add_argument("--rate", type=float, default=0, help="RATE_LIMIT_RPS for the run (0 = no limiter)")
+    parser.add_argument("--pg-bin", help="directory with initdb/pg_ctl")
+    parser.add_argument("--out", default="../data/results", help="directory for the JSON report")
+    args = parser.parse_args()
+
+    selected = [s for s in args.scrapers.split(",") if s]
+    unknown = [s for s in selected if s not in SCRAPERS]
+    if unknown:
+        parser.error(f"unknown scrapers: {', '.join(unknown)}")
+    worker_counts = [int(w) for w in args.workers.split(",") if w]
+    symbols = (TICKERS + [f"SYM{n:03d}" for n in range(args.symbols)])[:args.symbols]
+
+    synthetic = dict(messages=args.messages, authors=args.authors, image_every=args.image_every)
+    server = make_server(port=0, synthetic=synthetic, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='bench-scrapers-')
+    try:
+        with DisposablePostgres(args.pg_bin) as pg:
+            for workers in worker_counts:
+                database = f"bench_{workers}"
+                pg.create_database(database)
+                pg.execute(database, "INSERT INTO symbols (symbol) SELECT unnest(%s::text[])", (symbols,))
+                run_dir = os.path.join(work_dir, str(workers))
+                os.makedirs(run_dir)
+                env = dict(
+                    os.environ, **pg.env(database),
+                    STOCKTWITS_URL=base_url, SCRAPE_MODE=args.mode, FULL_CRAWL="1",
+                    RATE_LIMIT_RPS=str(args.rate), RATE_LIMIT_PATH=os.path.join(run_dir, 'rate_limit.json'),
+                    BROWSER_STATE_PATH=os.path.join(run_dir, 'state.json'), IMAGE_DIR=os.path.join(run_dir, 'images'),
+                    STOCKTWITS_USERNAME='bench', STOCKTWITS_PASSWORD='bench', METRICS_ENABLED='1',
+                )
+                for scraper in ['tweets'] + [s for s in ['authors', 'metrics'] if s in selected]:
+                    if scraper in SEED_SQL:
+                        pg.execute(database, SEED_SQL[scraper])
+                    result = run_scraper(scraper, workers, env, run_dir)
+                    if scraper in selected:
+                        results.append(result)
+                    if result['status'] != 'ok':
+                        print(f"{scraper} x{workers}: failed (exit {result['returncode']})\n{result['log_tail']}")
+                        break
+                    print(f"{scraper} x{workers}: {result['items']:.0f} items in {result['seconds']:.1f}s "
+                          f"({result['items_per_sec']:.1f}/s), {result['db_round_trips_per_item'] or 0:.2f} round trips/item, "
+                          f"slept {result['sleep_seconds']:.1f}s, browser peak {result['peak_browser_rss_mb']:.0f} MB")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"scraper-benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'site': dict(synthetic, symbols=len(symbols), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms),
+            'mode': args.mode,
+            'rate_limit_rps': args.rate,
+            'results': results,
+        }, f, indent=2)
+    print(f"Report -> {path}")
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
@@ -0,0 +1,286 @@
+import os
+import time
+import fcntl
+import asyncio
+from multiprocessing.util import Finalize
+from contextlib import contextmanager, asynccontextmanager
+from dotenv import load_dotenv
+from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+
+load_dotenv()
+
+BASE_URL = os.getenv("STOCKTWITS_URL", "https://stocktwits.com").rstrip('/')
+LOGIN_URL = f'{BASE_URL}/signin?next=/login'
+STORAGE_STATE = os.getenv("BROWSER_STATE_PATH", ".auth/stocktwits_state.json")
+STATE_MAX_AGE = float(os.getenv("BROWSER_STATE_MAX_AGE", 6 * 3600))  # s
+BROWSER_MAX_HEAP_MB = float(os.getenv("BROWSER_MAX_HEAP_MB", 512))
+BROWSER_MAX_ERRORS = int(os.getenv("BROWSER_MAX_ERRORS", 3))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "1") == "1"
+
+_process_pool = None
+
+HEAP_JS = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+
+def state_is_fresh(path=STORAGE_STATE) -> bool:
+    return os.path.exists(path) and time.time() - os.path.getmtime(path) < STATE_MAX_AGE
+
+
+@contextmanager
+def _state_lock(path=STORAGE_STATE):
+    """Inter-process lock so only one worker logs in while the others wait for the file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _login(browser, path):
+    context = browser.new_context()
+    page = context.new_page()
+    page.goto(LOGIN_URL)
+    page.wait_for_selector("input[name='login']")
+    page.fill("input[name='login']", os.getenv("STOCKTWITS_USERNAME", ""))
+    page.fill("input[name='password']", os.getenv("STOCKTWITS_PASSWORD", ""))
+    page.press("input[name='password']", "Enter")
+    page.wait_for_url(lambda url: 'signin' not in url)
+    page.wait_for_load_state("networkidle")
+    context.storage_state(path=path)
+    context.close()
+
+
+async def _login_async(browser, path):
+    context = await browser.new_context()
+    page = await context.new_page()
+    await page.goto(LOGIN_URL)
+    await page.wait_for_selector("input[name='login']")
+    await page.fill("input[name='login']", os.getenv("STOCKTWITS_USERNAME", ""))
+    await page.fill("input[name='password']", os.getenv("STOCKTWITS_PASSWORD", ""))
+    await page.press("input[name='password']", "Enter")
+    await page.wait_for_url(lambda url: 'signin' not in url)
+    await page.wait_for_load_state("networkidle")
+    await context.storage_state(path=path)
+    await context.close()
+
+
+def ensure_storage_state(browser=None, path=STORAGE_STATE, force=False):
+    """
+    Make sure a logged-in storage state exists on disk and is not older than
+    STATE_MAX_AGE. Meant to be called once by the parent process before the
+    workers start, so they all reuse the same session.
+    """
+    with _state_lock(path):
+        if not force and state_is_fresh(path):
+            return path
+        if browser is not None:
+            _login(browser, path)
+            return path
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=BROWSER_HEADLESS)
+            _login(browser, path)
+            browser.close()
+    return path
+
+
+class _Slot:
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.errors = 0
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    One Chromium per process with reusable logged-in contexts.
+
+    Contexts are created from the shared storage state, so nobody logs in
+    again as long as the state is fresh. A context is recycled when its page
+    died, after BROWSER_MAX_ERRORS consecutive failures, or when the page JS
+    heap grows past BROWSER_MAX_HEAP_MB, instead of after a fixed number of
+    items.
+
+        with BrowserPool() as pool:
+            with pool.page() as page:
+                page.goto(...)
+    """
+
+    def __init__(self, headless=BROWSER_HEADLESS, state_path=STORAGE_STATE):
+        self.headless = headless
+        self.state_path = state_path
+        self.recycled = 0
+        self.pid = None
+        self._playwright = None
+        self._browser = None
+        self._idle = []
+
+    def start(self):
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        if self._browser is None or not self._browser.is_connected():
+            self._browser = self._playwright.chromium.launch(headless=self.headless)
+            self._idle = []
+        return self
+
+    def _new_slot(self):
+        self.start()
+        if not state_is_fresh(self.state_path):
+            ensure_storage_state(self._browser, self.state_path)
+        context = self._browser.new_context(storage_state=self.state_path)
+        return _Slot(context, context.new_page())
+
+    def _healthy(self, slot) -> bool:
+        if slot.errors >= BROWSER_MAX_ERRORS or slot.page.is_closed():
+            return False
+        try:
+            heap = slot.page.evaluate(HEAP_JS)
+        except Exception:
+            return False
+        return heap < BROWSER_MAX_HEAP_MB * 1024 * 1024
+
+    def _discard(self, slot):
+        self.recycled += 1
+        try:
+            slot.context.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def page(self):
+        slot = self._idle.pop() if self._idle else self._new_slot()
+        slot.uses += 1
+        try:
+            yield slot.page
+            slot.errors = 0
+        except Exception:
+            slot.errors += 1
+            raise
+        finally:
+            if self._healthy(slot):
+                self._idle.append(slot)
+            else:
+                self._discard(slot)
+
+    def close(self):
+        for slot in self._idle:
+            self._discard(slot)
+        self._idle = []
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    BrowserPool of the current process, kept alive across tasks so a
+    ProcessPoolExecutor worker launches Chromium once for all its symbols.
+    """
+    global _process_pool
+    if _process_pool is None or _process_pool.pid != os.getpid():
+        _process_pool = BrowserPool().start()
+        _process_pool.pid = os.getpid()
+        # Finalize (unlike atexit) also runs when a pool worker process exits
+        Finalize(_process_pool, _process_pool.close, exitpriority=10)
+    return _process_pool
+
+
+class AsyncBrowserPool:
+    """asyncio twin of BrowserPool; several pages can be borrowed concurrently."""
+
+    def __init__(self, headless=BROWSER_HEADLESS, state_path=STORAGE_STATE):
+        self.headless = headless
+        self.state_path = state_path
+        self.recycled = 0
+        self._playwright = None
+        self._browser = None
+        self._idle = []
+        self._login_lock = asyncio.Lock()
+
+    async def start(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        if self._browser is None or not self._browser.is_connected():
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._idle = []
+        return self
+
+    async def _ensure_state(self):
+        async with self._login_lock:
+            if state_is_fresh(self.state_path):
+                return
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            with open(f"{self.state_path}.lock", "w") as lock_file:
+                await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+                try:
+                    if not state_is_fresh(self.state_path):
+                        await _login_async(self._browser, self.state_path)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def _new_slot(self):
+        await self.start()
+        await self._ensure_state()
+        context = await self._browser.new_context(storage_state=self.state_path)
+        return _Slot(context, await context.new_page())
+
+    async def _healthy(self, slot) -> bool:
+        if slot.errors >= BROWSER_MAX_ERRORS or slot.page.is_closed():
+            return False
+        try:
+            heap = await slot.page.evaluate(HEAP_JS)
+        except Exception:
+            return False
+        return heap < BROWSER_MAX_HEAP_MB * 1024 * 1024
+
+    async def _discard(self, slot):
+        self.recycled += 1
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        slot = self._idle.pop() if self._idle else await self._new_slot()
+        slot.uses += 1
+        try:
+            yield slot.page
+            slot.errors = 0
+        except Exception:
+            slot.errors += 1
+            raise
+        finally:
+            if await self._healthy(slot):
+                self._idle.append(slot)
+            else:
+                await self._discard(slot)
+
+    async def close(self):
+        for slot in self._idle:
+            await self._discard(slot)
+        self._idle = []
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
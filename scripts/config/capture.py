@@ -0,0 +1,163 @@
+import os
+import re
+from datetime import datetime
+
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "dom")  # dom | network
+CAPTURE_BLOCK_RESOURCES = os.getenv("CAPTURE_BLOCK_RESOURCES", "1") == "1"
+
+# XHR/fetch endpoints the web app uses for streams and message permalinks
+API_PATTERN = re.compile(r"/api/2/(streams/|messages/show/)")
+BLOCKED_RESOURCES = {"image", "font", "stylesheet", "media"}
+
+
+def _count(value, key):
+    if isinstance(value, dict):
+        value = value.get(key)
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _image_url(message):
+    chart = (message.get('entities') or {}).get('chart') or {}
+    return chart.get('large') or chart.get('original') or chart.get('url')
+
+
+def parse_message(message: dict) -> dict:
+    """Map one API message to the stocktwits_posts columns plus author/image fields."""
+    user = message.get('user') or {}
+    created_at = message.get('created_at')
+    return {
+        'post_id': int(message['id']),
+        'post_author': user.get('username', ''),
+        'post_date': datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ") if created_at else None,
+        'post_text': (message.get('body') or '').strip(),
+        'post_comments': _count(message.get('conversation'), 'replies'),
+        'post_reshares': _count(message.get('reshares'), 'reshared_count'),
+        'post_likes': _count(message.get('likes'), 'total'),
+        'image_url': _image_url(message),
+        'author_followers': _count(user, 'followers'),
+        'author_following': _count(user, 'following'),
+    }
+
+
+def iter_messages(payload: dict):
+    """Messages of a stream page ({"messages": [...]}) or a permalink ({"message": {...}})."""
+    if not isinstance(payload, dict):
+        return
+    if isinstance(payload.get('message'), dict):
+        yield payload['message']
+    for message in payload.get('messages') or []:
+        yield message
+
+
+def _block_route(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+async def _block_route_async(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _parse_payload(payload) -> list:
+    records = []
+    for message in iter_messages(payload):
+        try:
+            records.append(parse_message(message))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return records
+
+
+class ResponseCapture:
+    """
+    Collects the JSON the page itself fetches instead of reading the DOM.
+
+    Matching responses are only queued inside the Playwright event handler;
+    their bodies are parsed in drain(), outside the dispatcher. With
+    `block_resources` images, fonts, CSS and media are aborted at the network
+    layer. close() detaches everything, so a pooled page can be reused.
+    """
+
+    def __init__(self, page, block_resources=CAPTURE_BLOCK_RESOURCES):
+        self.page = page
+        self.block_resources = block_resources
+        self.responses = 0
+        self._pending = []
+        page.on("response", self._on_response)
+        if block_resources:
+            page.route("**/*", _block_route)
+
+    def _on_response(self, response):
+        if API_PATTERN.search(response.url) and response.ok:
+            self._pending.append(response)
+
+    def drain(self) -> list:
+        """Parsed messages received since the previous call, in arrival order."""
+        pending, self._pending = self._pending, []
+        records = []
+        for response in pending:
+            try:
+                payload = response.json()
+            except Exception:
+                continue
+            self.responses += 1
+            records.extend(_parse_payload(payload))
+        return records
+
+    def close(self):
+        self.page.remove_listener("response", self._on_response)
+        if self.block_resources:
+            self.page.unroute("**/*", _block_route)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncResponseCapture(ResponseCapture):
+    """asyncio flavour: attach() and close() must be awaited, drain() is a coroutine."""
+
+    def __init__(self, page, block_resources=CAPTURE_BLOCK_RESOURCES):
+        self.page = page
+        self.block_resources = block_resources
+        self.responses = 0
+        self._pending = []
+
+    async def attach(self):
+        self.page.on("response", self._on_response)
+        if self.block_resources:
+            await self.page.route("**/*", _block_route_async)
+        return self
+
+    async def drain(self) -> list:
+        pending, self._pending = self._pending, []
+        records = []
+        for response in pending:
+            try:
+                payload = await response.json()
+            except Exception:
+                continue
+            self.responses += 1
+            records.extend(_parse_payload(payload))
+        return records
+
+    async def close(self):
+        self.page.remove_listener("response", self._on_response)
+        if self.block_resources:
+            await self.page.unroute("**/*", _block_route_async)
+
+    async def __aenter__(self):
+        return await self.attach()
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -1,47 +1,229 @@
 import os
+import re
+import atexit
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
+from config import metrics
 
 load_dotenv()
 
-def get_connection():
-    try:
-        connection = psycopg2.connect(
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 4))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 60))  # s a thread waits for a free connection
+DB_ITERSIZE = int(os.getenv("DB_ITERSIZE", 2000))
+DB_PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", 500))
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_prepared_statements = {}
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements were already PREPAREd on it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class CountingCursor(RealDictCursor):
+    """RealDictCursor that counts every statement sent (execute_values pages included) as a round trip."""
+
+    def execute(self, query, vars=None):
+        metrics.inc('db_round_trips')
+        return super().execute(query, vars)
+
+
+def get_pool():
+    """
+    Return the connection pool of the current process.
+
+    Worker processes forked by ProcessPoolExecutor inherit the parent's pool
+    object; the pid check makes each process open its own sockets instead of
+    sharing (and closing) the parent's ones.
+    """
+    global _pool, _pool_pid, _pool_slots
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadedConnectionPool(
+            DB_POOL_MIN,
+            DB_POOL_MAX,
             host=os.getenv("DB_HOST"),
             database=os.getenv("DB_NAME"),
             user=os.getenv("DB_USER"),
             password=os.getenv("DB_PASSWORD"),
-            port=os.getenv("DB_PORT")
+            port=os.getenv("DB_PORT"),
+            connection_factory=PooledConnection,
         )
-        return connection
+        # ThreadedConnectionPool raises PoolError when it is exhausted; the
+        # semaphore makes the extra threads wait for a connection instead
+        _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def close_pool():
+    global _pool, _pool_pid, _pool_slots
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.closeall()
+    _pool = None
+    _pool_pid = None
+    _pool_slots = None
+
+
+def _borrow(timeout=DB_POOL_TIMEOUT):
+    pool = get_pool()
+    slots = _pool_slots
+    if not slots.acquire(timeout=timeout):
+        raise PoolError(f"no free connection after {timeout:.0f}s (DB_POOL_MAX={DB_POOL_MAX})")
+    try:
+        return pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+
+
+atexit.register(close_pool)
+
+
+def get_connection():
+    """
+    Borrow a connection from the pool, waiting up to DB_POOL_TIMEOUT seconds
+    when every connection is in use. Give it back with release_connection.
+    """
+    try:
+        return _borrow()
+    except Exception as e:
+        print("Error:", e)
+        return None
+
+
+def release_connection(connection):
+    if connection is None or _pool is None or _pool_pid != os.getpid():
+        return
+    try:
+        _pool.putconn(connection, close=bool(connection.closed))
+    finally:
+        _pool_slots.release()
+
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection for the duration of the block.
+    Commits on success, rolls back on error and always returns it to the pool.
+    """
+    conn = _borrow()
+    try:
+        yield conn
+        conn.commit()
+        metrics.inc('db_round_trips')
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
+@contextmanager
+def cursor(cursor_factory=CountingCursor):
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=cursor_factory)
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+
+def prepare(name, query):
+    """
+    Register a statement (written with %s placeholders) to be PREPAREd lazily
+    on every pooled connection that executes it through execute_prepared.
+    """
+    index = iter(range(1, query.count("%s") + 1))
+    _prepared_statements[name] = re.sub(r"%s", lambda _: f"${next(index)}", query)
+
+
+def _execute_prepared(cur, name, params):
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {_prepared_statements[name]}")
+        conn.prepared.add(name)
+    if params:
+        placeholders = ", ".join(["%s"] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+
+def execute_prepared(name, params=None):
+    """Run a statement registered with prepare(); same return contract as execute_query."""
+    try:
+        with cursor() as cur:
+            _execute_prepared(cur, name, params)
+            return cur.fetchall() if cur.description is not None else None
     except Exception as e:
         print("Error:", e)
         return None
 
 
+def iter_query(query, params=None, itersize=DB_ITERSIZE):
+    """
+    Stream the rows of a large SELECT through a server-side (named) cursor,
+    fetching `itersize` rows per round trip instead of loading everything.
+    """
+    with connection() as conn:
+        cur = conn.cursor(name=f"iter_{id(conn)}_{os.getpid()}", cursor_factory=CountingCursor)
+        cur.itersize = itersize
+        try:
+            cur.execute(query, params)
+            for row in cur:
+                yield row
+        finally:
+            cur.close()
+
+
 def execute_query(query, params=None):
-    connection = get_connection()
-    if connection is None:
+    try:
+        with cursor() as cur:
+            cur.execute(query, params)
+
+            # Se for uma consulta que retorna linhas (SELECT, RETURNING), busca os resultados
+            if cur.description is not None:
+                return cur.fetchall()
+            return None
+    except Exception as e:
+        print("Error:", e)
         return None
 
+
+def execute_values_query(query, rows, template=None, page_size=DB_PAGE_SIZE):
+    """
+    Multi-row statement: `query` has a single `VALUES %s` that is expanded with
+    `rows`, `page_size` rows per round trip. Returns the RETURNING rows if the
+    statement has a RETURNING clause, otherwise the number of rows affected;
+    None only when the statement failed.
+    """
+    rows = list(rows)
+    fetch = "returning" in query.lower()
+    if not rows:
+        return [] if fetch else 0
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(query, params)
-
-        # Se for uma consulta SELECT, busca os resultados
-        if query.strip().lower().startswith("select"):
-            result = cursor.fetchall()
-        else:
-            connection.commit()
-            result = None
-
-        cursor.close()
-        connection.close()
-        return result
+        with cursor() as cur:
+            if fetch:
+                return execute_values(cur, query, rows, template=template, page_size=page_size, fetch=True)
+            # cur.rowcount only covers the last page, so add it up page by page
+            affected = 0
+            for start in range(0, len(rows), page_size):
+                execute_values(cur, query, rows[start:start + page_size], template=template, page_size=page_size)
+                affected += max(cur.rowcount, 0)
+            return affected
     except Exception as e:
         print("Error:", e)
-        if connection:
-            connection.rollback()
-            connection.close()
         return None
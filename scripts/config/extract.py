@@ -0,0 +1,75 @@
+"""
+Batched DOM extraction: each function below runs inside the page with a
+single page.evaluate call and returns plain data, instead of one CDP round
+trip per query_selector/get_attribute/text_content.
+"""
+from datetime import datetime
+
+STREAM_MESSAGE_SELECTOR = "div[class*='StreamMessage_container__']"
+
+# args: {skip: number of messages already read, seen: optional list of post ids to leave out}
+STREAM_MESSAGES_JS = """
+({skip, seen}) => {
+    const known = new Set((seen || []).map(String));
+    const text = (el) => el ? el.textContent.trim() : '';
+    const containers = document.querySelectorAll("div[class*='StreamMessage_container__']");
+    const messages = [];
+    for (const message of Array.from(containers).slice(skip || 0)) {
+        const link = message.querySelector("a[href*='/message/']");
+        const match = link && link.getAttribute('href').match(/\\/message\\/(\\d+)/);
+        if (!match || known.has(match[1])) continue;
+        const time = message.querySelector('time');
+        const img = message.querySelector("img[class*='StreamMessageEmbed']");
+        messages.push({
+            post_id: match[1],
+            author: text(message.querySelector("span[aria-label='Username']")),
+            datetime: time ? time.getAttribute('datetime') : '',
+            text: text(message.querySelector("div[class^='RichTextMessage_body__']")),
+            counters: Array.from(message.querySelectorAll("span[class^='StreamMessageLabelCount_labelCount']")).map(text),
+            image_src: img ? img.getAttribute('src') : null,
+        });
+    }
+    return {total: containers.length, messages};
+}
+"""
+
+# args: post id; null when the message is not on the page
+MESSAGE_COUNTERS_JS = """
+(postId) => {
+    const message = document.querySelector(`div[data-testid='message-${postId}']`);
+    if (!message) return null;
+    return Array.from(message.querySelectorAll("span[class^='StreamMessageLabelCount_labelCount']"))
+        .map((el) => el.textContent.trim());
+}
+"""
+
+# args: author username
+AUTHOR_STATS_JS = """
+(author) => {
+    const count = (path) => {
+        const el = document.querySelector(`a[href*='/${author}/${path}'] strong`);
+        return el ? el.textContent : '';
+    };
+    return {following: count('following'), followers: count('followers')};
+}
+"""
+
+
+def _digits(txt):
+    return int(txt) if txt and txt.isdigit() else 0
+
+
+def parse_stream_message(record: dict) -> dict:
+    """Turn one STREAM_MESSAGES_JS record into stocktwits_posts columns (+ image_url)."""
+    counters = record.get('counters') or []
+    date_str = record.get('datetime')
+    return {
+        'post_id': int(record['post_id']),
+        'post_author': record.get('author') or '',
+        'post_date': datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ") if date_str else None,
+        'post_text': record.get('text') or '',
+        'post_comments': _digits(counters[0]) if len(counters) > 0 else 0,
+        'post_reshares': _digits(counters[1]) if len(counters) > 1 else 0,
+        'post_likes': _digits(counters[2]) if len(counters) > 2 else 0,
+        'image_url': record.get('image_src'),
+    }
@@ -0,0 +1,212 @@
+import os
+import hashlib
+import threading
+import concurrent.futures
+from io import BytesIO
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image, UnidentifiedImageError
+from config.database import execute_values_query
+from config import metrics
+
+OUTPUT_DIR = os.getenv("IMAGE_DIR", "images")
+MAX_DIMENSION = 720  # px
+IMAGE_DOWNLOAD_WORKERS = int(os.getenv("IMAGE_DOWNLOAD_WORKERS", 8))
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", 2))
+IMAGE_BATCH_SIZE = int(os.getenv("IMAGE_BATCH_SIZE", 100))
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", 20))
+
+UPDATE_IMAGE_PATHS_SQL = (
+    "UPDATE stocktwits_posts AS sp "
+    "SET post_img_path = v.post_img_path "
+    "FROM (VALUES %s) AS v(symbol, post_id, post_img_path) "
+    "WHERE sp.symbol = v.symbol AND sp.post_id = v.post_id"
+)
+
+
+def process_and_save(img_data: bytes, img_id: str):
+    """
+    Decode, downscale to MAX_DIMENSION and save the image as `{img_id}.jpg|png`.
+    Runs in a worker process, so it only takes and returns picklable values.
+    """
+    with metrics.timer('image_resize'):
+        return _process_and_save(img_data, img_id)
+
+
+def _process_and_save(img_data, img_id):
+    img = Image.open(BytesIO(img_data))
+
+    w, h = img.size
+    max_orig = max(w, h)
+    if max_orig > MAX_DIMENSION:
+        scale = MAX_DIMENSION / max_orig
+        new_size = (int(w * scale), int(h * scale))
+        img = img.resize(new_size, Image.LANCZOS)
+
+    fmt = img.format or 'JPEG'
+
+    if img.mode in ("RGBA", "LA") or (fmt.upper() == 'PNG' and 'A' in img.getbands()):
+        fmt = 'PNG'
+        ext = 'png'
+    else:
+        fmt = 'JPEG'
+        ext = 'jpg'
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+
+    filename = f"{img_id}.{ext}"
+    filepath = os.path.join(OUTPUT_DIR, filename)
+
+    if fmt == 'JPEG':
+        img.save(filepath, fmt, quality=85, optimize=True)
+    else:
+        img.save(filepath, fmt, optimize=True)
+
+    return filepath
+
+
+def _stored_path(content_hash):
+    for ext in ('jpg', 'png'):
+        filepath = os.path.join(OUTPUT_DIR, f"{content_hash}.{ext}")
+        if os.path.exists(filepath):
+            return filepath
+    return None
+
+
+class ImagePipeline:
+    """
+    Background stage for the images embedded in posts.
+
+    The scraper only enqueues (symbol, post_id, url). Downloads run on a thread
+    pool sharing one pooled requests.Session, decode/resize/encode runs on a
+    process pool, and the resulting paths are written back to
+    stocktwits_posts.post_img_path in batches. Files are named after the
+    SHA-256 of their content, so an image reposted under several posts or
+    symbols is fetched once per URL and stored once on disk. Keep one pipeline
+    per worker process for every symbol it crawls, so the URL cache and the
+    pools outlive a single symbol.
+
+    While a PostWriter is attached (see attach()) it is flushed before every
+    write-back, so the rows being updated already exist.
+    """
+
+    def __init__(self, writer=None, on_error=print,
+                 download_workers=IMAGE_DOWNLOAD_WORKERS,
+                 process_workers=IMAGE_PROCESS_WORKERS,
+                 batch_size=IMAGE_BATCH_SIZE):
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        self.writer = writer
+        self.on_error = on_error
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=download_workers, pool_maxsize=download_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.downloads = concurrent.futures.ThreadPoolExecutor(max_workers=download_workers)
+        self.processes = concurrent.futures.ProcessPoolExecutor(max_workers=process_workers)
+        self.downloaded = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._url_futures = {}
+        self._hash_paths = {}
+        self._in_flight = 0
+        self._updates = []
+
+    def enqueue(self, symbol, post_id, url):
+        if not url:
+            return
+        with self._lock:
+            future = self._url_futures.get(url)
+            if future is None:
+                future = self.downloads.submit(self._fetch, url)
+                self._url_futures[url] = future
+            else:
+                self.cache_hits += 1
+            self._in_flight += 1
+        future.add_done_callback(lambda f: self._done(f, symbol, post_id))
+
+    def _fetch(self, url):
+        with metrics.timer('image_download'):
+            response = self.session.get(url, timeout=IMAGE_TIMEOUT)
+        response.raise_for_status()
+        metrics.inc('images', result='downloaded')
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        with self._lock:
+            self.downloaded += 1
+            path = self._hash_paths.get(content_hash)
+        if path is None:
+            path = _stored_path(content_hash)
+        if path is None:
+            path = self.processes.submit(process_and_save, response.content, content_hash).result()
+        else:
+            metrics.inc('images', result='cached')
+            with self._lock:
+                self.cache_hits += 1
+        with self._lock:
+            self._hash_paths[content_hash] = path
+        return path
+
+    def _done(self, future, symbol, post_id):
+        try:
+            self._record(future, symbol, post_id)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._idle.notify_all()
+
+    def _record(self, future, symbol, post_id):
+        try:
+            path = future.result()
+        except UnidentifiedImageError as e:
+            self.on_error(f"[ERROR on process_and_save] {symbol} id={post_id}: invalid format ({e})")
+            return
+        except Exception as e:
+            self.on_error(f"[ERROR on image pipeline] {symbol} id={post_id}: {e}")
+            return
+        with self._lock:
+            self._updates.append((symbol, int(post_id), path))
+            full = len(self._updates) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            updates, self._updates = self._updates, []
+        if not updates:
+            return
+        if self.writer is not None:
+            self.writer.flush()
+        with metrics.timer('db_write', table='image_paths'):
+            result = execute_values_query(UPDATE_IMAGE_PATHS_SQL, updates)
+        if result is None:
+            self.on_error(f"Error: could not write {len(updates)} image paths")
+
+    def drain(self):
+        """Wait until every enqueued image is stored and its path written back."""
+        with self._lock:
+            self._idle.wait_for(lambda: self._in_flight == 0)
+        self.flush()
+
+    @contextmanager
+    def attach(self, writer):
+        """Write back through `writer` for one crawl; its images are drained before it is detached."""
+        self.writer = writer
+        try:
+            yield self
+        finally:
+            self.drain()
+            self.writer = None
+
+    def close(self):
+        self.drain()
+        self.downloads.shutdown(wait=True)
+        self.processes.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
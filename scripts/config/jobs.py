@@ -0,0 +1,198 @@
+import os
+import time
+import socket
+from psycopg2.extras import Json
+from config.database import cursor, execute_query, execute_values_query, prepare, execute_prepared
+
+JOB_LEASE_SIZE = int(os.getenv("JOB_LEASE_SIZE", 10))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", 600))  # s
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_LEASE_MARGIN = float(os.getenv("JOB_LEASE_MARGIN", 0.25))  # share of the lease left when buffered results must be written
+
+ENQUEUE_JOBS_SQL = (
+    "INSERT INTO scrape_jobs (queue, item_key, payload) "
+    "VALUES %s "
+    "ON CONFLICT (queue, item_key) DO NOTHING"
+)
+
+# Re-opens finished items with their new priority; a running item is left alone
+SCHEDULE_JOBS_SQL = (
+    "INSERT INTO scrape_jobs AS j (queue, item_key, payload, priority) "
+    "VALUES %s "
+    "ON CONFLICT (queue, item_key) DO UPDATE SET "
+    "    payload = EXCLUDED.payload, priority = EXCLUDED.priority, status = 'pending', "
+    "    attempts = CASE WHEN j.status = 'pending' THEN j.attempts ELSE 0 END, "
+    "    last_error = NULL, updated_at = now() "
+    "WHERE j.status IN ('pending', 'done', 'failed') "
+    "RETURNING j.item_key"
+)
+
+EXPIRE_JOBS_SQL = (
+    "UPDATE scrape_jobs SET status = 'failed', last_error = 'lease expired', updated_at = now() "
+    "WHERE queue = %s AND status = 'running' AND leased_until < now() AND attempts >= %s"
+)
+
+CLAIM_JOBS_SQL = (
+    "UPDATE scrape_jobs SET "
+    "    status = 'running', attempts = attempts + 1, leased_by = %s, "
+    "    leased_until = now() + make_interval(secs => %s), updated_at = now() "
+    "WHERE id IN ("
+    "    SELECT id FROM scrape_jobs "
+    "    WHERE queue = %s AND attempts < %s "
+    "      AND (status = 'pending' OR (status = 'running' AND leased_until < now())) "
+    "    ORDER BY priority DESC, id "
+    "    LIMIT %s "
+    "    FOR UPDATE SKIP LOCKED"
+    ") "
+    "RETURNING id, item_key, payload, attempts, priority"
+)
+prepare('claim_jobs', CLAIM_JOBS_SQL)
+
+COMPLETE_JOBS_SQL = (
+    "UPDATE scrape_jobs SET status = 'done', leased_until = NULL, last_error = NULL, updated_at = now() "
+    "WHERE id = ANY(%s)"
+)
+
+FAIL_JOB_SQL = (
+    "UPDATE scrape_jobs SET "
+    "    status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END, "
+    "    leased_until = NULL, last_error = %s, updated_at = now() "
+    "WHERE id = %s"
+)
+
+EXTEND_JOBS_SQL = (
+    "UPDATE scrape_jobs SET leased_until = now() + make_interval(secs => %s), updated_at = now() "
+    "WHERE id = ANY(%s) AND status = 'running'"
+)
+
+COUNT_JOBS_SQL = (
+    "SELECT status, COUNT(*) AS count FROM scrape_jobs "
+    "WHERE queue = %s GROUP BY status"
+)
+
+START_ROUND_SQL = (
+    "UPDATE scrape_jobs SET status = 'pending', attempts = 0, last_error = NULL, updated_at = now() "
+    "WHERE queue = %s AND status IN ('done', 'failed') "
+    "AND NOT EXISTS ("
+    "    SELECT 1 FROM scrape_jobs WHERE queue = %s AND status IN ('pending', 'running')"
+    ")"
+)
+
+
+def _write(query, params):
+    # Queue-state writes raise: a swallowed error would leave the job running until its lease expires
+    with cursor() as cur:
+        cur.execute(query, params)
+        return cur.rowcount
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Work queue over the scrape_jobs table shared by every worker process.
+
+    Workers claim small leases (FOR UPDATE SKIP LOCKED, so they never block
+    each other) and mark each item done or failed. An item whose lease runs
+    out without an answer (crashed or killed worker) becomes claimable again
+    after `visibility_timeout` seconds; an item is retried until it reaches
+    `max_attempts`. complete(), fail() and extend() raise when the database
+    write fails, so a lost status update is never mistaken for a done job.
+    Since the state lives in the database, restarting the script resumes
+    with whatever is still pending.
+    """
+
+    def __init__(self, name, lease_size=JOB_LEASE_SIZE,
+                 visibility_timeout=JOB_VISIBILITY_TIMEOUT, max_attempts=JOB_MAX_ATTEMPTS):
+        self.name = name
+        self.lease_size = lease_size
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.worker = worker_id()
+
+    def enqueue(self, items):
+        """Add (item_key, payload) pairs; keys already in the queue are left untouched."""
+        rows = [(self.name, str(key), Json(payload)) for key, payload in items]
+        execute_values_query(ENQUEUE_JOBS_SQL, rows)
+
+    def enqueue_query(self, select_sql, params=None):
+        """
+        Enqueue straight from a SELECT returning (item_key, payload) columns,
+        so the items never travel through Python.
+        """
+        execute_query(
+            "INSERT INTO scrape_jobs (queue, item_key, payload) "
+            f"SELECT %s, q.item_key::text, q.payload::jsonb FROM ({select_sql}) AS q "
+            "ON CONFLICT (queue, item_key) DO NOTHING",
+            (self.name, *(params or ())),
+        )
+
+    def schedule(self, items) -> list:
+        """
+        Add (item_key, payload, priority) triples, claimed highest priority
+        first. Finished items are re-opened; an item still running is not
+        touched, so the same key is never worked on twice at once. Returns
+        the keys that are now pending.
+        """
+        rows = [(self.name, str(key), Json(payload), float(priority)) for key, payload, priority in items]
+        result = execute_values_query(SCHEDULE_JOBS_SQL, rows)
+        return [row['item_key'] for row in result or []]
+
+    def start_round(self):
+        """Re-open finished items for a new pass, but only once the previous pass is drained."""
+        execute_query(START_ROUND_SQL, (self.name, self.name))
+
+    def claim(self) -> list:
+        execute_query(EXPIRE_JOBS_SQL, (self.name, self.max_attempts))
+        rows = execute_prepared(
+            'claim_jobs',
+            (self.worker, self.visibility_timeout, self.name, self.max_attempts, self.lease_size),
+        )
+        claimed_at = time.monotonic()
+        for row in rows or []:
+            row['claimed_at'] = claimed_at
+        return sorted(rows or [], key=lambda row: (-row['priority'], row['id']))
+
+    def expiring(self, job, margin=JOB_LEASE_MARGIN) -> bool:
+        """True once less than `margin` of the claimed job's lease is left (timed from the claim)."""
+        return time.monotonic() - job['claimed_at'] >= self.visibility_timeout * (1 - margin)
+
+    def complete(self, job_ids):
+        if job_ids:
+            _write(COMPLETE_JOBS_SQL, (list(job_ids),))
+
+    def fail(self, job, error):
+        _write(FAIL_JOB_SQL, (self.max_attempts, str(error)[:2000], job['id']))
+
+    def extend(self, job_ids):
+        """Push the lease of running jobs out by another `visibility_timeout` seconds."""
+        if job_ids:
+            _write(EXTEND_JOBS_SQL, (self.visibility_timeout, list(job_ids)))
+
+    def keep_alive(self, job, margin=JOB_LEASE_MARGIN) -> bool:
+        """
+        Extend the lease of a long-running job once it is expiring, so no
+        other worker claims the item while this one still works on it.
+        Returns True when the lease was extended.
+        """
+        if not self.expiring(job, margin):
+            return False
+        renewed_at = time.monotonic()
+        self.extend([job['id']])
+        job['claimed_at'] = renewed_at
+        return True
+
+    def jobs(self):
+        """Yield claimed jobs lease after lease until the queue has nothing left."""
+        while True:
+            batch = self.claim()
+            if not batch:
+                return
+            for job in batch:
+                yield job
+
+    def counts(self) -> dict:
+        rows = execute_query(COUNT_JOBS_SQL, (self.name,)) or []
+        return {row['status']: row['count'] for row in rows}
@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from config.database import execute_values_query
+from config import metrics
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 200))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 2))  # s
+LOG_SAMPLE_AT = float(os.getenv("LOG_SAMPLE_AT", 0.5))  # queue fill ratio where sampling starts
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.1))  # share of sub-WARNING records kept then
+
+LOGGER_NAME = 'scrapers'
+
+INSERT_LOGS_SQL = (
+    "INSERT INTO execution_logs (log, level, symbol, stage, error_type, worker, created_at) "
+    "VALUES %s"
+)
+
+_listener = None
+_handler = None
+_log_queue = None
+
+
+class DatabaseLogHandler(logging.Handler):
+    """
+    Batched, non-blocking sink for execution_logs.
+
+    emit() only puts the record on a bounded in-process queue; a background
+    thread inserts up to LOG_BATCH_SIZE rows per statement every
+    LOG_FLUSH_INTERVAL seconds. Under overload records below WARNING are
+    sampled once the queue is LOG_SAMPLE_AT full, and anything that does not
+    fit is dropped and counted instead of stalling the scraper. close()
+    flushes what is left.
+    """
+
+    def __init__(self, level=logging.NOTSET, maxsize=LOG_QUEUE_SIZE):
+        super().__init__(level)
+        self.records = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.sampled_out = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-flusher", daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        fill = self.records.qsize() / self.records.maxsize
+        if fill >= LOG_SAMPLE_AT and record.levelno < logging.WARNING and random.random() >= LOG_SAMPLE_RATE:
+            self.sampled_out += 1
+            return
+        try:
+            self.records.put_nowait(self._row(record))
+        except queue.Full:
+            self.dropped += 1
+
+    def _row(self, record):
+        error_type = getattr(record, 'error_type', None)
+        if error_type is None and record.exc_info and record.exc_info[0]:
+            error_type = record.exc_info[0].__name__
+        return (
+            record.getMessage(),
+            record.levelname,
+            getattr(record, 'symbol', None),
+            getattr(record, 'stage', None),
+            error_type,
+            getattr(record, 'worker', None) or f"{record.processName}:{record.process}",
+            datetime.fromtimestamp(record.created),
+        )
+
+    def _take(self, timeout):
+        rows = []
+        deadline = time.monotonic() + timeout
+        while len(rows) < LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self.records.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        if self.dropped or self.sampled_out:
+            dropped, sampled, self.dropped, self.sampled_out = self.dropped, self.sampled_out, 0, 0
+            rows.append((
+                f"Log sink overloaded: {dropped} records dropped, {sampled} sampled out",
+                'WARNING', None, 'logging', None, f"MainProcess:{os.getpid()}", datetime.now(),
+            ))
+        if rows and execute_values_query(INSERT_LOGS_SQL, rows) is None:
+            print(f"Error: could not write {len(rows)} log records", file=sys.stderr)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._write(self._take(LOG_FLUSH_INTERVAL))
+
+    def flush(self):
+        rows = []
+        while True:
+            try:
+                rows.append(self.records.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(rows), LOG_BATCH_SIZE):
+            self._write(rows[start:start + LOG_BATCH_SIZE])
+
+    def close(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self.flush()
+        super().close()
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Worker-side handler: never blocks the worker when the shared queue is full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.worker = f"{record.processName}:{record.process}"
+        return record
+
+
+def get_logger() -> logging.Logger:
+    return logging.getLogger(LOGGER_NAME)
+
+
+def log_event(message, level=logging.INFO, symbol=None, stage=None, exc=None):
+    """Queue one execution log; returns immediately, the row is written by the flusher."""
+    extra = {'symbol': symbol, 'stage': stage, 'error_type': type(exc).__name__ if exc else None}
+    get_logger().log(level, message, extra=extra)
+    if exc is not None:
+        metrics.inc('errors', error_type=extra['error_type'], stage=stage)
+
+
+def setup_logging():
+    """
+    Install the database sink in the main process and return the queue that
+    ProcessPoolExecutor workers feed (see worker_logging). Safe to call twice.
+    """
+    global _listener, _handler, _log_queue
+    if _listener is not None:
+        return _log_queue
+
+    logger = get_logger()
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    _handler = DatabaseLogHandler()
+    _log_queue = multiprocessing.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(_log_queue, _handler, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_handler)
+    atexit.register(shutdown_logging)
+    return _log_queue
+
+
+def worker_logging(log_queue):
+    """ProcessPoolExecutor initializer: route the worker's records to the parent's sink."""
+    logger = get_logger()
+    # Drop the handlers inherited through fork; the parent's flusher thread does not exist here
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(_DroppingQueueHandler(log_queue))
+
+
+def shutdown_logging():
+    """Drain the worker queue and write every pending record."""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        get_logger().removeHandler(_handler)
+        _handler.close()
+        _handler = None
@@ -0,0 +1,317 @@
+import os
+import json
+import glob
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR", ".metrics")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 30))  # s between snapshots/exports
+METRICS_PREFIX = "stocktwits_"
+
+# Latency buckets in seconds, from a DOM evaluate to a whole symbol crawl
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Registry:
+    """
+    Counters and latency histograms of one process.
+
+    Every process writes its snapshot to METRICS_DIR/<pid>.json every
+    METRICS_INTERVAL seconds and when it exits; export() in the main process
+    merges those files, so pool workers never talk to each other.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _ensure_running(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+            self._thread.start()
+            # Finalize (unlike atexit) also runs when a pool worker process exits
+            Finalize(self, self.close, exitpriority=20)
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._ensure_running()
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            hist['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+            hist['sum'] += seconds
+            hist['count'] += 1
+        self._ensure_running()
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.monotonic() - start, stage=stage, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'pid': self.pid,
+                'started': self.started,
+                'updated': time.time(),
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, dict(labels), dict(hist, buckets=list(hist['buckets']))]
+                    for (name, labels), hist in self.histograms.items()
+                ],
+            }
+
+    def dump(self):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{self.pid}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def _run(self):
+        while not self._stop.wait(METRICS_INTERVAL):
+            self.dump()
+
+    def close(self):
+        self._stop.set()
+        if self.counters or self.histograms:
+            self.dump()
+
+
+class _NullRegistry:
+    """METRICS_ENABLED=0: every call returns immediately."""
+
+    @contextmanager
+    def _null(self):
+        yield
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+    def timer(self, stage, **labels):
+        return self._null()
+
+    def dump(self):
+        pass
+
+    def close(self):
+        pass
+
+
+_registry = None
+
+
+def registry():
+    global _registry
+    if _registry is None or (METRICS_ENABLED and _registry.pid != os.getpid()):
+        _registry = Registry() if METRICS_ENABLED else _NullRegistry()
+    return _registry
+
+
+def inc(name, value=1, **labels):
+    registry().inc(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    registry().observe(name, seconds, **labels)
+
+
+def timer(stage, **labels):
+    """Context manager recording the stage duration in the stage_seconds histogram."""
+    return registry().timer(stage, **labels)
+
+
+def begin_run():
+    """Main process, before starting workers: forget the snapshots of previous runs."""
+    if not METRICS_ENABLED:
+        return
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        os.remove(path)
+
+
+def collect() -> dict:
+    """Merge every process snapshot: totals plus a per-worker breakdown."""
+    registry().dump()
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        if os.path.basename(path).startswith("run."):
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+
+    counters, histograms, workers = {}, {}, {}
+    for snap in snapshots:
+        worker = str(snap['pid'])
+        workers[worker] = {'counters': {}, 'histograms': {}}
+        for name, labels, value in snap['counters']:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+            workers[worker]['counters'][key] = value
+        for name, labels, hist in snap['histograms']:
+            key = _key(name, labels)
+            total = histograms.setdefault(key, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], hist['buckets'])]
+            total['sum'] += hist['sum']
+            total['count'] += hist['count']
+            workers[worker]['histograms'][key] = hist
+
+    started = min((snap['started'] for snap in snapshots), default=time.time())
+    return {
+        'elapsed': time.time() - started,
+        'counters': counters,
+        'histograms': histograms,
+        'workers': workers,
+    }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def to_prometheus(data: dict) -> str:
+    """Prometheus text exposition format; per-worker series carry a `worker` label."""
+    families = {}
+    for worker, series in sorted(data['workers'].items()):
+        wl = (('worker', worker),)
+        for (name, labels), value in sorted(series['counters'].items()):
+            lines = families.setdefault((f"{METRICS_PREFIX}{name}_total", 'counter'), [])
+            lines.append(f"{METRICS_PREFIX}{name}_total{_labels_text(labels, wl)} {value}")
+        for (name, labels), hist in sorted(series['histograms'].items()):
+            metric = f"{METRICS_PREFIX}{name}"
+            lines = families.setdefault((metric, 'histogram'), [])
+            cumulative = 0
+            for bound, count in zip(list(BUCKETS) + ['+Inf'], hist['buckets']):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_labels_text(labels, wl + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels_text(labels, wl)} {hist['sum']:.6f}")
+            lines.append(f"{metric}_count{_labels_text(labels, wl)} {hist['count']}")
+
+    out = [f"# TYPE {METRICS_PREFIX}run_seconds gauge", f"{METRICS_PREFIX}run_seconds {data['elapsed']:.3f}"]
+    for (metric, kind), lines in sorted(families.items()):
+        out.append(f"# TYPE {metric} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+def _quantile(hist, q):
+    target = hist['count'] * q
+    cumulative = 0
+    for bound, count in zip(list(BUCKETS) + [float('inf')], hist['buckets']):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return float('inf')
+
+
+def to_json(data: dict) -> dict:
+    """JSON snapshot: totals, per-second rates of counters, histogram quantile bounds, per worker."""
+    def series(name, labels):
+        return {'name': name, 'labels': dict(labels)}
+
+    elapsed = max(data['elapsed'], 1e-9)
+    return {
+        'elapsed': data['elapsed'],
+        'counters': [
+            dict(series(name, labels), value=value, per_sec=value / elapsed)
+            for (name, labels), value in sorted(data['counters'].items())
+        ],
+        'histograms': [
+            dict(series(name, labels), count=hist['count'], sum=hist['sum'],
+                 avg=hist['sum'] / hist['count'] if hist['count'] else 0,
+                 p50=_quantile(hist, 0.5), p95=_quantile(hist, 0.95), p99=_quantile(hist, 0.99))
+            for (name, labels), hist in sorted(data['histograms'].items())
+        ],
+        'workers': {
+            worker: {
+                'counters': [dict(series(n, l), value=v) for (n, l), v in sorted(s['counters'].items())],
+                'histograms': [dict(series(n, l), count=h['count'], sum=h['sum'])
+                               for (n, l), h in sorted(s['histograms'].items())],
+            }
+            for worker, s in sorted(data['workers'].items())
+        },
+    }
+
+
+def export(out_dir=METRICS_DIR):
+    """Write run.prom and run.json (merged across processes) into `out_dir`."""
+    if not METRICS_ENABLED:
+        return None
+    data = collect()
+    os.makedirs(out_dir, exist_ok=True)
+    prom_path = os.path.join(out_dir, "run.prom")
+    with open(f"{prom_path}.tmp", "w") as f:
+        f.write(to_prometheus(data))
+    os.replace(f"{prom_path}.tmp", prom_path)
+    json_path = os.path.join(out_dir, "run.json")
+    with open(f"{json_path}.tmp", "w") as f:
+        json.dump(to_json(data), f, indent=2, default=str)
+    os.replace(f"{json_path}.tmp", json_path)
+    return json_path
+
+
+class PeriodicExport:
+    """Main process: re-export the merged metrics every `interval` seconds and once more on close()."""
+
+    def __init__(self, interval=METRICS_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            export()
+
+    def start(self):
+        if METRICS_ENABLED:
+            begin_run()
+            registry()  # the run clock starts now
+            self._thread.start()
+        return self
+
+    def close(self):
+        if METRICS_ENABLED:
+            self._stop.set()
+            if self._thread.is_alive():
+                self._thread.join()
+            export()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import fcntl
+import asyncio
+from contextlib import contextmanager
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from config import metrics
+
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", 2))  # requests/sec for the whole account
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", ".pacing/rate_limit.json")
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", 5))  # s
+BACKOFF_MAX = float(os.getenv("BACKOFF_MAX", 300))  # s
+WAIT_TIMEOUT = float(os.getenv("WAIT_TIMEOUT", 15))  # s
+MAX_RETRIES = int(os.getenv("PACING_MAX_RETRIES", 3))
+SCROLL_RETRIES = int(os.getenv("PACING_SCROLL_RETRIES", 1))  # extra scrolls before calling the stream finished
+
+THROTTLE_STATUSES = {429, 503}
+
+COUNT_JS = "(selector) => document.querySelectorAll(selector).length"
+COUNT_GROWTH_JS = "([selector, previous]) => document.querySelectorAll(selector).length > previous"
+SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight);"
+
+
+class WaitStats:
+    """Per wait type: how many waits, total/max seconds and how many timed out."""
+
+    def __init__(self):
+        self.waits = {}
+
+    def record(self, kind, seconds, timed_out=False):
+        entry = self.waits.setdefault(kind, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+        entry['count'] += 1
+        entry['total'] += seconds
+        entry['max'] = max(entry['max'], seconds)
+        entry['timeouts'] += int(timed_out)
+        metrics.observe('wait_seconds', seconds, kind=kind)
+        if timed_out:
+            metrics.inc('wait_timeouts', kind=kind)
+
+    def summary(self) -> str:
+        return "; ".join(
+            f"{kind}: n={e['count']} avg={e['total'] / e['count']:.2f}s max={e['max']:.2f}s timeouts={e['timeouts']}"
+            for kind, e in sorted(self.waits.items())
+        )
+
+
+stats = WaitStats()
+
+
+@contextmanager
+def timed(kind):
+    """Time a Playwright wait; a timeout is recorded and swallowed (check outcome['timed_out'])."""
+    start = time.monotonic()
+    outcome = {'timed_out': False}
+    try:
+        yield outcome
+    except PlaywrightTimeoutError:
+        outcome['timed_out'] = True
+    finally:
+        stats.record(kind, time.monotonic() - start, outcome['timed_out'])
+
+
+class RateLimiter:
+    """
+    Token spacing shared by every worker process of the account.
+
+    The next free request slot and the current backoff penalty live in a small
+    JSON file guarded by flock, so N processes together stay under `rate`
+    requests/sec. backoff() pushes the next slot out exponentially after a
+    throttling response; success() halves the penalty again.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_RPS, path=RATE_LIMIT_PATH):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @contextmanager
+    def _state(self):
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw else {'next_slot': 0.0, 'penalty': 0.0}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reserve(self) -> float:
+        """Claim the next slot; returns how long the caller has to wait for it."""
+        if self.interval == 0:
+            return 0.0
+        now = time.time()
+        with self._state() as state:
+            slot = max(now, state['next_slot'])
+            state['next_slot'] = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        stats.record('rate_limit', delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stats.record('rate_limit', delay)
+
+    def backoff(self) -> float:
+        with self._state() as state:
+            state['penalty'] = min(max(state['penalty'] * 2, BACKOFF_BASE), BACKOFF_MAX)
+            state['next_slot'] = max(state['next_slot'], time.time() + state['penalty'])
+            penalty = state['penalty']
+        stats.record('backoff', penalty)
+        return penalty
+
+    def success(self):
+        with self._state() as state:
+            if state['penalty']:
+                state['penalty'] = state['penalty'] / 2 if state['penalty'] / 2 >= BACKOFF_BASE else 0.0
+
+
+_limiter = None
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+def _throttled(url, response):
+    return RuntimeError(f"{url} still throttled (HTTP {response.status}) after {MAX_RETRIES} retries")
+
+
+def goto(page, url, **kwargs):
+    """page.goto behind the rate limiter, retried with backoff on 429/503; raises once the retries run out."""
+    limiter = get_limiter()
+    for _ in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        start = time.monotonic()
+        response = page.goto(url, wait_until="domcontentloaded", **kwargs)
+        stats.record('navigation', time.monotonic() - start)
+        if response is None or response.status not in THROTTLE_STATUSES:
+            limiter.success()
+            return response
+        limiter.backoff()
+    raise _throttled(url, response)
+
+
+async def goto_async(page, url, **kwargs):
+    limiter = get_limiter()
+    for _ in range(MAX_RETRIES + 1):
+        await limiter.acquire_async()
+        start = time.monotonic()
+        response = await page.goto(url, wait_until="domcontentloaded", **kwargs)
+        stats.record('navigation', time.monotonic() - start)
+        if response is None or response.status not in THROTTLE_STATUSES:
+            limiter.success()
+            return response
+        limiter.backoff()
+    raise _throttled(url, response)
+
+
+def wait_for_selector(page, selector, timeout=WAIT_TIMEOUT) -> bool:
+    with timed('selector') as outcome:
+        page.wait_for_selector(selector, timeout=timeout * 1000)
+    return not outcome['timed_out']
+
+
+async def wait_for_selector_async(page, selector, timeout=WAIT_TIMEOUT) -> bool:
+    start = time.monotonic()
+    timed_out = False
+    try:
+        await page.wait_for_selector(selector, timeout=timeout * 1000)
+    except PlaywrightTimeoutError:
+        timed_out = True
+    stats.record('selector', time.monotonic() - start, timed_out)
+    return not timed_out
+
+
+def wait_for_count_growth(page, selector, previous, timeout=WAIT_TIMEOUT) -> bool:
+    """Wait until more than `previous` elements match `selector` (e.g. after a scroll)."""
+    with timed('count_growth') as outcome:
+        page.wait_for_function(COUNT_GROWTH_JS, arg=[selector, previous], timeout=timeout * 1000)
+    return not outcome['timed_out']
+
+
+def scroll_for_more(page, selector, previous, timeout=WAIT_TIMEOUT, retries=SCROLL_RETRIES) -> bool:
+    """
+    Scroll to the bottom (behind the rate limiter) until more than `previous`
+    elements match `selector`. A wait that times out is not taken as the end
+    of the stream right away: the page is left to settle and scrolled again
+    up to `retries` times. Returns False only when a settled page brought
+    nothing new; raises TimeoutError when the page never settled (a slow
+    load, not the end of the stream).
+    """
+    settled = True
+    for attempt in range(retries + 1):
+        if attempt:
+            settled = wait_for_network_idle(page, timeout)
+        get_limiter().acquire()
+        page.evaluate(SCROLL_JS)
+        if wait_for_count_growth(page, selector, previous, timeout):
+            return True
+    if not settled:
+        raise TimeoutError(f"no new messages after {retries + 1} scrolls and the page is still loading")
+    return False
+
+
+def wait_for_network_idle(page, timeout=WAIT_TIMEOUT) -> bool:
+    with timed('network_idle') as outcome:
+        page.wait_for_load_state("networkidle", timeout=timeout * 1000)
+    return not outcome['timed_out']
+
+
+def count(page, selector) -> int:
+    return page.evaluate(COUNT_JS, selector)
+
+
+@contextmanager
+def watch_throttling(page):
+    """Back off the shared limiter when any request of `page` is throttled inside the block."""
+    limiter = get_limiter()
+
+    def on_response(response):
+        if response.status in THROTTLE_STATUSES:
+            limiter.backoff()
+
+    page.on("response", on_response)
+    try:
+        yield on_response
+    finally:
+        page.remove_listener("response", on_response)
@@ -0,0 +1,208 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from config.database import execute_query, execute_values_query, prepare, execute_prepared
+from config.logs import log_event
+from config import metrics
+
+POST_BATCH_SIZE = int(os.getenv("POST_BATCH_SIZE", 200))
+POST_FLUSH_INTERVAL = float(os.getenv("POST_FLUSH_INTERVAL", 10))
+KNOWN_IDS_LIMIT = int(os.getenv("KNOWN_IDS_LIMIT", 5000))
+EARLY_STOP_MESSAGES = int(os.getenv("EARLY_STOP_MESSAGES", 30))
+
+POST_COLUMNS = (
+    "symbol", "post_id", "post_author", "post_date", "post_text",
+    "post_comments", "post_reshares", "post_likes", "post_img_path",
+)
+
+# NOT NULL in stocktwits_posts: a row without one of them would fail its whole batch
+REQUIRED_COLUMNS = ("symbol", "post_id", "post_author", "post_date", "post_text")
+
+INSERT_POSTS_SQL = (
+    f"INSERT INTO stocktwits_posts ({', '.join(POST_COLUMNS)}) "
+    "VALUES %s "
+    "ON CONFLICT (post_id, symbol) DO NOTHING "
+    "RETURNING post_id"
+)
+
+EXISTING_POSTS_SQL = (
+    "SELECT post_id FROM stocktwits_posts "
+    "WHERE symbol = %s AND post_id = ANY(%s)"
+)
+prepare('existing_posts', EXISTING_POSTS_SQL)
+
+RECENT_POSTS_SQL = (
+    "SELECT post_id, post_date FROM stocktwits_posts "
+    "WHERE symbol = %s "
+    "ORDER BY post_id DESC "
+    "LIMIT %s"
+)
+
+
+def existing_post_ids(symbol, post_ids) -> set:
+    """Single round trip: which of `post_ids` are already stored for `symbol`."""
+    post_ids = [int(post_id) for post_id in post_ids]
+    if not post_ids:
+        return set()
+    rows = execute_prepared('existing_posts', (symbol, post_ids))
+    return {row['post_id'] for row in rows} if rows else set()
+
+
+class KnownPosts:
+    """
+    Ids already stored for one symbol, loaded once before the crawl.
+
+    Holds the newest `limit` post ids (the part of the stream a re-crawl walks
+    first) plus the newest post_id/post_date watermark. Ids older than the
+    loaded window are checked against the database in one batched lookup.
+    `streak` counts consecutive known messages in stream order; once it
+    reaches `stop_after` the crawl has caught up with the previous run.
+    """
+
+    def __init__(self, symbol, limit=KNOWN_IDS_LIMIT, stop_after=EARLY_STOP_MESSAGES):
+        self.symbol = symbol
+        self.stop_after = stop_after
+        with metrics.timer('db_read', table='stocktwits_posts'):
+            rows = execute_query(RECENT_POSTS_SQL, (symbol, limit)) or []
+        self.ids = {row['post_id'] for row in rows}
+        self.newest_id = rows[0]['post_id'] if rows else None
+        self.newest_date = rows[0]['post_date'] if rows else None
+        # Below the floor the set is incomplete and the database decides
+        self.floor = rows[-1]['post_id'] if len(rows) >= limit else None
+        self.streak = 0
+
+    def filter_new(self, post_ids) -> list:
+        """Return the ids of `post_ids` not stored yet, keeping their order."""
+        post_ids = [int(post_id) for post_id in post_ids]
+        older = [post_id for post_id in post_ids if self.floor is not None and post_id < self.floor]
+        known = self.ids | existing_post_ids(self.symbol, older)
+
+        new_ids = []
+        for post_id in post_ids:
+            if post_id in known:
+                self.streak += 1
+            else:
+                self.streak = 0
+                new_ids.append(post_id)
+        self.ids.update(post_ids)
+        return new_ids
+
+    @property
+    def caught_up(self) -> bool:
+        return self.stop_after > 0 and self.streak >= self.stop_after
+
+
+class PostWriter:
+    """
+    Buffers scraped posts and writes them with one multi-row INSERT.
+
+    The buffer is flushed when it reaches `batch_size` rows, when the oldest
+    buffered row is older than `flush_interval` seconds, on close() and at
+    interpreter exit. Duplicates are dropped by the (post_id, symbol) unique
+    key instead of a SELECT before every insert. Posts missing a NOT NULL
+    column are dropped in add(). When a batch fails its rows are retried one
+    at a time and the rows the database still rejects are logged and
+    dropped; if none gets through and the database does not answer, the
+    batch stays buffered for the next flush and close() raises, so the
+    crawl fails and is retried.
+    """
+
+    def __init__(self, batch_size=POST_BATCH_SIZE, flush_interval=POST_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows = []
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._first_buffered = None
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def add(self, post: dict):
+        missing = [column for column in REQUIRED_COLUMNS if post.get(column) is None]
+        if missing:
+            self._reject(post.get('symbol'), post.get('post_id'), f"no {', '.join(missing)}")
+            return
+        row = tuple(post.get(column) for column in POST_COLUMNS)
+        with self._lock:
+            if not self.rows:
+                self._first_buffered = time.monotonic()
+            self.rows.append(row)
+            # Multiples only: rows kept after a failed write are not retried on every add
+            full = len(self.rows) % self.batch_size == 0
+        if full:
+            self.flush()
+
+    def _reject(self, symbol, post_id, reason):
+        self.rejected += 1
+        metrics.inc('posts', symbol=symbol, result='rejected')
+        log_event(f"Post {post_id} dropped: {reason}", level=logging.WARNING, symbol=symbol, stage='store')
+
+    def _write_singly(self, rows):
+        """
+        Row by row after a failed batch: (RETURNING rows, rows dropped), or
+        None when nothing got in and the database is unreachable.
+        """
+        written, failed = [], []
+        for row in rows:
+            result = execute_values_query(INSERT_POSTS_SQL, [row])
+            if result is None:
+                failed.append(row)
+            else:
+                written.extend(result)
+        if len(failed) == len(rows) and execute_query("SELECT 1") is None:
+            return None
+        for row in failed:
+            self._reject(row[0], row[1], "rejected by the database")
+        return written, len(failed)
+
+    def flush(self):
+        with self._lock:
+            rows, self.rows = self.rows, []
+            self._first_buffered = None
+        if not rows:
+            return 0
+        dropped = 0
+        with metrics.timer('db_write', table='stocktwits_posts'):
+            result = execute_values_query(INSERT_POSTS_SQL, rows)
+            if result is None:
+                outcome = self._write_singly(rows)
+                if outcome is not None:
+                    result, dropped = outcome
+        if result is None:
+            with self._lock:
+                self.rows = rows + self.rows
+                self._first_buffered = time.monotonic()
+            log_event(f"Could not write {len(rows)} posts, kept for retry", level=logging.ERROR,
+                      symbol=rows[0][0], stage='store')
+            return 0
+        self.inserted += len(result)
+        self.duplicates += len(rows) - len(result) - dropped
+        return len(result)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(min(self.flush_interval, 1.0)):
+            first = self._first_buffered
+            if first is not None and time.monotonic() - first >= self.flush_interval:
+                self.flush()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._timer.join()
+        atexit.unregister(self.close)
+        self.flush()
+        if self.rows:
+            raise RuntimeError(f"could not write {len(self.rows)} posts")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
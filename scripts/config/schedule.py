@@ -0,0 +1,120 @@
+import os
+from config.database import cursor, execute_query
+from config import metrics
+
+SCHEDULE_TARGET_POSTS = float(os.getenv("SCHEDULE_TARGET_POSTS", 30))  # new posts a crawl should find
+SCHEDULE_MIN_INTERVAL = float(os.getenv("SCHEDULE_MIN_INTERVAL", 300))  # s between crawls of a symbol
+SCHEDULE_MAX_INTERVAL = float(os.getenv("SCHEDULE_MAX_INTERVAL", 86400))  # s, even quiet symbols are re-checked
+SCHEDULE_ALPHA = float(os.getenv("SCHEDULE_ALPHA", 0.3))  # weight of the last crawl in the moving averages
+SCHEDULE_MIN_CRAWL_SECONDS = float(os.getenv("SCHEDULE_MIN_CRAWL_SECONDS", 5))
+SCHEDULE_MAX_SYMBOLS = int(os.getenv("SCHEDULE_MAX_SYMBOLS", 0))  # per run, 0 = every due symbol
+
+SYNC_SYMBOLS_SQL = (
+    "INSERT INTO symbol_schedule (symbol) "
+    "SELECT DISTINCT symbol FROM symbols "
+    "ON CONFLICT (symbol) DO NOTHING"
+)
+
+SCHEDULE_SQL = (
+    "SELECT symbol, velocity, crawl_seconds, crawls, last_crawl_at, next_due_at, LOCALTIMESTAMP AS now "
+    "FROM symbol_schedule "
+    "WHERE next_due_at <= LOCALTIMESTAMP OR %s"
+)
+
+LOCK_SYMBOL_SQL = (
+    "SELECT velocity, crawl_seconds, new_posts, crawls, last_crawl_at, LOCALTIMESTAMP AS now "
+    "FROM symbol_schedule WHERE symbol = %s FOR UPDATE"
+)
+
+# First crawl: no previous crawl to measure against, so the rate comes from the stored post dates
+RECENT_RATE_SQL = (
+    "SELECT COUNT(*) / 24.0 AS per_hour FROM stocktwits_posts "
+    "WHERE symbol = %s AND post_date > (SELECT MAX(post_date) FROM stocktwits_posts WHERE symbol = %s) - interval '24 hours'"
+)
+
+UPDATE_SCHEDULE_SQL = (
+    "UPDATE symbol_schedule SET velocity = %s, crawl_seconds = %s, new_posts = %s, "
+    "crawls = crawls + 1, missed_crawls = missed_crawls + %s, last_crawl_at = %s, "
+    "next_due_at = %s + make_interval(secs => %s), updated_at = now() "
+    "WHERE symbol = %s"
+)
+
+
+def _ewma(previous, observed, first):
+    return observed if first else SCHEDULE_ALPHA * observed + (1 - SCHEDULE_ALPHA) * previous
+
+
+def interval_seconds(velocity) -> float:
+    """Time for `velocity` (posts/hour) to produce SCHEDULE_TARGET_POSTS, within the min/max interval."""
+    if velocity <= 0:
+        return SCHEDULE_MAX_INTERVAL
+    return min(SCHEDULE_MAX_INTERVAL, max(SCHEDULE_MIN_INTERVAL, SCHEDULE_TARGET_POSTS / velocity * 3600))
+
+
+def priority(row) -> float:
+    """
+    Expected new posts per second of crawling: posts accumulated since the
+    last crawl at the measured velocity, over the measured crawl time.
+    Symbols never crawled go first.
+    """
+    if not row['crawls'] or row['last_crawl_at'] is None:
+        return float('inf')
+    hours = max(0.0, (row['now'] - row['last_crawl_at']).total_seconds() / 3600)
+    return row['velocity'] * hours / max(row['crawl_seconds'], SCHEDULE_MIN_CRAWL_SECONDS)
+
+
+def sync_symbols():
+    """Every symbol of the symbols table gets a schedule row (new ones are due at once)."""
+    execute_query(SYNC_SYMBOLS_SQL)
+
+
+def due_symbols(limit=SCHEDULE_MAX_SYMBOLS, everything=False) -> list:
+    """(symbol, priority) of the symbols due now, best first; `everything` ignores the due times."""
+    rows = execute_query(SCHEDULE_SQL, (everything,)) or []
+    ranked = sorted(((row['symbol'], priority(row)) for row in rows), key=lambda item: -item[1])
+    return ranked[:limit] if limit else ranked
+
+
+def enqueue_due(queue, limit=SCHEDULE_MAX_SYMBOLS, everything=False) -> list:
+    """
+    Put the due symbols on the job queue with their priority. A symbol whose
+    crawl is still running is skipped by the queue, so a symbol is never
+    crawled by two workers at once. Returns the symbols queued.
+    """
+    sync_symbols()
+    return queue.schedule((symbol, {'symbol': symbol}, p) for symbol, p in due_symbols(limit, everything))
+
+
+def record_crawl(symbol, new_posts, seconds, caught_up):
+    """
+    Fold one finished crawl into the symbol's velocity (posts/hour) and crawl
+    time moving averages and set its next due time. A crawl that ran out of
+    stream before reaching the posts stored by the previous one may have
+    missed posts: it counts as a missed crawl and the velocity is not
+    smoothed down, so the next crawl comes sooner.
+    """
+    with cursor() as cur:
+        cur.execute(LOCK_SYMBOL_SQL, (symbol,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        first = not row['crawls'] or row['last_crawl_at'] is None
+        if first:
+            cur.execute(RECENT_RATE_SQL, (symbol, symbol))
+            observed = float(cur.fetchone()['per_hour'] or 0)
+        else:
+            hours = max((row['now'] - row['last_crawl_at']).total_seconds() / 3600, 1 / 3600)
+            observed = new_posts / hours
+
+        missed = not first and not caught_up and new_posts > 0
+        velocity = _ewma(row['velocity'], observed, first)
+        if missed:
+            velocity = max(velocity, observed)
+            metrics.inc('missed_crawls', symbol=symbol)
+        crawl_seconds = _ewma(row['crawl_seconds'], seconds, first)
+        interval = interval_seconds(velocity)
+        cur.execute(UPDATE_SCHEDULE_SQL, (
+            velocity, crawl_seconds, _ewma(row['new_posts'], new_posts, first),
+            int(missed), row['now'], row['now'], interval, symbol,
+        ))
+    return {'velocity': velocity, 'crawl_seconds': crawl_seconds, 'interval': interval, 'missed': missed}
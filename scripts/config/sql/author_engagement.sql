@@ -0,0 +1,107 @@
+-- Per-author engagement rollup, kept current by statement-level triggers on
+-- stocktwits_posts. Idempotent: scraping_authors runs it on every start.
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS stocktwits_posts_post_author_index ON stocktwits_posts(post_author);
+
+CREATE TABLE IF NOT EXISTS author_engagement
+(
+    post_author varchar(255) NOT NULL,
+    posts bigint NOT NULL DEFAULT 0,
+    likes_sum bigint NOT NULL DEFAULT 0,
+    likes_count bigint NOT NULL DEFAULT 0,
+    reshares_sum bigint NOT NULL DEFAULT 0,
+    reshares_count bigint NOT NULL DEFAULT 0,
+    comments_sum bigint NOT NULL DEFAULT 0,
+    comments_count bigint NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (post_author)
+);
+
+-- Statement-level triggers: one grouped upsert per INSERT/UPDATE statement,
+-- so a multi-row insert from the post writer costs one rollup update.
+CREATE OR REPLACE FUNCTION author_engagement_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO author_engagement AS ae
+        (post_author, posts, likes_sum, likes_count, reshares_sum, reshares_count, comments_sum, comments_count, updated_at)
+    SELECT
+        post_author, COUNT(*),
+        COALESCE(SUM(post_likes), 0), COUNT(post_likes),
+        COALESCE(SUM(post_reshares), 0), COUNT(post_reshares),
+        COALESCE(SUM(post_comments), 0), COUNT(post_comments),
+        now()
+    FROM new_rows
+    GROUP BY post_author
+    ON CONFLICT (post_author) DO UPDATE SET
+        posts = ae.posts + EXCLUDED.posts,
+        likes_sum = ae.likes_sum + EXCLUDED.likes_sum,
+        likes_count = ae.likes_count + EXCLUDED.likes_count,
+        reshares_sum = ae.reshares_sum + EXCLUDED.reshares_sum,
+        reshares_count = ae.reshares_count + EXCLUDED.reshares_count,
+        comments_sum = ae.comments_sum + EXCLUDED.comments_sum,
+        comments_count = ae.comments_count + EXCLUDED.comments_count,
+        updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Metric refreshes: add new values, subtract the old ones
+CREATE OR REPLACE FUNCTION author_engagement_on_update() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO author_engagement AS ae
+        (post_author, posts, likes_sum, likes_count, reshares_sum, reshares_count, comments_sum, comments_count, updated_at)
+    SELECT
+        d.post_author,
+        SUM(d.sign),
+        SUM(d.sign * COALESCE(d.post_likes, 0)), SUM(d.sign * (d.post_likes IS NOT NULL)::int),
+        SUM(d.sign * COALESCE(d.post_reshares, 0)), SUM(d.sign * (d.post_reshares IS NOT NULL)::int),
+        SUM(d.sign * COALESCE(d.post_comments, 0)), SUM(d.sign * (d.post_comments IS NOT NULL)::int),
+        now()
+    FROM (
+        SELECT 1 AS sign, post_author, post_likes, post_reshares, post_comments FROM new_rows
+        UNION ALL
+        SELECT -1, post_author, post_likes, post_reshares, post_comments FROM old_rows
+    ) AS d
+    GROUP BY d.post_author
+    -- updates that touched other columns (e.g. post_img_path) leave the rollup alone
+    HAVING SUM(d.sign) <> 0
+        OR SUM(d.sign * COALESCE(d.post_likes, 0)) <> 0 OR SUM(d.sign * (d.post_likes IS NOT NULL)::int) <> 0
+        OR SUM(d.sign * COALESCE(d.post_reshares, 0)) <> 0 OR SUM(d.sign * (d.post_reshares IS NOT NULL)::int) <> 0
+        OR SUM(d.sign * COALESCE(d.post_comments, 0)) <> 0 OR SUM(d.sign * (d.post_comments IS NOT NULL)::int) <> 0
+    ON CONFLICT (post_author) DO UPDATE SET
+        posts = ae.posts + EXCLUDED.posts,
+        likes_sum = ae.likes_sum + EXCLUDED.likes_sum,
+        likes_count = ae.likes_count + EXCLUDED.likes_count,
+        reshares_sum = ae.reshares_sum + EXCLUDED.reshares_sum,
+        reshares_count = ae.reshares_count + EXCLUDED.reshares_count,
+        comments_sum = ae.comments_sum + EXCLUDED.comments_sum,
+        comments_count = ae.comments_count + EXCLUDED.comments_count,
+        updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS author_engagement_insert ON stocktwits_posts;
+DROP TRIGGER IF EXISTS author_engagement_update ON stocktwits_posts;
+
+CREATE TRIGGER author_engagement_insert
+    AFTER INSERT ON stocktwits_posts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION author_engagement_on_insert();
+
+CREATE TRIGGER author_engagement_update
+    AFTER UPDATE ON stocktwits_posts
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION author_engagement_on_update();
+
+-- First run: one set-based pass over the existing posts
+INSERT INTO author_engagement
+    (post_author, posts, likes_sum, likes_count, reshares_sum, reshares_count, comments_sum, comments_count)
+SELECT
+    post_author, COUNT(*),
+    COALESCE(SUM(post_likes), 0), COUNT(post_likes),
+    COALESCE(SUM(post_reshares), 0), COUNT(post_reshares),
+    COALESCE(SUM(post_comments), 0), COUNT(post_comments)
+FROM stocktwits_posts
+WHERE NOT EXISTS (SELECT 1 FROM author_engagement)
+GROUP BY post_author;
+
+END;
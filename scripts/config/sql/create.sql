@@ -23,6 +23,9 @@ CREATE TABLE IF NOT EXISTS symbols
     PRIMARY KEY (id)
 );
 
+-- Crawl count per symbol (scraping_tweets.process_symbol)
+ALTER TABLE symbols ADD COLUMN IF NOT EXISTS execution_counter bigint NOT NULL DEFAULT 0;
+
 CREATE TABLE IF NOT EXISTS execution_logs
 (
     id serial NOT NULL,
@@ -31,6 +34,14 @@ CREATE TABLE IF NOT EXISTS execution_logs
     PRIMARY KEY (id)
 );
 
+-- Structured fields written by the batched log sink (config/logs.py)
+ALTER TABLE execution_logs
+    ADD COLUMN IF NOT EXISTS level varchar(16),
+    ADD COLUMN IF NOT EXISTS symbol varchar(255),
+    ADD COLUMN IF NOT EXISTS stage varchar(64),
+    ADD COLUMN IF NOT EXISTS error_type varchar(255),
+    ADD COLUMN IF NOT EXISTS worker varchar(255);
+
 CREATE TABLE IF NOT EXISTS stocktwits_authors
 (
     id serial NOT NULL,
@@ -45,9 +56,96 @@ CREATE TABLE IF NOT EXISTS stocktwits_authors
     PRIMARY KEY (id)
 );
 
+CREATE TABLE IF NOT EXISTS scrape_jobs
+(
+    id bigserial NOT NULL,
+    queue varchar(64) NOT NULL,
+    item_key text NOT NULL,
+    payload jsonb,
+    status varchar(16) NOT NULL DEFAULT 'pending',
+    attempts int NOT NULL DEFAULT 0,
+    leased_by text,
+    leased_until timestamp,
+    last_error text,
+    created_at TIMESTAMP DEFAULT current_timestamp,
+    updated_at TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (id),
+    UNIQUE (queue, item_key)
+);
+
+CREATE INDEX IF NOT EXISTS scrape_jobs_queue_status_index ON scrape_jobs(queue, status, id);
+
+-- Claim order within a queue (config/jobs.py); 0 for queues that do not prioritize
+ALTER TABLE scrape_jobs ADD COLUMN IF NOT EXISTS priority double precision NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS scrape_jobs_queue_priority_index ON scrape_jobs(queue, status, priority DESC, id);
+
+-- Per-symbol post velocity, crawl cost and next due time (config/schedule.py)
+CREATE TABLE IF NOT EXISTS symbol_schedule
+(
+    symbol varchar(255) NOT NULL,
+    velocity double precision NOT NULL DEFAULT 0,
+    crawl_seconds double precision NOT NULL DEFAULT 0,
+    new_posts double precision NOT NULL DEFAULT 0,
+    crawls bigint NOT NULL DEFAULT 0,
+    missed_crawls bigint NOT NULL DEFAULT 0,
+    last_crawl_at timestamp,
+    next_due_at timestamp NOT NULL DEFAULT LOCALTIMESTAMP,
+    updated_at TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (symbol)
+);
+
+CREATE INDEX IF NOT EXISTS symbol_schedule_next_due_index ON symbol_schedule(next_due_at);
+
+-- Last post scored per sentiment model configuration (sentiment/incremental.py)
+CREATE TABLE IF NOT EXISTS sentiment_watermarks
+(
+    model_key varchar(255) NOT NULL,
+    last_post_id bigint NOT NULL DEFAULT 0,
+    last_post_date timestamp,
+    scored bigint NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (model_key)
+);
+
+ALTER TABLE sentiment_watermarks ADD COLUMN IF NOT EXISTS ids_from bigint;
+ALTER TABLE sentiment_watermarks ADD COLUMN IF NOT EXISTS pending_part text;
+
+-- Ids scored per model near the watermark, so a late-committed post below it is still scored once
+CREATE TABLE IF NOT EXISTS sentiment_scored_ids
+(
+    model_key varchar(255) NOT NULL,
+    id bigint NOT NULL,
+    PRIMARY KEY (model_key, id)
+);
+
+-- Hourly/daily sentiment index per symbol and for all symbols ('*'), additive sums (sentiment/rollups.py)
+CREATE TABLE IF NOT EXISTS sentiment_rollups
+(
+    model_key varchar(255) NOT NULL,
+    granularity varchar(8) NOT NULL,
+    bucket timestamp NOT NULL,
+    symbol varchar(255) NOT NULL,
+    posts bigint NOT NULL DEFAULT 0,
+    bullish bigint NOT NULL DEFAULT 0,
+    bearish bigint NOT NULL DEFAULT 0,
+    neutral bigint NOT NULL DEFAULT 0,
+    sentiment_sum double precision NOT NULL DEFAULT 0,
+    confidence_sum double precision NOT NULL DEFAULT 0,
+    weighted_sum double precision NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT current_timestamp,
+    PRIMARY KEY (model_key, granularity, symbol, bucket)
+);
+
 CREATE INDEX IF NOT EXISTS stocktwits_posts_post_id_index ON stocktwits_posts(post_id);
 CREATE INDEX IF NOT EXISTS stocktwits_posts_symbol_index ON stocktwits_posts(symbol);
-ALTER TABLE public.stocktwits_posts ADD CONSTRAINT stocktwits_posts_post_id_symbol_key UNIQUE (post_id, symbol);
+
+-- Unique key used by ON CONFLICT (post_id, symbol) DO NOTHING in config/posts.py
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'stocktwits_posts_post_id_symbol_key') THEN
+        ALTER TABLE public.stocktwits_posts ADD CONSTRAINT stocktwits_posts_post_id_symbol_key UNIQUE (post_id, symbol);
+    END IF;
+END $$;
 
 END;
 
@@ -0,0 +1,44 @@
+import sys
+sys.path.insert(0, '../')
+import time
+import argparse
+from dotenv import load_dotenv
+from sentiment.storage import DATASETS, dataset_root, export_csv
+from sentiment.inference import model_key
+
+load_dotenv()
+
+DEFAULT_SOURCES = {
+    'sentiment': '../data/stocktwits_sentiment.csv',
+    'market': '../data/market_data.csv',
+    'authors': '../data/authors_data.csv',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the CSV datasets to Parquet partitioned by symbol/month.")
+    parser.add_argument("datasets", nargs="*", metavar="dataset",
+                        help=f"any of {', '.join(sorted(DATASETS))} (default: all)")
+    parser.add_argument("--source", help="CSV path (only with a single dataset)")
+    parser.add_argument("--model-key", default=model_key(),
+                        help="model that scored the sentiment CSV (default: the notebook's FinTwitBERT pipeline)")
+    args = parser.parse_args()
+    # Checked here: argparse rejects an empty nargs="*" positional with choices on some Python versions
+    unknown = sorted(set(args.datasets) - set(DATASETS))
+    if unknown:
+        parser.error(f"unknown datasets: {', '.join(unknown)} (choose from {', '.join(sorted(DATASETS))})")
+    args.datasets = args.datasets or sorted(DATASETS)
+    if args.source and len(args.datasets) != 1:
+        parser.error("--source needs exactly one dataset")
+
+    for dataset in args.datasets:
+        source = args.source or DEFAULT_SOURCES[dataset]
+        start = time.perf_counter()
+        rows = export_csv(source, dataset, model_key=args.model_key if dataset == 'sentiment' else None)
+        print(f"{dataset}: {rows} rows from {source} -> "
+              f"{dataset_root(dataset, args.model_key if dataset == 'sentiment' else None)} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.insert(0, '../')
+import time
+import argparse
+from dotenv import load_dotenv
+from sentiment import econometrics
+from sentiment.inference import model_key
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align sentiment with market bars and test their relationship per symbol.")
+    parser.add_argument("--model-key", default=model_key())
+    parser.add_argument("--symbols", nargs="*", help="default: every symbol with market data")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--lags", type=int, default=5)
+    parser.add_argument("--window", type=int, default=30, help="rolling correlation window (bars)")
+    parser.add_argument("--vol-window", type=int, default=20, help="realized volatility window (bars)")
+    parser.add_argument("--signal", default="sentiment", choices=("sentiment", "weighted_sentiment", "bullish_share"))
+    parser.add_argument("--workers", type=int, default=econometrics.ECON_WORKERS)
+    parser.add_argument("--refresh", action="store_true", help="rebuild the cached aligned panel")
+    parser.add_argument("--out", default="../data/results", help="directory for the result CSVs")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    panel = econometrics.aligned_panel(args.model_key, args.symbols, args.start, args.end,
+                                       vol_window=args.vol_window, refresh=args.refresh)
+    print(f"Aligned panel: {len(panel)} bars, {panel['symbol'].nunique()} symbols "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    results = econometrics.run_tests(panel, lags=args.lags, window=args.window,
+                                     signal=args.signal, workers=args.workers)
+    os.makedirs(args.out, exist_ok=True)
+    for name, df in results.items():
+        path = os.path.join(args.out, f"{name}.csv")
+        df.to_csv(path, index=False)
+        print(f"{name}: {len(df)} rows -> {path}")
+    print(f"Tests finished in {time.perf_counter() - start:.1f}s with {args.workers} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Local stand-in for stocktwits.com that replays recorded API payloads or
+serves synthetic streams.
+
+    python mock_stocktwits.py --payloads mock/payloads --port 8765
+    python mock_stocktwits.py --synthetic --messages 600 --latency-ms 80 --jitter-ms 40
+    STOCKTWITS_URL=http://127.0.0.1:8765 SCRAPE_MODE=network python scraping_tweets.py
+
+Payload layout (same JSON the web app receives from /api/2/...):
+    <payloads>/streams/symbol/<SYMBOL>.json   {"messages": [...]} newest first
+    <payloads>/messages/show/<ID>.json        {"message": {...}} (optional,
+                                              otherwise looked up in the streams)
+
+Pages render the messages with the DOM class names the scrapers target, so
+both SCRAPE_MODE=dom and SCRAPE_MODE=network work against it. Profile pages
+(/<author>) carry the following/followers links scraping_authors reads, and
+chart images are served from /static/charts/<id>.png. --synthetic generates
+a deterministic stream for any symbol that is asked for (every message has a
+permalink; one in --image-every has a chart); --latency-ms/--jitter-ms delay
+every response.
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import struct
+import argparse
+from datetime import datetime, timedelta
+from html import escape
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PAGE_SIZE = 30
+CHART_SIZE = (320, 240)
+
+LOGIN_HTML = """<html><body>
+<form onsubmit="document.cookie='session=mock; path=/'; location.href='/'; return false;">
+<input name="login"><input name="password" type="password">
+<button type="submit">Log in</button></form>
+</body></html>"""
+
+STREAM_JS = """
+<script>
+let max = null, loading = false, more = true;
+function counters(m) {
+  return [m.conversation && m.conversation.replies, m.reshares && m.reshares.reshared_count, m.likes && m.likes.total]
+    .map(c => `<span class="StreamMessageLabelCount_labelCount__mock">${c || 0}</span>`).join('');
+}
+function render(m) {
+  const chart = m.entities && m.entities.chart;
+  const img = chart ? `<img class="StreamMessageEmbed_img__mock" src="${chart.large || chart.url}">` : '';
+  const body = document.createElement('div');
+  body.textContent = m.body || '';
+  return `<div class="StreamMessage_container__mock" data-testid="message-${m.id}">
+    <span aria-label="Username">${m.user.username}</span>
+    <a href="/${m.user.username}/message/${m.id}"><time datetime="${m.created_at}"></time></a>
+    <div class="RichTextMessage_body__mock">${body.innerHTML}</div>${img}${counters(m)}</div>`;
+}
+async function load(url) {
+  if (loading || !more) return;
+  loading = true;
+  const data = await (await fetch(url + (max ? `?max=${max}` : ''))).json();
+  const messages = data.messages || (data.message ? [data.message] : []);
+  document.getElementById('stream').insertAdjacentHTML('beforeend', messages.map(render).join(''));
+  more = !!(data.cursor && data.cursor.more);
+  max = data.cursor ? data.cursor.max : null;
+  document.body.style.minHeight = (document.getElementById('stream').scrollHeight + 2000) + 'px';
+  if (!more) document.body.style.minHeight = '';
+  loading = false;
+}
+load(API_URL);
+if (PAGINATE) window.addEventListener('scroll', () => {
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 10) load(API_URL);
+});
+</script>"""
+
+
+PROFILE_HTML = """<html><body><div class="UserHeader_container__mock">
+<span aria-label="Username">{author}</span>
+<a href="/{author}/following"><strong>{following}</strong> Following</a>
+<a href="/{author}/followers"><strong>{followers}</strong> Followers</a>
+</div></body></html>"""
+
+SYNTHETIC_BODIES = [
+    "${symbol} breaking out above resistance",
+    "${symbol} looks weak here, taking profits",
+    "Loading more ${symbol} on this dip",
+    "${symbol} earnings next week, staying flat",
+    "${symbol} volume picking up into the close",
+    "Chart on ${symbol}, watching the 50 day",
+]
+
+
+def format_count(n: int) -> str:
+    """Counts the way profile pages show them (950, 1.2K, 3.4M)."""
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M"
+    if n >= 1_000:
+        return f"{n / 1_000:.1f}K"
+    return str(n)
+
+
+def chart_png(seed: int, size=CHART_SIZE) -> bytes:
+    """A solid-colour RGB PNG (stdlib only), so the image pipeline has real bytes to decode and resize."""
+    width, height = size
+    color = bytes(((seed * 37) % 256, (seed * 91) % 256, (seed * 53) % 256))
+    raw = (b"\x00" + color * width) * height
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def page_html(api_url, paginate):
+    return (
+        "<html><body><div id='stream'></div>"
+        f"<script>const API_URL = {json.dumps(api_url)}; const PAGINATE = {json.dumps(paginate)};</script>"
+        f"{STREAM_JS}</body></html>"
+    )
+
+
+class Payloads:
+    def __init__(self, root):
+        self.root = root
+        self.streams = {}
+        self.messages = {}
+
+    def _load(self, *parts):
+        path = os.path.join(self.root, *parts)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def stream(self, symbol):
+        if symbol not in self.streams:
+            payload = self._load('streams', 'symbol', f'{symbol}.json') or {}
+            messages = sorted(payload.get('messages') or [], key=lambda m: m['id'], reverse=True)
+            self.streams[symbol] = messages
+            for message in messages:
+                self.messages.setdefault(int(message['id']), message)
+        return self.streams[symbol]
+
+    def message(self, message_id):
+        payload = self._load('messages', 'show', f'{message_id}.json')
+        if payload:
+            return payload.get('message')
+        if message_id not in self.messages:
+            self._load_streams()
+        return self.messages.get(message_id)
+
+    def _load_streams(self):
+        streams_dir = os.path.join(self.root, 'streams', 'symbol')
+        for name in os.listdir(streams_dir) if os.path.isdir(streams_dir) else []:
+            self.stream(name[:-len('.json')])
+
+    def profile(self, author):
+        """Follower counts of `author` from the user objects of the recorded messages."""
+        self._load_streams()
+        for messages in self.streams.values():
+            for message in messages:
+                user = message.get('user') or {}
+                if user.get('username') == author:
+                    return {'followers': user.get('followers', 0), 'following': user.get('following', 0)}
+        return None
+
+
+class SyntheticPayloads(Payloads):
+    """
+    Deterministic generated data in the recorded payload format: `messages`
+    per symbol (newest first, one a minute), authors drawn from a pool of
+    `authors` users with fixed follower counts, a chart on every
+    `image_every`-th message. The same seed gives the same site.
+    """
+
+    def __init__(self, messages=300, authors=200, image_every=5, seed=0, base_url=""):
+        super().__init__(root=None)
+        self.messages_per_symbol = messages
+        self.authors = [f"trader{n:04d}" for n in range(max(1, authors))]
+        self.image_every = image_every
+        self.seed = seed
+        self.base_url = base_url
+        self.started = datetime(2024, 12, 2, 16, 0, 0)
+
+    def _user(self, username):
+        rng = random.Random(f"{self.seed}:{username}")
+        return {'username': username, 'followers': int(rng.paretovariate(1.2) * 50), 'following': rng.randrange(0, 2000)}
+
+    def stream(self, symbol):
+        if symbol not in self.streams:
+            rng = random.Random(f"{self.seed}:{symbol}")
+            # Ids are unique across symbols and decrease with age like the real ones
+            base = (zlib.crc32(symbol.encode()) % 100_000) * 10_000_000 + 10_000_000
+            messages = []
+            for i in range(self.messages_per_symbol):
+                message_id = base + self.messages_per_symbol - i
+                message = {
+                    'id': message_id,
+                    'body': rng.choice(SYNTHETIC_BODIES).replace("{symbol}", symbol),
+                    'created_at': (self.started - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    'user': self._user(rng.choice(self.authors)),
+                    'conversation': {'replies': rng.randrange(0, 20)},
+                    'reshares': {'reshared_count': rng.randrange(0, 10)},
+                    'likes': {'total': rng.randrange(0, 200)},
+                }
+                if self.image_every and i % self.image_every == 0:
+                    message['entities'] = {'chart': {'large': f"{self.base_url}/static/charts/{message_id}.png"}}
+                messages.append(message)
+                self.messages[message_id] = message
+            self.streams[symbol] = messages
+        return self.streams[symbol]
+
+    def message(self, message_id):
+        return self.messages.get(message_id)
+
+    def profile(self, author):
+        if author not in self.authors:
+            return None
+        user = self._user(author)
+        return {'followers': user['followers'], 'following': user['following']}
+
+
+class Handler(BaseHTTPRequestHandler):
+    payloads = None
+    latency = 0.0  # s added to every response
+    jitter = 0.0  # s, uniform extra delay
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="text/html", status=200):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, payload, status=200):
+        self._send(json.dumps(payload), "application/json", status)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        match = re.fullmatch(r"/api/2/streams/symbol/([^/]+)\.json", path)
+        if match:
+            messages = self.payloads.stream(match.group(1))
+            if 'max' in query:
+                messages = [m for m in messages if m['id'] < int(query['max'][0])]
+            page = messages[:PAGE_SIZE]
+            more = len(messages) > PAGE_SIZE
+            return self._json({
+                "messages": page,
+                "cursor": {"more": more, "max": page[-1]['id'] if page else None},
+            })
+
+        match = re.fullmatch(r"/api/2/messages/show/(\d+)\.json", path)
+        if match:
+            message = self.payloads.message(int(match.group(1)))
+            return self._json({"message": message} if message else {"errors": []}, 200 if message else 404)
+
+        if path == "/signin":
+            return self._send(LOGIN_HTML)
+        if path == "/":
+            return self._send("<html><body>home</body></html>")
+
+        match = re.fullmatch(r"/static/charts/(\d+)\.png", path)
+        if match:
+            return self._send(chart_png(int(match.group(1))), "image/png")
+
+        match = re.fullmatch(r"/symbol/([^/]+)", path)
+        if match:
+            return self._send(page_html(f"/api/2/streams/symbol/{escape(match.group(1))}.json", True))
+
+        match = re.fullmatch(r"/([^/]+)/message/(\d+)", path)
+        if match:
+            return self._send(page_html(f"/api/2/messages/show/{match.group(2)}.json", False))
+
+        match = re.fullmatch(r"/([^/.]+)", path)
+        if match:
+            profile = self.payloads.profile(match.group(1))
+            if profile:
+                return self._send(PROFILE_HTML.format(
+                    author=escape(match.group(1)),
+                    following=format_count(profile['following']),
+                    followers=format_count(profile['followers']),
+                ))
+
+        self._send("not found", "text/plain", 404)
+
+
+def make_server(payloads_dir=None, host="127.0.0.1", port=8765, handler=Handler, synthetic=None,
+                latency=0.0, jitter=0.0):
+    """
+    Server over recorded payloads, or over generated data when `synthetic`
+    holds SyntheticPayloads arguments (messages, authors, image_every, seed).
+    port=0 picks a free port (server.server_port).
+    """
+    payloads = SyntheticPayloads(**synthetic) if synthetic is not None else Payloads(payloads_dir)
+    handler = type("BoundHandler", (handler,), {"payloads": payloads, "latency": latency, "jitter": jitter})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if synthetic is not None:
+        payloads.base_url = f"http://{host}:{server.server_port}"
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payloads", default=os.path.join(os.path.dirname(__file__), "mock", "payloads"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--synthetic", action="store_true", help="generate streams instead of replaying --payloads")
+    parser.add_argument("--messages", type=int, default=300, help="synthetic messages per symbol")
+    parser.add_argument("--authors", type=int, default=200, help="synthetic author pool")
+    parser.add_argument("--image-every", type=int, default=5, help="a chart on every n-th synthetic message (0 = none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    synthetic = None
+    if args.synthetic:
+        synthetic = dict(messages=args.messages, authors=args.authors, image_every=args.image_every, seed=args.seed)
+    server = make_server(args.payloads, args.host, args.port, synthetic=synthetic,
+                         latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000)
+    source = "synthetic streams" if args.synthetic else args.payloads
+    print(f"Serving {source} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
@@ -0,0 +1,45 @@
+import sys
+sys.path.insert(0, '../')
+import argparse
+from dotenv import load_dotenv
+from sentiment import inference, incremental, rollups
+from sentiment.cache import PredictionCache
+from sentiment.storage import SENTIMENT_DATA_DIR
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score the posts scraped since the last run.")
+    parser.add_argument("--out", default=SENTIMENT_DATA_DIR, help="partitioned output directory")
+    parser.add_argument("--chunk-size", type=int, default=incremental.SCORING_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=inference.SENTIMENT_WORKERS)
+    parser.add_argument("--runtime", choices=("torch", "onnx"), default=inference.SENTIMENT_RUNTIME)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="recompute the hourly/daily index of this model from its scored dataset and exit")
+    args = parser.parse_args()
+
+    if args.rebuild_rollups:
+        key = inference.model_key(runtime=args.runtime)
+        posts = rollups.rebuild(key)
+        print(f"{key}: rollups rebuilt from {posts} scored posts")
+        return
+
+    cache = None if args.no_cache else PredictionCache()
+    with inference.Scorer(workers=args.workers, cache=cache, runtime=args.runtime) as scorer:
+        totals = incremental.run(scorer, out_dir=args.out, chunk_size=args.chunk_size)
+    if cache is not None:
+        print(f"Cache hit rate: {cache.hit_rate:.1%}")
+        cache.close()
+
+    if not totals['posts']:
+        print(f"No new posts since id {totals['from_id']} for {totals['model']}.")
+        return
+    print(f"{totals['model']}: scored ids {totals['from_id'] + 1}..{totals['to_id']} "
+          f"({totals['posts']} posts, {totals['inferred']} inferred) in {totals['seconds']:.1f}s "
+          f"({totals['posts_per_sec']:.1f} posts/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+sys.path.insert(0, '../')
+import argparse
+from dotenv import load_dotenv
+from sentiment import inference, pipeline
+from sentiment.cache import SENTIMENT_CACHE_PATH, PredictionCache
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score StockTwits posts with FinTwitBERT in length-bucketed batches.")
+    parser.add_argument("input", nargs="?", help="CSV file or Parquet dataset directory with a post_text column")
+    parser.add_argument("output", nargs="?", help="CSV file, or a directory with --parquet")
+    parser.add_argument("--parquet", action="store_true", help="write a dataset partitioned by symbol/month")
+    parser.add_argument("--chunk-rows", type=int, default=pipeline.PIPELINE_CHUNK_ROWS)
+    parser.add_argument("--queue-depth", type=int, default=pipeline.PIPELINE_QUEUE_DEPTH)
+    parser.add_argument("--workers", type=int, default=inference.SENTIMENT_WORKERS)
+    parser.add_argument("--threads", type=int, default=inference.SENTIMENT_THREADS or None,
+                        help="intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--runtime", choices=("torch", "onnx"), default=inference.SENTIMENT_RUNTIME)
+    parser.add_argument("--no-quantized", action="store_true", help="with --runtime onnx, use the fp32 graph")
+    parser.add_argument("--token-budget", type=int, default=inference.SENTIMENT_TOKEN_BUDGET)
+    parser.add_argument("--no-cache", action="store_true", help=f"do not use the {SENTIMENT_CACHE_PATH} cache")
+    parser.add_argument("--export-onnx", action="store_true",
+                        help=f"export the model to {inference.SENTIMENT_ONNX_DIR} (+ int8 copy) and exit")
+    args = parser.parse_args()
+
+    if args.export_onnx:
+        print(f"ONNX model written to {inference.export_onnx()}")
+        return
+    if not args.input or not args.output:
+        parser.error("input and output are required")
+
+    # Chunks stream through clean -> infer -> write; the dataset is never loaded whole
+    if os.path.isdir(args.input):
+        chunks = pipeline.read_parquet_chunks(args.input, args.chunk_rows)
+    else:
+        chunks = pipeline.read_csv_chunks(args.input, args.chunk_rows)
+    write = pipeline.parquet_writer(args.output) if args.parquet else pipeline.csv_writer(args.output)
+
+    cache = None if args.no_cache else PredictionCache()
+    with inference.Scorer(
+        workers=args.workers, threads=args.threads, cache=cache, runtime=args.runtime,
+        quantized=not args.no_quantized, token_budget=args.token_budget,
+    ) as scorer:
+        stats = pipeline.run_pipeline(
+            chunks, scorer, write, queue_depth=args.queue_depth,
+            on_chunk=lambda number, rows: print(f"Chunk {number}: {rows} rows written"),
+        )
+    if cache is not None:
+        print(f"Cache hit rate: {cache.hit_rate:.1%}")
+        cache.close()
+
+    busy = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in stats['busy'].items())
+    print(f"Scored {stats['rows']} posts in {stats['seconds']:.1f}s ({stats['rows_per_sec']:.1f} posts/sec, "
+          f"{stats['inferred']} sent to the model, {scorer.workers} workers x {scorer.threads} threads)")
+    print(f"Stage busy time: {busy}; peak RSS {stats['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
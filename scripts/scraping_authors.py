@@ -6,10 +6,13 @@ import time
 import concurrent.futures
 import logging
 import asyncio
-from datetime import datetime
 from dotenv import load_dotenv
-from config.database import execute_query
-from playwright.async_api import async_playwright
+from config.database import cursor, execute_values_query
+from config.browser import BASE_URL, AsyncBrowserPool, ensure_storage_state
+from config.extract import AUTHOR_STATS_JS
+from config import pacing, metrics
+from config.jobs import JobQueue
+from config.logs import log_event, setup_logging, worker_logging
 
 # Configure logging
 logging.basicConfig(
@@ -22,46 +25,46 @@ load_dotenv()
 
 # SQL statements
 GET_AUTHORS_SQL = (
-    "SELECT id, author "
+    "SELECT id AS item_key, json_build_object('id', id, 'author', author) AS payload "
     "FROM stocktwits_authors "
-    "WHERE execution_counter = 0"
+    "WHERE execution_counter = 0 "
+    "ORDER BY id"
 )
 
-UPDATE_AUTHOR_SQL = (
-    "UPDATE stocktwits_authors SET "
-    "total_following = %s, total_followers = %s, "
-    "avg_likes = %s, avg_reshares = %s, avg_comments = %s, "
-    "updated_at = %s, execution_counter = execution_counter + 1 "
-    "WHERE id = %s"
+# Follower counts from the scrape plus averages from the author_engagement rollup, for a whole batch
+UPDATE_AUTHORS_SQL = (
+    "UPDATE stocktwits_authors AS sa SET "
+    "total_following = v.following, total_followers = v.followers, "
+    "avg_likes = COALESCE(ROUND(ae.likes_sum::numeric / NULLIF(ae.likes_count, 0)), 0), "
+    "avg_reshares = COALESCE(ROUND(ae.reshares_sum::numeric / NULLIF(ae.reshares_count, 0)), 0), "
+    "avg_comments = COALESCE(ROUND(ae.comments_sum::numeric / NULLIF(ae.comments_count, 0)), 0), "
+    "updated_at = now(), execution_counter = sa.execution_counter + 1 "
+    "FROM (VALUES %s) AS v(id, author, following, followers) "
+    "LEFT JOIN author_engagement ae ON ae.post_author = v.author "
+    "WHERE sa.id = v.id"
 )
 
-ENGAGEMENT_SQL = (
-    "SELECT "
-    "    AVG(sp.post_likes) AS avg_post_likes, "
-    "    AVG(sp.post_reshares) AS avg_post_reshares, "
-    "    AVG(sp.post_comments) AS avg_post_comments "
-    "FROM stocktwits_posts sp "
-    "WHERE sp.post_author = %s"
-)
+ENGAGEMENT_ROLLUP_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'sql', 'author_engagement.sql')
 
 # Constants
-SLEEP_TIME = float(os.getenv('SLEEP_TIME', 4))
-RESTART_INTERVAL = int(os.getenv('RESTART_INTERVAL', 100))
 MAX_WORKERS = int(os.getenv('MAX_WORKERS', 10))
+AUTHOR_QUEUE = 'authors'
+AUTHOR_BATCH_SIZE = int(os.getenv('AUTHOR_BATCH_SIZE', 50))
 
 
-def save_log(message: str, level: str = 'error', print_log: bool = False):
+def save_log(message: str, level: str = 'error', print_log: bool = False, **fields):
     """
-    Inserts a log entry into the database and optionally prints it.
+    Queues a log entry for the execution_logs sink and optionally prints it.
     """
-    execute_query("INSERT INTO execution_logs (log) VALUES (%s)", (message,))
+    level_no = logging.getLevelName(level.upper())
+    log_event(message, level=level_no if isinstance(level_no, int) else logging.ERROR, **fields)
     if print_log:
         getattr(logging, level.lower(), logging.error)(message)
 
 
-def get_authors() -> list:
-    """Fetch authors with zero execution count."""
-    return execute_query(GET_AUTHORS_SQL)
+def enqueue_authors(queue: JobQueue):
+    """Queue authors with zero execution count (server-side, nothing is loaded here)."""
+    queue.enqueue_query(GET_AUTHORS_SQL)
 
 
 def parse_count(text: str) -> int:
@@ -78,114 +81,105 @@ def parse_count(text: str) -> int:
     return int(number * multipliers.get(suffix, 1))
 
 
-def get_engagement(author: str) -> tuple:
-    """Compute average likes, reshares, comments for an author."""
-    rows = execute_query(ENGAGEMENT_SQL, (author,))
-    if not rows:
-        return 0, 0, 0
-    row = rows[0]
-    return (
-        row.get('avg_post_likes', 0) or 0,
-        row.get('avg_post_reshares', 0) or 0,
-        row.get('avg_post_comments', 0) or 0,
-    )
+def ensure_engagement_rollup():
+    """
+    Create the post_author index and the author_engagement rollup (filled in
+    one set-based pass the first time, then kept current by triggers).
+    Raises when the setup fails: every batched author update joins the rollup.
+    """
+    with open(ENGAGEMENT_ROLLUP_SQL) as f, cursor() as cur:
+        cur.execute(f.read())
 
 
-def update_author_record(author_id, following, followers, likes, reshares, comments):
-    """Persist author metrics back to the database."""
-    params = (following, followers, likes, reshares, comments, datetime.now(), author_id)
-    execute_query(UPDATE_AUTHOR_SQL, params)
+def update_author_records(records: list) -> bool:
+    """Persist a batch of (author_id, author, following, followers) in one statement."""
+    if not records:
+        return True
+    return execute_values_query(UPDATE_AUTHORS_SQL, records) is not None
 
 
 async def scrape_author_stats(page, author: str) -> tuple:
     """Navigate to author's page and extract following/follower counts."""
-    await page.goto(f'https://stocktwits.com/{author}', timeout=30_000)
-    await asyncio.sleep(SLEEP_TIME)
-    follow_sel = f"xpath=.//a[contains(@href, '/{author}/following')]//strong"
-    follower_sel = f"xpath=.//a[contains(@href, '/{author}/followers')]//strong"
-
-    following = 0
-    followers = 0
+    await pacing.goto_async(page, f'{BASE_URL}/{author}', timeout=30_000)
+    await pacing.wait_for_selector_async(page, f"a[href*='/{author}/followers']")
     try:
-        el = await page.query_selector(follow_sel)
-        txt = await el.text_content() if el else ''
-        following = parse_count(txt)
+        stats = await page.evaluate(AUTHOR_STATS_JS, author)
     except Exception:
-        pass
-    try:
-        el = await page.query_selector(follower_sel)
-        txt = await el.text_content() if el else ''
-        followers = parse_count(txt)
-    except Exception:
-        pass
+        return 0, 0
+    return parse_count(stats['following']), parse_count(stats['followers'])
 
-    return following, followers
 
-
-def process_authors_subset(authors_subset: list):
+def process_authors_queue():
     """Entry point for executor: runs async scraping."""
-    asyncio.run(_run_async_subset(authors_subset))
-
-
-async def _run_async_subset(authors_subset: list):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-
-        # Login
-        await page.goto('https://stocktwits.com/signin?next=/login')
-        await asyncio.sleep(SLEEP_TIME)
-        await page.fill("input[name='login']", os.getenv('STOCKTWITS_USERNAME', ''))
-        await page.fill("input[name='password']", os.getenv('STOCKTWITS_PASSWORD', ''))
-        await page.press("input[name='password']", "Enter")
-        await asyncio.sleep(SLEEP_TIME)
-
-        for idx, record in enumerate(authors_subset, start=1):
-            author_id, author = record['id'], record['author']
+    asyncio.run(_run_async_queue())
+
+
+async def _run_async_queue():
+    queue = JobQueue(AUTHOR_QUEUE)
+    records, jobs = [], []
+
+    def flush():
+        if not jobs:
+            return
+        with metrics.timer('db_write', table='stocktwits_authors'):
+            written = update_author_records(records)
+        if written:
+            queue.complete([job['id'] for job in jobs])
+        else:
+            # Back to pending now instead of once the leases expire
+            for job in jobs:
+                queue.fail(job, "could not write author stats")
+        records.clear()
+        jobs.clear()
+
+    async with AsyncBrowserPool() as pool:
+        for job in queue.jobs():
+            author_id, author = job['payload']['id'], job['payload']['author']
             try:
-                following, followers = await scrape_author_stats(page, author)
-                likes, reshares, comments = get_engagement(author)
-                update_author_record(author_id, following, followers, likes, reshares, comments)
+                with metrics.timer('author_page'):
+                    async with pool.page() as page:
+                        following, followers = await scrape_author_stats(page, author)
+                records.append((author_id, author, following, followers))
+                jobs.append(job)
+                metrics.inc('authors')
                 logging.info(f"Processed {author} | followers: {followers}, following: {following}")
             except Exception as exc:
-                save_log(f"Error processing {author}: {exc}")
-
-            if idx % RESTART_INTERVAL == 0:
-                await context.close()
-                await browser.close()
-                await asyncio.sleep(2)
-                # Restart on remaining subset
-                await _run_async_subset(authors_subset[idx:])
-                return
+                queue.fail(job, exc)
+                save_log(f"Error processing {author}: {exc}", stage='author', exc=exc)
 
-        await context.close()
-        await browser.close()
+            # Write before the oldest buffered lease runs out, not only when the batch is full
+            if len(records) >= AUTHOR_BATCH_SIZE or (jobs and queue.expiring(jobs[0])):
+                flush()
+        flush()
 
-
-def chunkify(lst, n):
-    """Yield n chunks from lst as evenly as possible."""
-    k, m = divmod(len(lst), n)
-    for i in range(n):
-        start = i * k + min(i, m)
-        end = start + k + (1 if i < m else 0)
-        yield lst[start:end]
+    save_log(f"Waits: {pacing.stats.summary()}", level='info', print_log=True, stage='pacing')
 
 
 def main():
-    authors = get_authors()
-    if not authors:
+    log_queue = setup_logging()
+    ensure_engagement_rollup()
+
+    queue = JobQueue(AUTHOR_QUEUE)
+    enqueue_authors(queue)
+    pending = queue.counts()
+    if not pending.get('pending') and not pending.get('running'):
         logging.info("No authors to process.")
         return
 
-    subsets = list(chunkify(authors, MAX_WORKERS))
-    with concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_authors_subset, subset) for subset in subsets]
+    # Log in once; every worker reuses the saved session
+    ensure_storage_state()
+
+    with metrics.PeriodicExport(), concurrent.futures.ProcessPoolExecutor(
+        max_workers=MAX_WORKERS, initializer=worker_logging, initargs=(log_queue,)
+    ) as executor:
+        futures = [executor.submit(process_authors_queue) for _ in range(MAX_WORKERS)]
         for future in concurrent.futures.as_completed(futures):
             try:
                 future.result()
             except Exception as exc:
-                save_log(f"Worker error: {exc}", print_log=True)
+                save_log(f"Worker error: {exc}", print_log=True, exc=exc)
+
+    logging.info(f"Authors queue: {queue.counts()}")
 
 if __name__ == '__main__':
     main()
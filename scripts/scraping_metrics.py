@@ -1,154 +1,170 @@
 import os
-import re
 import sys
 sys.path.insert(0, '../')
-import time
-import base64
-import requests
+import asyncio
 import concurrent.futures
-from datetime import datetime
 from dotenv import load_dotenv
-from config.database import execute_query
-from playwright.sync_api import sync_playwright
-import numpy as np
+from config.database import execute_values_query
+from config.browser import BASE_URL, AsyncBrowserPool, ensure_storage_state
+from config.capture import SCRAPE_MODE, AsyncResponseCapture
+from config.extract import MESSAGE_COUNTERS_JS
+from config import pacing, metrics
+from config.jobs import JobQueue
 
 load_dotenv()
 
-def get_posts():
-    query = "SELECT * FROM stocktwits_posts WHERE post_likes IS NULL ORDER BY id"
-    result = execute_query(query)
-    return result if result else []
-
-def update_post_metrics(id, comments, reshares, likes):
+POST_METRICS_QUEUE = 'post_metrics'
+MAX_WORKERS = int(os.getenv("METRICS_WORKERS", 2))  # processes, one browser each
+METRICS_CONCURRENCY = int(os.getenv("METRICS_CONCURRENCY", 8))  # pages in flight per browser
+METRICS_BATCH_SIZE = int(os.getenv("METRICS_BATCH_SIZE", 100))
+
+def enqueue_posts(queue):
+    # Only the three fields a worker needs, inserted server-side instead of SELECT * into memory
+    queue.enqueue_query(
+        "SELECT id AS item_key, "
+        "json_build_object('id', id, 'post_id', post_id, 'post_author', post_author) AS payload "
+        "FROM stocktwits_posts WHERE post_likes IS NULL ORDER BY id"
+    )
+
+def update_post_metrics(rows):
+    """rows: (id, comments, reshares, likes) tuples, written with one statement."""
     update_query = """
-        UPDATE stocktwits_posts 
-        SET post_comments = %s, post_reshares = %s, post_likes = %s 
-        WHERE id = %s
+        UPDATE stocktwits_posts AS sp
+        SET post_comments = v.comments, post_reshares = v.reshares, post_likes = v.likes
+        FROM (VALUES %s) AS v(id, comments, reshares, likes)
+        WHERE sp.id = v.id
     """
-    execute_query(update_query, (comments, reshares, likes, id))
-
-def partition_ranges(db_size, parts=10):
-    ranges = []
-    base_size = db_size // parts
-    remainder = db_size % parts
-    start = 1
-    for i in range(parts):
-        extra = 1 if i < remainder else 0
-        end = start + base_size + extra - 1
-        ranges.append((start, end))
-        start = end + 1
-    return ranges
-
-def process_post_metrics(posts):
-    SLEEP_TIME = 4
-    N_RESTART = 100  # restart browser after 100 posts
-    count = 0
-
-    def start_browser():
-        playwright = sync_playwright().start()
-        browser = playwright.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
-        # Login
-        page.goto('https://stocktwits.com/signin?next=/login')
-        time.sleep(SLEEP_TIME)
-        page.fill("input[name='login']", os.getenv("STOCKTWITS_USERNAME"))
-        page.fill("input[name='password']", os.getenv("STOCKTWITS_PASSWORD"))
-        time.sleep(SLEEP_TIME)
-        page.press("input[name='password']", "Enter")
-        time.sleep(SLEEP_TIME)
-        return playwright, browser, context, page
-
-    playwright, browser, context, page = start_browser()
-
-    if not posts:
+    return execute_values_query(update_query, rows) is not None
+
+def parse_count(txt):
+    if not txt:
+        return 0
+    txt = txt.lower().replace(',', '')
+    if 'k' in txt:
+        return int(float(txt.replace('k','')) * 1000)
+    if txt.isdigit():
+        return int(txt)
+    return 0
+
+async def dom_counters(page, post_id):
+    counters = await page.evaluate(MESSAGE_COUNTERS_JS, str(post_id))
+    if counters is None:
+        return None
+
+    comments_count = parse_count(counters[0]) if len(counters) > 0 else 0
+    reshares_count = parse_count(counters[1]) if len(counters) > 1 else 0
+    likes_count = parse_count(counters[2]) if len(counters) > 2 else 0
+    return comments_count, reshares_count, likes_count
+
+async def captured_counters(capture, post_id):
+    """Network mode: counters from the message JSON the permalink page fetched."""
+    for record in await capture.drain():
+        if record['post_id'] == int(post_id):
+            return record['post_comments'], record['post_reshares'], record['post_likes']
+    return None
+
+async def measure_post(pool, post):
+    post_id = post['post_id']
+    author = post['post_author']
+    print(f"Processing post ID: {post_id} by {author}")
+
+    async with pool.page() as page:
+        capture = await AsyncResponseCapture(page).attach() if SCRAPE_MODE == 'network' else None
+        try:
+            await pacing.goto_async(page, f'{BASE_URL}/{author}/message/{post_id}')
+            await pacing.wait_for_selector_async(page, f"div[data-testid='message-{post_id}']")
+
+            counters = await captured_counters(capture, post_id) if capture is not None else None
+            if counters is None:
+                counters = await dom_counters(page, post_id)
+        finally:
+            if capture is not None:
+                await capture.close()
+
+    return counters or (0, 0, 0)
+
+def process_post_metrics():
+    """Entry point for executor: one browser, many concurrent pages."""
+    asyncio.run(_run_async_queue())
+
+async def _run_async_queue():
+    queue = JobQueue(POST_METRICS_QUEUE, lease_size=METRICS_CONCURRENCY)
+    semaphore = asyncio.Semaphore(METRICS_CONCURRENCY)
+    rows, jobs = [], []
+    tasks = set()
+
+    def write(batch, batch_jobs):
+        with metrics.timer('db_write', table='stocktwits_posts'):
+            written = update_post_metrics(batch)
+        if written:
+            queue.complete([job['id'] for job in batch_jobs])
+        else:
+            # Back to pending now instead of once the leases expire
+            for job in batch_jobs:
+                queue.fail(job, "could not write post metrics")
+
+    async def flush():
+        # psycopg2 blocks: database calls run in a thread so the open pages keep going
+        if jobs:
+            batch, batch_jobs = rows[:], jobs[:]
+            rows.clear()
+            jobs.clear()
+            await asyncio.to_thread(write, batch, batch_jobs)
+
+    async def handle(pool, job):
+        try:
+            with metrics.timer('post_metrics'):
+                counters = await measure_post(pool, job['payload'])
+        except Exception as e:
+            metrics.inc('errors', error_type=type(e).__name__, stage='post_metrics')
+            await asyncio.to_thread(queue.fail, job, e)
+            return
+        finally:
+            semaphore.release()
+        metrics.inc('post_metrics')
+        rows.append((job['payload']['id'], *counters))
+        jobs.append(job)
+        # Write before the oldest buffered lease runs out, not only when the batch is full
+        if len(rows) >= METRICS_BATCH_SIZE or queue.expiring(jobs[0]):
+            await flush()
+
+    async with AsyncBrowserPool() as pool:
+        while True:
+            lease = await asyncio.to_thread(queue.claim)
+            if not lease:
+                break
+            for job in lease:
+                # Sliding window: start the next post as soon as one of the pages is free
+                await semaphore.acquire()
+                task = asyncio.create_task(handle(pool, job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        await flush()
+
+    print(f"Waits: {pacing.stats.summary()}")
+
+def main():
+    queue = JobQueue(POST_METRICS_QUEUE)
+    enqueue_posts(queue)
+    pending = queue.counts()
+    if not pending.get('pending') and not pending.get('running'):
         print("No more posts to process.")
         return
 
-    for post in posts:
-        try:
-            post_id = post['post_id']
-            author = post['post_author']
-            print(f"Processing post ID: {post_id} by {author}")
-
-            page.goto(f'https://stocktwits.com/{author}/message/{post_id}')
-            time.sleep(3)
-
-            message_element = page.query_selector(f"xpath=.//div[@data-testid='message-{post_id}']")
-            if not message_element:
-                update_post_metrics(post['id'], 0, 0, 0)
-                continue
-
-            counters_span = message_element.query_selector_all("xpath=.//span[starts-with(@class, 'StreamMessageLabelCount_labelCount')]")
-
-            def parse_count(txt):
-                if not txt:
-                    return 0
-                txt = txt.lower().replace(',', '')
-                if 'k' in txt:
-                    return int(float(txt.replace('k','')) * 1000)
-                if txt.isdigit():
-                    return int(txt)
-                return 0
-
-            if counters_span:
-                comments_span = counters_span[0]
-                reshares_span = counters_span[1] if len(counters_span) > 1 else None
-                likes_span = counters_span[2] if len(counters_span) > 2 else None
-
-                comments_count = parse_count(comments_span.text_content().strip()) if comments_span else 0
-                reshares_count = parse_count(reshares_span.text_content().strip()) if reshares_span else 0
-                likes_count = parse_count(likes_span.text_content().strip()) if likes_span else 0
-
-                update_post_metrics(
-                    post['id'],
-                    comments_count,
-                    reshares_count,
-                    likes_count
-                )
-            else:
-                update_post_metrics(post['id'], 0, 0, 0)
-        except Exception as _:
-            update_post_metrics(post['id'], 0, 0, 0)
-        count += 1
-
-        if count % N_RESTART == 0:
-            page.close()
-            context.close()
-            browser.close()
-            playwright.stop()
-            time.sleep(3)
-            playwright, browser, context, page = start_browser()
-
-    page.close()
-    context.close()
-    browser.close()
-    playwright.stop()
-
-
-def get_db_size():
-    db_size_query = "SELECT COUNT(*) as count FROM stocktwits_posts"
-    db_size_result = execute_query(db_size_query)
-    return db_size_result[0]['count'] if db_size_result else 0
+    # Log in once; every worker reuses the saved session
+    ensure_storage_state()
 
-def main():
-    MAX_WORKERS = 10
-    posts = get_posts()
-    posts_set = [arr.tolist() for arr in np.array_split(posts, MAX_WORKERS)]
-
-    with concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_range = {executor.submit(process_post_metrics, p): p for p in posts_set}
-        while future_to_range:
-            done, _ = concurrent.futures.wait(future_to_range, return_when=concurrent.futures.FIRST_COMPLETED)
-            for future in done:
-                r = future_to_range.pop(future)
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"Error processing post metrics for range {r}: {e}")
-                    # Resubmit the failed range
-                    # new_future = executor.submit(process_post_metrics, r)
-                    # future_to_range[new_future] = r
+    # Every worker pulls small leases from the shared queue until it is empty
+    with metrics.PeriodicExport(), concurrent.futures.ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(process_post_metrics) for _ in range(MAX_WORKERS)]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error processing post metrics: {e}")
+
+    print(f"Post metrics queue: {queue.counts()}")
     
 
 if __name__ == "__main__":
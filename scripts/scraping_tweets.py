@@ -1,231 +1,167 @@
 import os
-import re
 import sys
 sys.path.insert(0, '../')
 import time
-import base64
-import requests
+import logging
 import concurrent.futures
+from contextlib import nullcontext
 from datetime import datetime
 from dotenv import load_dotenv
 from config.database import execute_query
-from playwright.sync_api import sync_playwright
-from PIL import Image, UnidentifiedImageError
-from io import BytesIO
+from config.posts import EARLY_STOP_MESSAGES, KnownPosts, PostWriter
+from config.images import ImagePipeline
+from config.browser import BASE_URL, ensure_storage_state, get_browser_pool
+from config.capture import SCRAPE_MODE, ResponseCapture
+from config.extract import STREAM_MESSAGE_SELECTOR, STREAM_MESSAGES_JS, parse_stream_message
+from config import pacing, metrics, schedule
+from config.jobs import JobQueue
+from config.logs import log_event, setup_logging, worker_logging
 
 load_dotenv()
 
-OUTPUT_DIR = 'images'
-MAX_DIMENSION = 720  # px
+FULL_CRAWL = os.getenv("FULL_CRAWL", "0") == "1"  # ignore known posts and walk the whole stream
+SYMBOL_QUEUE = 'symbols'
+SYMBOL_VISIBILITY_TIMEOUT = int(os.getenv("SYMBOL_VISIBILITY_TIMEOUT", 3600))  # s, one symbol crawl
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-def save_log(log, print_log=False):
-    execute_query("INSERT INTO execution_logs (log) VALUES (%s)", (log,))
+def save_log(log, print_log=False, level=logging.INFO, **fields):
+    # Non-blocking: the record is batch-inserted into execution_logs by the log sink
+    log_event(log, level=level, **fields)
     if print_log: print(log)
 
-def download_image(element):
-    try:
-        img = element.query_selector("xpath=.//img[contains(@class, 'StreamMessageEmbed')]")
-        if not img:
-            return None
-        url = img.get_attribute("src")
-        response = requests.get(url)
-        response.raise_for_status()
-        image_base64 = base64.b64encode(response.content).decode('utf-8')
-        return image_base64
-    except Exception as e:
-        save_log(f"Error on download image: {e}")
-        return None
-    
-def process_and_save(img_data_b64, img_id):
-    if not img_data_b64:
-        return None
-    
-    try:
-        img_data = base64.b64decode(img_data_b64)
-        img = Image.open(BytesIO(img_data))
-
-        w, h = img.size
-        max_orig = max(w, h)
-        if max_orig > MAX_DIMENSION:
-            scale = MAX_DIMENSION / max_orig
-            new_size = (int(w * scale), int(h * scale))
-            img = img.resize(new_size, Image.LANCZOS)
-
-        fmt = img.format or 'JPEG'
-        ext = fmt.lower()
-
-        if img.mode in ("RGBA", "LA") or (fmt.upper() == 'PNG' and 'A' in img.getbands()):
-            fmt = 'PNG'
-            ext = 'png'
-        else:
-            fmt = 'JPEG'
-            ext = 'jpg'
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-
-        filename = f"{img_id}.{ext}"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
-        if fmt == 'JPEG':
-            img.save(filepath, fmt, quality=85, optimize=True)
-        else:
-            img.save(filepath, fmt, optimize=True)
-
-        return filepath
-
-    except (base64.binascii.Error, UnidentifiedImageError) as e:
-        save_log(f"[ERROR on process_and_save] id={img_id}: invalid format ({e})")
-        return None
-    except Exception as e:
-        save_log(f"[ERROR on process_and_save] id={img_id}: {e}")
-        return None
-
-def scrap_message(page, symbol, total_messages):
-    messages = page.query_selector_all("xpath=.//div[contains(@class, 'StreamMessage_container__')]")
-    current_count = len(messages)
-
-    for message in messages[total_messages:]:
-        try:
-            a_element = message.query_selector("xpath=.//a[contains(@href, '/message/')]")
-            if not a_element:
-                continue
-            href_value = a_element.get_attribute("href")
-            match = re.search(r"/message/(\d+)", href_value)
-            if not match:
-                continue
-            post_id = match.group(1)
-
-            select_query = f"select id from stocktwits_posts where post_id = {post_id} and symbol = '{symbol}'"
-            result = execute_query(select_query)
-
-            time_element = message.query_selector("xpath=.//time")
-            date_str = time_element.get_attribute("datetime") if time_element else ""
-            date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ") if date_str else None
-
-            if result is not None and len(result) > 0:
-                continue
-
-            author_element = message.query_selector("xpath=.//span[@aria-label='Username']")
-            author = author_element.text_content().strip() if author_element else ""
-
-            text_element = message.query_selector("xpath=.//div[starts-with(@class, 'RichTextMessage_body__')]")
-            text = text_element.text_content().strip() if text_element else ""
-
-            image_base64 = download_image(message)
-            image_path = process_and_save(image_base64, post_id) if image_base64 else None
+def scrap_message(page, symbol, total_messages, writer, known, images):
+    # One round trip returns every message after the ones already read
+    with metrics.timer('extract', symbol=symbol):
+        result = page.evaluate(STREAM_MESSAGES_JS, {'skip': total_messages})
 
-            counters_span = message.query_selector_all("xpath=.//span[starts-with(@class, 'StreamMessageLabelCount_labelCount')]")
-
-            comments_span = counters_span[0] if counters_span and len(counters_span) > 0 else None
-            reshares_span = counters_span[1] if counters_span and len(counters_span) > 1 else None
-            likes_span = counters_span[2] if counters_span and len(counters_span) > 2 else None
-
-            comments_count = comments_span.text_content().strip() if comments_span else 0
-            reshares_count = reshares_span.text_content().strip() if reshares_span else 0
-            likes_count = likes_span.text_content().strip() if likes_span else 0
-
-            comments_count = int(comments_count) if comments_count.isdigit() else 0
-            reshares_count = int(reshares_count) if reshares_count and reshares_count.isdigit() else 0
-            likes_count = int(likes_count) if likes_count and likes_count.isdigit() else 0
+    records = []
+    for raw in result['messages']:
+        try:
+            records.append(parse_stream_message(raw))
+        except Exception as e:
+            save_log(f"Error on process message {raw.get('post_id')}: {e}", level=logging.ERROR, symbol=symbol, stage='extract', exc=e)
 
-            insert_query = 'insert into stocktwits_posts (symbol, post_id, post_author, post_date, post_text, post_comments, post_reshares, post_likes, post_img_path) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-            insert_data = (symbol, post_id, author, date, text, comments_count, reshares_count, likes_count, image_path)
+    # Known ids are resolved in memory, so images of stored posts are not downloaded again
+    new_ids = set(known.filter_new([record['post_id'] for record in records]))
 
-            execute_query(insert_query, insert_data)
-        except Exception as e:
-            save_log(f"Error on process image: {e}")
+    for record in records:
+        if record['post_id'] not in new_ids:
+            continue
+        new_ids.discard(record['post_id'])
+        writer.add(dict(record, symbol=symbol, post_img_path=None))  # path filled in by the image pipeline
+        images.enqueue(symbol, record['post_id'], record['image_url'])
 
-    return current_count
+    return result['total']
 
-def get_symbols():
-    select_query = f"SELECT symbol FROM symbols ORDER BY execution_counter, id"
-    result = execute_query(select_query)
-    return [row['symbol'] for row in result] if result else []
+def scrap_captured(capture, symbol, writer, known, images):
+    """Network mode: store the messages of the stream responses received so far."""
+    with metrics.timer('extract', symbol=symbol):
+        records = capture.drain()
+    new_ids = set(known.filter_new([record['post_id'] for record in records]))
 
-def process_symbol(symbol):
-    update_query = f"UPDATE symbols SET execution_counter = execution_counter + 1 WHERE symbol = '{symbol}'"
-    execute_query(update_query)
+    for record in records:
+        if record['post_id'] not in new_ids:
+            continue
+        new_ids.discard(record['post_id'])
+        writer.add(dict(record, symbol=symbol, post_img_path=None))
+        images.enqueue(symbol, record['post_id'], record['image_url'])
 
-    with sync_playwright() as p:
-        SLEEP_TIME = 5
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
+    return len(records)
 
-        page.goto('https://stocktwits.com/signin?next=/login')
-        time.sleep(SLEEP_TIME)
+def process_symbol(symbol, images, keep_alive=lambda: None):
+    update_query = "UPDATE symbols SET execution_counter = execution_counter + 1 WHERE symbol = %s"
+    execute_query(update_query, (symbol,))
+    started = time.monotonic()
 
-        page.fill("input[name='login']", os.getenv("STOCKTWITS_USERNAME"))
-        page.fill("input[name='password']", os.getenv("STOCKTWITS_PASSWORD"))
-        time.sleep(SLEEP_TIME)
-        page.press("input[name='password']", "Enter")
-        time.sleep(SLEEP_TIME)
+    # The page goes back to the browser pool: listeners and routes are detached even when the crawl fails
+    with get_browser_pool().page() as page, pacing.watch_throttling(page), \
+            (ResponseCapture(page) if SCRAPE_MODE == 'network' else nullcontext()) as capture:
 
-        page.goto(f'https://stocktwits.com/symbol/{symbol}')
-        time.sleep(SLEEP_TIME)
+        with metrics.timer('navigate', symbol=symbol):
+            pacing.goto(page, f'{BASE_URL}/symbol/{symbol}')
+            pacing.wait_for_selector(page, STREAM_MESSAGE_SELECTOR)
 
-        last_height = page.evaluate("document.body.scrollHeight")
         total_messages = 0
 
-        while True:
-            total_messages = scrap_message(page, symbol, total_messages)
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(SLEEP_TIME)
-            new_height = page.evaluate("document.body.scrollHeight")
-            if new_height == last_height:
-                save_log(f"Symbol {symbol}: No more content available to load.", print_log=True)
-                break
-            last_height = new_height
-
-        browser.close()
+        known = KnownPosts(symbol, stop_after=0 if FULL_CRAWL else EARLY_STOP_MESSAGES)
+
+        with PostWriter() as writer, images.attach(writer):
+            while True:
+                # A full crawl of a busy symbol can outlast the lease
+                keep_alive()
+                if capture is not None:
+                    scrap_captured(capture, symbol, writer, known, images)
+                    total_messages = pacing.count(page, STREAM_MESSAGE_SELECTOR)
+                else:
+                    total_messages = scrap_message(page, symbol, total_messages, writer, known, images)
+                if known.caught_up:
+                    save_log(f"Symbol {symbol}: reached posts stored up to {known.newest_date}, stopping.", print_log=True, symbol=symbol, stage='scroll')
+                    break
+                with metrics.timer('scroll', symbol=symbol):
+                    # Wait for the next page of messages instead of a fixed sleep; a slow load is retried, not the end
+                    grew = pacing.scroll_for_more(page, STREAM_MESSAGE_SELECTOR, total_messages)
+                if not grew:
+                    if capture is not None:
+                        scrap_captured(capture, symbol, writer, known, images)
+                    save_log(f"Symbol {symbol}: No more content available to load.", print_log=True, symbol=symbol, stage='scroll')
+                    break
+
+        # Velocity and crawl cost decide when this symbol is due again
+        plan = schedule.record_crawl(symbol, writer.inserted, time.monotonic() - started, known.caught_up or FULL_CRAWL)
+        if plan:
+            save_log(f"Symbol {symbol}: {plan['velocity']:.1f} posts/h, next crawl in {plan['interval'] / 60:.0f} min"
+                     f"{' (posts may have been missed)' if plan['missed'] else ''}.", symbol=symbol, stage='schedule')
+        metrics.inc('posts', writer.inserted, symbol=symbol, result='new')
+        metrics.inc('posts', writer.duplicates, symbol=symbol, result='duplicate')
+        save_log(f"Symbol {symbol}: {writer.inserted} new posts, {writer.duplicates} duplicates.", print_log=True, symbol=symbol, stage='store')
+        save_log(f"Worker {os.getpid()} waits so far: {pacing.stats.summary()}", symbol=symbol, stage='pacing')
+
+def symbol_worker():
+    """Claim symbols from the queue one at a time until none is left."""
+    queue = JobQueue(SYMBOL_QUEUE, lease_size=1, visibility_timeout=SYMBOL_VISIBILITY_TIMEOUT)
+    # One image pipeline per worker: its URL cache and pools serve every symbol the worker crawls
+    with ImagePipeline(on_error=lambda msg: save_log(msg, level=logging.ERROR, stage='images')) as images:
+        for job in queue.jobs():
+            symbol = job['payload']['symbol']
+            save_log(f"Worker {queue.worker} took symbol: {symbol}", print_log=True, symbol=symbol, stage='queue')
+            try:
+                with metrics.timer('symbol', symbol=symbol):
+                    process_symbol(symbol, images, keep_alive=lambda: queue.keep_alive(job))
+            except Exception as exc:
+                queue.fail(job, exc)
+                save_log(f"Symbol {symbol} raised an exception: {exc}", print_log=True,
+                         level=logging.ERROR, symbol=symbol, stage='queue', exc=exc)
+                continue
+            queue.complete([job['id']])
+            save_log(f"Symbol {symbol} completed successfully.", print_log=True, symbol=symbol, stage='queue')
 
 def main():
-    symbols = get_symbols()
-    if not symbols:
-        save_log("No symbols found in the database.", print_log=True)
+    log_queue = setup_logging()
+
+    # Shared queue: idle workers keep pulling symbols, a killed run resumes with what is left.
+    # Only the symbols due now are queued, the ones with most new posts per crawl-second first.
+    queue = JobQueue(SYMBOL_QUEUE)
+    symbols = schedule.enqueue_due(queue, everything=FULL_CRAWL)
+    pending = queue.counts()
+    if not symbols and not pending.get('pending') and not pending.get('running'):
+        save_log("No symbols due for a crawl.", print_log=True)
         sys.exit()
+    save_log(f"Symbols due: {len(symbols)} ({', '.join(symbols[:10])}{'...' if len(symbols) > 10 else ''})", print_log=True)
 
-    max_workers = int(os.getenv("MAX_WORKERS", 5))
-    symbol_iter = iter(symbols)
-    future_to_symbol = {}
+    # Log in once; every worker reuses the saved session
+    ensure_storage_state()
 
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # Submit the first 5 tasks
-        for _ in range(max_workers):
+    max_workers = int(os.getenv("MAX_WORKERS", 5))
+    with metrics.PeriodicExport(), concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, initializer=worker_logging, initargs=(log_queue,)
+    ) as executor:
+        futures = [executor.submit(symbol_worker) for _ in range(max_workers)]
+        for future in concurrent.futures.as_completed(futures):
             try:
-                symbol = next(symbol_iter)
-                future = executor.submit(process_symbol, symbol)
-                future_to_symbol[future] = symbol
-                
-                save_log(f"Submitting task for symbol: {symbol}", print_log=True)
-            except StopIteration:
-                break
-
-        # As each task is completed, submit the next one
-        while future_to_symbol:
-            done, _ = concurrent.futures.wait(
-                future_to_symbol, return_when=concurrent.futures.FIRST_COMPLETED
-            )
-            for future in done:
-                symbol_completed = future_to_symbol.pop(future)
-                try:
-                    future.result()
-                    save_log(f"Symbol {symbol_completed} completed successfully.", print_log=True)
-                except Exception as exc:
-                    save_log(f"Symbol {symbol_completed} raised an exception: {exc}", print_log=True)
-
-                # Submit new task if a symbol is available
-                try:
-                    next_symbol = next(symbol_iter)
-                    new_future = executor.submit(process_symbol, next_symbol)
-                    future_to_symbol[new_future] = next_symbol
-
-                    save_log(f"Submitting task for symbol: {symbol}", print_log=True)
-                except StopIteration:
-                    pass
+                future.result()
+            except Exception as exc:
+                save_log(f"Worker error: {exc}", print_log=True, level=logging.ERROR, exc=exc)
 
+    save_log(f"Symbols queue: {queue.counts()}", print_log=True)
     save_log(f"Execution finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", print_log=True)
 
 
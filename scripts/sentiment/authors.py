@@ -0,0 +1,198 @@
+"""
+Author dimension: dense integer ids and array-backed attributes.
+
+Every author name gets a stable id (its position in the index); followers,
+engagement averages, post counts and the derived influence weights live in
+numpy arrays indexed by that id. Posts are encoded once (only the distinct
+names are looked up, the rows are a vectorized gather of their codes), and
+weighted sentiment indices are computed with np.bincount instead of string
+merges. refresh() pulls only the authors changed since the last refresh and
+recomputes the weights of those rows only.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from config.database import iter_query
+from sentiment.storage import PARQUET_DATA_DIR
+
+AUTHOR_INDEX_PATH = os.getenv("AUTHOR_INDEX_PATH", os.path.join(PARQUET_DATA_DIR, "author_index.parquet"))
+
+ATTRIBUTES = ['followers', 'following', 'avg_likes', 'avg_reshares', 'avg_comments', 'posts']
+WEIGHTS = ['followers', 'engagement', 'volume']
+# stocktwits_authors / authors_data.csv column names
+SOURCE_COLUMNS = {'total_followers': 'followers', 'total_following': 'following'}
+
+CHANGED_AUTHORS_SQL = (
+    "SELECT sa.author, sa.total_followers AS followers, sa.total_following AS following, "
+    "sa.avg_likes, sa.avg_reshares, sa.avg_comments, COALESCE(ae.posts, 0) AS posts, "
+    "GREATEST(sa.updated_at, ae.updated_at) AS updated_at "
+    "FROM stocktwits_authors sa "
+    "LEFT JOIN author_engagement ae ON ae.post_author = sa.author "
+    "WHERE sa.updated_at > %s OR ae.updated_at > %s"
+)
+
+
+def influence_weights(attrs: dict, rows=slice(None)) -> dict:
+    """
+    Per-author weights from the attribute arrays (only `rows`). Each is
+    1 + log1p(metric): heavy-tailed counts are compressed and an author
+    without data still weighs 1, like in the unweighted index.
+    """
+    def w(values):
+        return 1.0 + np.log1p(np.nan_to_num(values[rows], nan=0.0).clip(min=0))
+
+    return {
+        'followers': w(attrs['followers']),
+        'engagement': w(attrs['avg_likes'] + attrs['avg_reshares'] + attrs['avg_comments']),
+        'volume': w(attrs['posts']),
+    }
+
+
+class AuthorIndex:
+    def __init__(self, names=None, attrs=None, watermark=None):
+        self.names = list(names or [])
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        size = len(self.names)
+        # Copied: arrays from a memory-mapped Parquet table can be read-only, and update() writes in place
+        self.attrs = {key: np.array(attrs[key], dtype=np.float64, copy=True) if attrs else np.zeros(size)
+                      for key in ATTRIBUTES}
+        self.weights = influence_weights(self.attrs)
+        self.watermark = watermark
+
+    def __len__(self):
+        return len(self.names)
+
+    def _grow(self, new_names):
+        start = len(self.names)
+        for offset, name in enumerate(new_names):
+            self.ids[name] = start + offset
+        self.names.extend(new_names)
+        extra = len(new_names)
+        for key in ATTRIBUTES:
+            self.attrs[key] = np.concatenate([self.attrs[key], np.zeros(extra)])
+        for key in WEIGHTS:
+            self.weights[key] = np.concatenate([self.weights[key], np.ones(extra)])
+
+    def lookup(self, names, add=False) -> np.ndarray:
+        """Ids of `names` (-1 when unknown, or a new id with add=True)."""
+        names = list(names)
+        if add:
+            new = [name for name in dict.fromkeys(names) if name not in self.ids]
+            if new:
+                self._grow(new)
+        return np.fromiter((self.ids.get(name, -1) for name in names), dtype=np.int64, count=len(names))
+
+    def encode(self, authors: pd.Series) -> np.ndarray:
+        """
+        Author ids of a post column: only the distinct names are looked up
+        (the categories of a categorical column, as loaded from Parquet),
+        every row is then a gather of its code.
+        """
+        if not isinstance(authors.dtype, pd.CategoricalDtype):
+            authors = authors.astype('category')
+        category_ids = self.lookup(authors.cat.categories)
+        codes = authors.cat.codes.to_numpy()
+        ids = np.full(len(codes), -1, dtype=np.int32)
+        known = codes >= 0
+        ids[known] = category_ids[codes[known]]
+        return ids
+
+    def update(self, frame: pd.DataFrame) -> np.ndarray:
+        """Write the attributes of the authors in `frame` and recompute the weights of those rows only."""
+        frame = frame.rename(columns=SOURCE_COLUMNS)
+        for key in ATTRIBUTES:
+            if key not in frame:
+                frame[key] = 0
+        ids = self.lookup(frame['author'], add=True)
+        for key in ATTRIBUTES:
+            self.attrs[key][ids] = pd.to_numeric(frame[key], errors='coerce').fillna(0).to_numpy(np.float64)
+        for key, values in influence_weights(self.attrs, ids).items():
+            self.weights[key][ids] = values
+        if 'updated_at' in frame and frame['updated_at'].notna().any():
+            latest = pd.Timestamp(frame['updated_at'].max())
+            self.watermark = max(latest, self.watermark) if self.watermark is not None else latest
+        return ids
+
+    def refresh(self, chunk_rows=50_000) -> int:
+        """Apply the authors (and engagement rollups) changed since the last refresh; returns how many."""
+        since = (self.watermark or pd.Timestamp('1970-01-01')).to_pydatetime()
+        changed, rows = 0, []
+        for row in iter_query(CHANGED_AUTHORS_SQL, (since, since), itersize=chunk_rows):
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                changed += len(self.update(pd.DataFrame(rows)))
+                rows = []
+        if rows:
+            changed += len(self.update(pd.DataFrame(rows)))
+        return changed
+
+    def weight_of(self, ids: np.ndarray, kind='followers') -> np.ndarray:
+        """Gather of the `kind` weight per post; unknown authors (-1) weigh 1."""
+        weights = self.weights[kind]
+        if not len(weights):
+            return np.ones(len(ids))
+        return np.where(ids >= 0, weights[np.maximum(ids, 0)], 1.0)
+
+    def save(self, path=AUTHOR_INDEX_PATH):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({'author': self.names, **{key: self.attrs[key] for key in ATTRIBUTES}})
+        meta = {b'author_index': json.dumps({'watermark': str(self.watermark) if self.watermark else None}).encode()}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        pq.write_table(table.replace_schema_metadata(meta), path)
+
+    @classmethod
+    def load(cls, path=AUTHOR_INDEX_PATH) -> 'AuthorIndex':
+        """The saved index (row order = ids), or an empty one."""
+        import pyarrow.parquet as pq
+
+        if not os.path.exists(path):
+            return cls()
+        table = pq.read_table(path, memory_map=True)
+        meta = json.loads((table.schema.metadata or {}).get(b'author_index', b'{}'))
+        watermark = pd.Timestamp(meta['watermark']) if meta.get('watermark') else None
+        attrs = {key: table.column(key).to_numpy() for key in ATTRIBUTES}
+        return cls(table.column('author').to_pylist(), attrs, watermark)
+
+
+def weighted_index(index: AuthorIndex, posts: pd.DataFrame, weight='followers', freq='D',
+                   by_symbol=True) -> pd.DataFrame:
+    """
+    Author-weighted sentiment per (symbol,) period: sum(w * s) / sum(w),
+    with s in {-1, 0, 1} from sentiment_label and w the author's `weight`
+    ('followers', 'engagement' or 'volume'). Also returns the unweighted
+    mean and the volume for comparison.
+    """
+    from sentiment.rollups import SENTIMENT_VALUES
+
+    author_ids = posts['author_id'].to_numpy() if 'author_id' in posts else index.encode(posts['post_author'])
+    w = index.weight_of(author_ids, weight)
+    labels = posts['sentiment_label'].astype('category')
+    values = labels.cat.categories.str.lower().map(SENTIMENT_VALUES).to_numpy(dtype=np.float64)
+    # Only labelled rows are gathered: with an all-null column there are no categories to index
+    label_codes = labels.cat.codes.to_numpy()
+    labelled_rows = label_codes >= 0
+    s = np.full(len(label_codes), np.nan)
+    s[labelled_rows] = values[label_codes[labelled_rows]]
+    valid = ~np.isnan(s)
+
+    keys = [pd.to_datetime(posts['post_date']).dt.floor(freq).rename('bucket')]
+    if by_symbol:
+        keys.insert(0, posts['symbol'].astype(str).rename('symbol'))
+    groups = pd.MultiIndex.from_arrays(keys) if len(keys) > 1 else pd.Index(keys[0])
+    codes, uniques = pd.factorize(groups, sort=True)
+    n = len(uniques)
+
+    weighted_sum = np.bincount(codes[valid], weights=(w * s)[valid], minlength=n)
+    weight_sum = np.bincount(codes[valid], weights=w[valid], minlength=n)
+    plain_sum = np.bincount(codes[valid], weights=s[valid], minlength=n)
+    labelled = np.bincount(codes[valid], minlength=n)
+    volume = np.bincount(codes, minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'volume': volume,
+            'sentiment': plain_sum / labelled,
+            f'{weight}_weighted_sentiment': weighted_sum / weight_sum,
+        }, index=uniques)
@@ -0,0 +1,243 @@
+"""
+Offline CPU benchmark of the sentiment classifiers.
+
+Every configuration (model x runtime variant x batch size x threads x
+max_length) runs in a fresh spawned process, so cold start (imports, model
+load, first call) and peak RSS are those of that configuration alone. The
+process scores the checked-in labelled sample in fixed-size batches and
+reports texts/sec, per-batch latency percentiles and the notebook's quality
+metrics. Models are read from the local Hugging Face cache (or a local
+directory / tiny test model id): nothing is downloaded.
+"""
+import os
+import json
+import time
+import platform
+import resource
+import itertools
+import concurrent.futures
+import multiprocessing
+import numpy as np
+from sentiment.inference import MODEL_ID, SENTIMENT_ONNX_DIR
+from sentiment.storage import model_dir
+
+BENCHMARK_SAMPLE = os.getenv("BENCHMARK_SAMPLE", "../data/benchmark/labelled_sample.jsonl")
+BENCHMARK_REPEATS = int(os.getenv("BENCHMARK_REPEATS", 3))
+
+# The models of notebooks/model_benchmark.ipynb
+MODELS = {
+    'FinTwitBERT': "StephanAkkerman/FinTwitBERT-sentiment",
+    'BERTweet': "finiteautomata/bertweet-base-sentiment-analysis",
+    'Twitter-RoBERTa': "cardiffnlp/twitter-roberta-base-sentiment-latest",
+    'FinBERT': "ProsusAI/finbert",
+}
+# runtime variant -> SentimentModel arguments
+VARIANTS = {
+    'torch': {'runtime': 'torch'},
+    'onnx-fp32': {'runtime': 'onnx', 'quantized': False},
+    'onnx-int8': {'runtime': 'onnx', 'quantized': True},
+}
+# Sample labels (twitter-financial-news-sentiment convention), as in the notebook
+LABEL_MAP = {0: 'negative', 1: 'positive', 2: 'neutral'}
+CLASSES = ['negative', 'neutral', 'positive']
+
+
+def load_sample(path=BENCHMARK_SAMPLE):
+    """(texts, labels) of the labelled sample (JSON lines with text and label 0/1/2)."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row['text'])
+                labels.append(LABEL_MAP[int(row['label'])])
+    return texts, labels
+
+
+def map_prediction(label) -> str:
+    """The notebook's mapping of each model's label names onto negative/neutral/positive."""
+    label = str(label).lower()
+    if any(x in label for x in ('bearish', 'neg')):
+        return 'negative'
+    if any(x in label for x in ('bullish', 'pos')):
+        return 'positive'
+    return 'neutral'
+
+
+def quality(true_labels, pred_labels) -> dict:
+    """Accuracy, weighted F1 and per-class F1 (sklearn's definitions)."""
+    true = np.asarray(true_labels)
+    pred = np.asarray(pred_labels)
+    per_class, support = {}, []
+    for cls in CLASSES:
+        tp = np.sum((pred == cls) & (true == cls))
+        precision = tp / max(1, np.sum(pred == cls))
+        recall = tp / max(1, np.sum(true == cls))
+        per_class[cls] = float(2 * precision * recall / (precision + recall)) if precision + recall else 0.0
+        support.append(np.sum(true == cls))
+    support = np.asarray(support, dtype=np.float64)
+    return {
+        'accuracy': float(np.mean(true == pred)) if len(true) else 0.0,
+        'f1_weighted': float(np.dot(list(per_class.values()), support) / max(1.0, support.sum())),
+        'f1_per_class': per_class,
+    }
+
+
+def onnx_dir(model_id) -> str:
+    """Where export_onnx() puts the graphs of `model_id` (SENTIMENT_ONNX_DIR for the default model)."""
+    if model_id == MODEL_ID:
+        return SENTIMENT_ONNX_DIR
+    return os.path.join("models", f"{model_dir(model_id)}-onnx")
+
+
+def configurations(models, variants, batch_sizes, threads, max_lengths):
+    for (name, model_id), variant, batch_size, n_threads, max_length in itertools.product(
+            models.items(), variants, batch_sizes, threads, max_lengths):
+        yield {
+            'model': name, 'model_id': model_id, 'variant': variant,
+            'batch_size': batch_size, 'threads': n_threads, 'max_length': max_length,
+        }
+
+
+def config_key(config) -> str:
+    """Stable id of a configuration, used to diff two result files."""
+    return (f"{config['model']}|{config['variant']}|bs={config['batch_size']}"
+            f"|threads={config['threads']}|len={config['max_length']}")
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+
+
+def _run_config(config, texts, labels, repeats):
+    # Runs in a fresh process: pin the math libraries before torch/onnxruntime load
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(config['threads'])
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    rss_start = _rss_mb()
+
+    start = time.perf_counter()
+    from sentiment.inference import SentimentModel
+
+    batch_size = config['batch_size']
+    model_dir_path = config['model_id'] if VARIANTS[config['variant']]['runtime'] == 'torch' else onnx_dir(config['model_id'])
+    model = SentimentModel(
+        model_id=config['model_id'], onnx_dir=model_dir_path, threads=config['threads'],
+        max_length=config['max_length'], max_batch=batch_size,
+        token_budget=batch_size * config['max_length'], **VARIANTS[config['variant']],
+    )
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    t = time.perf_counter()
+    model.predict(texts[:1])
+    first_call_seconds = time.perf_counter() - t
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    latencies, predictions = [], []
+    t = time.perf_counter()
+    for repeat in range(repeats):
+        for batch in batches:
+            b = time.perf_counter()
+            results = model.predict(batch)
+            latencies.append(time.perf_counter() - b)
+            if repeat == 0:
+                predictions.extend(label for label, _ in results)
+    seconds = time.perf_counter() - t
+    latencies = np.asarray(latencies) * 1000
+
+    return {
+        'texts_per_sec': len(texts) * repeats / seconds if seconds else 0.0,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'max': float(latencies.max()),
+        },
+        'cold_start': {
+            'load_seconds': load_seconds,
+            'first_call_seconds': first_call_seconds,
+            'total_seconds': load_seconds + first_call_seconds,
+        },
+        'rss_mb': {'start': rss_start, 'loaded': rss_loaded, 'peak': _rss_mb()},
+        'quality': quality(labels, [map_prediction(label) for label in predictions]),
+    }
+
+
+def run_config(config, texts, labels, repeats=BENCHMARK_REPEATS) -> dict:
+    """Benchmark one configuration in its own process; failures (e.g. model not cached) are recorded, not raised."""
+    context = multiprocessing.get_context("spawn")
+    result = {'key': config_key(config), **config}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        try:
+            result.update(executor.submit(_run_config, config, texts, labels, repeats).result())
+            result['status'] = 'ok'
+        except Exception as exc:
+            result['status'] = 'error'
+            result['error'] = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def environment() -> dict:
+    from importlib import metadata
+
+    versions = {}
+    for package in ("torch", "transformers", "onnxruntime", "tokenizers", "numpy"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+    }
+
+
+def run(configs, sample=BENCHMARK_SAMPLE, repeats=BENCHMARK_REPEATS, on_result=None) -> dict:
+    """Run every configuration; returns the machine-readable report (environment, sample, results)."""
+    texts, labels = load_sample(sample)
+    results = []
+    for config in configs:
+        result = run_config(config, texts, labels, repeats)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return {
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'environment': environment(),
+        'sample': {'path': sample, 'texts': len(texts), 'repeats': repeats},
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance=0.1, f1_tolerance=0.01) -> list:
+    """
+    Configurations present in both reports whose throughput, p95 latency,
+    peak RSS or cold start got worse by more than `tolerance` (relative
+    change), or whose weighted F1 dropped by more than `f1_tolerance`
+    (absolute difference).
+    """
+    before = {r['key']: r for r in baseline['results'] if r.get('status') == 'ok'}
+    checks = [
+        ('texts_per_sec', lambda r: r['texts_per_sec'], True),
+        ('latency_p95_ms', lambda r: r['latency_ms']['p95'], False),
+        ('peak_rss_mb', lambda r: r['rss_mb']['peak'], False),
+        ('cold_start_seconds', lambda r: r['cold_start']['total_seconds'], False),
+    ]
+    regressions = []
+    for result in current['results']:
+        old = before.get(result['key'])
+        if old is None or result.get('status') != 'ok':
+            continue
+        for metric, get, higher_is_better in checks:
+            a, b = get(old), get(result)
+            change = (b - a) / a if a else 0.0
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({'key': result['key'], 'metric': metric, 'baseline': a, 'current': b, 'change': change})
+        a, b = old['quality']['f1_weighted'], result['quality']['f1_weighted']
+        if a - b > f1_tolerance:
+            regressions.append({'key': result['key'], 'metric': 'f1_weighted', 'baseline': a, 'current': b, 'change': b - a})
+    return regressions
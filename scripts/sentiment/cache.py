@@ -0,0 +1,118 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+SENTIMENT_CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", ".cache/sentiment.sqlite")
+SENTIMENT_CACHE_MAX_ROWS = int(os.getenv("SENTIMENT_CACHE_MAX_ROWS", 5_000_000))
+SENTIMENT_CACHE_EVICT_FRACTION = float(os.getenv("SENTIMENT_CACHE_EVICT_FRACTION", 0.1))
+
+SQLITE_MAX_PARAMS = 900  # stay under SQLITE_MAX_VARIABLE_NUMBER of older builds
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS predictions (
+    key BLOB PRIMARY KEY,
+    label TEXT NOT NULL,
+    score REAL NOT NULL,
+    used_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS predictions_used_at ON predictions(used_at);
+"""
+
+
+def cache_key(model_key: str, text: str) -> bytes:
+    """128-bit digest of (model, cleaned text); the text itself is never stored."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model_key.encode())
+    digest.update(b"\0")
+    digest.update(text.encode())
+    return digest.digest()
+
+
+class PredictionCache:
+    """
+    Persistent (label, score) store for cleaned texts, shared across runs.
+
+    get_many() resolves a whole batch of keys with a few IN queries before
+    inference, put_many() stores the misses afterwards. Once the table grows
+    past `max_rows` the least recently used SENTIMENT_CACHE_EVICT_FRACTION
+    of it is deleted. hits/misses are counted for the hit rate.
+    """
+
+    def __init__(self, path=SENTIMENT_CACHE_PATH, max_rows=SENTIMENT_CACHE_MAX_ROWS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        # One thread at a time, but not necessarily the one that opened it (pipeline stages)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(CREATE_SQL)
+        self._rows = self._count()
+
+    def _count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, keys) -> dict:
+        """{key: (label, score)} for the keys found; touches their used_at."""
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+            chunk = keys[start:start + SQLITE_MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, label, score FROM predictions WHERE key IN ({marks})", chunk
+            ).fetchall()
+            found.update((key, (label, score)) for key, label, score in rows)
+        if found:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE predictions SET used_at = ? WHERE key = ?", ((now, key) for key in found)
+                )
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """items: (key, label, score) tuples."""
+        items = [(key, label, float(score), time.time()) for key, label, score in items]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, label, score, used_at) VALUES (?, ?, ?, ?)", items
+            )
+        # Upper bound (replaced keys are counted too); recounted only when it crosses the limit
+        self._rows += len(items)
+        if self._rows > self.max_rows:
+            self.evict()
+
+    def evict(self):
+        self._rows = self._count()
+        if self._rows <= self.max_rows:
+            return 0
+        excess = self._rows - self.max_rows + int(self.max_rows * SENTIMENT_CACHE_EVICT_FRACTION)
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+        self._rows -= excess
+        return excess
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
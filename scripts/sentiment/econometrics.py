@@ -0,0 +1,259 @@
+"""
+Sentiment vs. market: as-of alignment and per-symbol econometrics.
+
+Hourly sentiment sums (sentiment/rollups.py) are assigned to the first
+market bar that closes after them, so posts written overnight, on weekends
+or on holidays count towards the next trading session of a stock, while
+crypto symbols (24/7 bars) get their own calendar. Returns and realized
+volatility are computed per symbol with grouped vectorized operations.
+
+The aligned panel is cached as Parquet under a key of its inputs, so
+re-running the tests with other lags or windows skips the join. The tests
+(rolling correlation, lagged OLS with HAC errors, Granger causality in both
+directions) run one symbol per worker process.
+"""
+import io
+import os
+import json
+import hashlib
+import warnings
+import contextlib
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from config.database import execute_query
+from sentiment import rollups
+from sentiment.storage import DATASETS, PARQUET_DATA_DIR, load_dataset
+
+MARKET_CSV = os.getenv("MARKET_CSV", "../data/market_data.csv")
+MARKET_CLOSE_COLUMN = os.getenv("MARKET_CLOSE_COLUMN", "Close")
+MARKET_HIGH_COLUMN = os.getenv("MARKET_HIGH_COLUMN", "High")
+MARKET_LOW_COLUMN = os.getenv("MARKET_LOW_COLUMN", "Low")
+# Daily bars are stamped with the session date; the session closes this many hours later (UTC)
+MARKET_CLOSE_HOUR_UTC = float(os.getenv("MARKET_CLOSE_HOUR_UTC", 21))
+ECON_CACHE_DIR = os.getenv("ECON_CACHE_DIR", ".cache/econometrics")
+ECON_WORKERS = int(os.getenv("ECON_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+CRYPTO_SUFFIXES = ('-USD', '.X')
+TRADING_DAYS = {'equity': 252, 'crypto': 365}
+
+
+def is_crypto(symbol: str) -> bool:
+    return str(symbol).upper().endswith(CRYPTO_SUFFIXES)
+
+
+def load_market(symbols=None, start=None, end=None) -> pd.DataFrame:
+    """Daily bars as (symbol, date, close[, high, low]); from the Parquet dataset when exported, else the CSV."""
+    date_col = DATASETS['market']['time']
+    symbol_col = DATASETS['market']['symbol']
+    wanted = [date_col, 'symbol', MARKET_CLOSE_COLUMN, MARKET_HIGH_COLUMN, MARKET_LOW_COLUMN]
+    if os.path.isdir(os.path.join(PARQUET_DATA_DIR, 'market')):
+        df = load_dataset('market', symbols=symbols, start=start, end=end)
+    else:
+        df = pd.read_csv(MARKET_CSV).rename(columns={symbol_col: 'symbol'})
+        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+        if symbols is not None:
+            df = df[df['symbol'].isin(list(symbols))]
+    df = df[[column for column in wanted if column in df.columns]]
+    df = df.rename(columns={date_col: 'date', MARKET_CLOSE_COLUMN: 'close',
+                            MARKET_HIGH_COLUMN: 'high', MARKET_LOW_COLUMN: 'low'})
+    df['date'] = pd.to_datetime(df['date'], utc=True).dt.tz_localize(None).dt.normalize()
+    df['symbol'] = df['symbol'].astype(str)
+    return df.dropna(subset=['date', 'close']).sort_values(['symbol', 'date'], ignore_index=True)
+
+
+def bar_close_times(bars: pd.DataFrame) -> pd.Series:
+    """Close timestamp (UTC, naive) of each daily bar: the session close for stocks, midnight UTC for crypto."""
+    crypto = bars['symbol'].map(is_crypto).to_numpy()
+    offset = np.where(crypto, pd.Timedelta(days=1), pd.Timedelta(hours=MARKET_CLOSE_HOUR_UTC))
+    return bars['date'] + pd.to_timedelta(offset)
+
+
+def add_returns(bars: pd.DataFrame, vol_window=20) -> pd.DataFrame:
+    """Log returns, absolute returns and annualized realized volatility (rolling and, with high/low, Parkinson)."""
+    bars = bars.sort_values(['symbol', 'date'], ignore_index=True)
+    log_close = np.log(bars['close'].astype(float))
+    bars['ret'] = log_close.groupby(bars['symbol']).diff()
+    bars['abs_ret'] = bars['ret'].abs()
+    periods = np.where(bars['symbol'].map(is_crypto), TRADING_DAYS['crypto'], TRADING_DAYS['equity'])
+    rolling_std = bars.groupby('symbol')['ret'].rolling(vol_window, min_periods=max(2, vol_window // 2)).std()
+    bars['rv'] = rolling_std.reset_index(level=0, drop=True).sort_index() * np.sqrt(periods)
+    if {'high', 'low'} <= set(bars.columns):
+        hl = np.log(bars['high'].astype(float) / bars['low'].astype(float)) ** 2 / (4 * np.log(2))
+        bars['parkinson_rv'] = np.sqrt(hl * periods)
+    return bars
+
+
+def align(sentiment: pd.DataFrame, bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    As-of join of hourly sentiment sums (bucket, symbol, rollup sums) onto
+    daily bars: each bucket goes to the first bar of its symbol closing
+    after the end of the bucket, then the sums are added up per bar and
+    turned into sentiment ratios. Bars without posts keep volume 0.
+    """
+    bars = bars.copy()
+    bars['bar_close'] = bar_close_times(bars)
+    sentiment = sentiment.copy()
+    sentiment['bucket_end'] = pd.to_datetime(sentiment['bucket']) + pd.Timedelta(hours=1)
+    sentiment = sentiment[sentiment['symbol'].isin(bars['symbol'].unique())]
+
+    matched = pd.merge_asof(
+        sentiment.sort_values('bucket_end'),
+        bars[['symbol', 'bar_close']].sort_values('bar_close'),
+        left_on='bucket_end', right_on='bar_close', by='symbol', direction='forward',
+    ).dropna(subset=['bar_close'])
+    sums = matched.groupby(['symbol', 'bar_close'])[rollups.ROLLUP_COLUMNS].sum()
+
+    panel = bars.merge(sums, left_on=['symbol', 'bar_close'], right_index=True, how='left')
+    panel[rollups.ROLLUP_COLUMNS] = panel[rollups.ROLLUP_COLUMNS].fillna(0)
+    labelled = panel['bullish'] + panel['bearish'] + panel['neutral']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        panel['sentiment'] = panel['sentiment_sum'] / labelled
+        panel['weighted_sentiment'] = panel['weighted_sum'] / panel['confidence_sum']
+        panel['bullish_share'] = panel['bullish'] / labelled
+    panel['volume'] = panel['posts']
+    panel['log_volume'] = np.log1p(panel['posts'])
+    return panel.sort_values(['symbol', 'date'], ignore_index=True)
+
+
+def load_sentiment_sums(model_key, symbols=None, start=None, end=None) -> pd.DataFrame:
+    """Hourly rollup sums (no ratios) straight from sentiment_rollups."""
+    symbols = list(symbols) if symbols else None
+    query = (
+        "SELECT bucket, symbol, " + ", ".join(rollups.ROLLUP_COLUMNS) + " FROM sentiment_rollups "
+        "WHERE model_key = %s AND granularity = 'hour' AND symbol <> %s"
+        + (" AND symbol = ANY(%s)" if symbols else "")
+        + (" AND bucket >= %s" if start is not None else "")
+        + (" AND bucket < %s" if end is not None else "")
+    )
+    params = [model_key, rollups.ALL_SYMBOLS]
+    params += [symbols] if symbols else []
+    params += [pd.Timestamp(start).to_pydatetime()] if start is not None else []
+    params += [pd.Timestamp(end).to_pydatetime()] if end is not None else []
+    rows = execute_query(query, tuple(params)) or []
+    return pd.DataFrame(rows, columns=['bucket', 'symbol'] + rollups.ROLLUP_COLUMNS)
+
+
+def _signature(model_key, symbols, start, end, vol_window) -> str:
+    rollup_state = execute_query(
+        "SELECT COUNT(*) AS n, MAX(updated_at) AS updated FROM sentiment_rollups WHERE model_key = %s",
+        (model_key,),
+    ) or [{}]
+    market_path = os.path.join(PARQUET_DATA_DIR, 'market')
+    market_path = market_path if os.path.isdir(market_path) else MARKET_CSV
+    state = {
+        'model': model_key, 'symbols': sorted(symbols) if symbols else None,
+        'start': str(start), 'end': str(end), 'vol_window': vol_window,
+        'close_hour': MARKET_CLOSE_HOUR_UTC, 'rollups': rollup_state[0],
+        'market': [market_path, os.path.getmtime(market_path) if os.path.exists(market_path) else None],
+    }
+    return hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def aligned_panel(model_key, symbols=None, start=None, end=None, vol_window=20, refresh=False) -> pd.DataFrame:
+    """Aligned sentiment/market panel, rebuilt only when the rollups, market data or parameters changed."""
+    path = os.path.join(ECON_CACHE_DIR, f"panel-{_signature(model_key, symbols, start, end, vol_window)}.parquet")
+    if not refresh and os.path.exists(path):
+        return pd.read_parquet(path)
+    bars = add_returns(load_market(symbols, start, end), vol_window)
+    panel = align(load_sentiment_sums(model_key, symbols, start, end), bars)
+    os.makedirs(ECON_CACHE_DIR, exist_ok=True)
+    panel.to_parquet(path, index=False)
+    return panel
+
+
+def _symbol_tests(symbol, frame, lags, window, targets, signal):
+    """
+    All tests of one symbol; runs in a worker process. Bars without labelled
+    posts have no sentiment and are left out rather than counted as neutral;
+    the lagged regressors still refer to the previous bars of the calendar.
+    """
+    from statsmodels.api import OLS, add_constant
+    from statsmodels.tsa.stattools import grangercausalitytests
+
+    frame = frame.sort_values('date').reset_index(drop=True)
+    out = {'correlations': [], 'regressions': [], 'granger': []}
+
+    for target in targets:
+        bars = frame[['date', target, signal]]
+        data = bars.dropna()
+        if len(data) < max(window, lags + 10):
+            continue
+        rolling = data[target].rolling(window).corr(data[signal])
+        out['correlations'].append({
+            'symbol': symbol, 'target': target, 'window': window, 'observations': len(data),
+            'corr': data[target].corr(data[signal]),
+            'rolling_mean': rolling.mean(), 'rolling_min': rolling.min(), 'rolling_max': rolling.max(),
+            'rolling_last': rolling.iloc[-1],
+        })
+
+        # target_t on signal_{t-1..t-lags} with the target's own first lag as control
+        design = pd.concat(
+            {f"{signal}_lag{k}": bars[signal].shift(k) for k in range(1, lags + 1)}
+            | {f"{target}_lag1": bars[target].shift(1)},
+            axis=1,
+        )
+        sample = pd.concat([bars[target], design], axis=1).dropna()
+        if len(sample) > design.shape[1] + 5:
+            fit = OLS(sample[target], add_constant(sample[design.columns])).fit(
+                cov_type='HAC', cov_kwds={'maxlags': lags})
+            for name in design.columns:
+                out['regressions'].append({
+                    'symbol': symbol, 'target': target, 'lags': lags, 'term': name,
+                    'coef': fit.params[name], 'std_err': fit.bse[name], 'p_value': fit.pvalues[name],
+                    'r2': fit.rsquared, 'observations': int(fit.nobs),
+                })
+
+        # Granger needs a gap-free series: it runs on the bars that have sentiment
+        for cause, effect in ((signal, target), (target, signal)):
+            pair = data[[effect, cause]]
+            if pair[cause].std() == 0 or pair[effect].std() == 0:
+                continue
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                try:
+                    # Newer statsmodels dropped `verbose`; older ones print the tables unless told not to
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        results = grangercausalitytests(pair, maxlag=lags)
+                except Exception:
+                    continue
+            for lag, (tests, _) in results.items():
+                f_stat, p_value, _, _ = tests['ssr_ftest']
+                out['granger'].append({
+                    'symbol': symbol, 'cause': cause, 'effect': effect, 'lag': lag,
+                    'f_stat': f_stat, 'p_value': p_value,
+                })
+    return out
+
+
+def run_tests(panel: pd.DataFrame, lags=5, window=30, targets=('ret', 'abs_ret', 'rv'),
+              signal='sentiment', workers=ECON_WORKERS) -> dict:
+    """
+    Rolling correlations, lagged regressions and Granger tests of `signal`
+    against every target for every symbol of the panel, one symbol per
+    worker process. Returns {'correlations', 'regressions', 'granger'} DataFrames.
+    """
+    targets = [target for target in targets if target in panel.columns]
+    columns = ['date', signal] + targets
+    groups = [(symbol, frame[columns].copy()) for symbol, frame in panel.groupby('symbol', sort=True)]
+    results = {'correlations': [], 'regressions': [], 'granger': []}
+
+    if workers <= 1:
+        outputs = (_symbol_tests(symbol, frame, lags, window, targets, signal) for symbol, frame in groups)
+        for output in outputs:
+            for name, rows in output.items():
+                results[name].extend(rows)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_symbol_tests, symbol, frame, lags, window, targets, signal)
+                       for symbol, frame in groups]
+            for future in concurrent.futures.as_completed(futures):
+                for name, rows in future.result().items():
+                    results[name].extend(rows)
+
+    sort_keys = {'correlations': ['symbol', 'target'], 'regressions': ['symbol', 'target', 'term'],
+                 'granger': ['symbol', 'effect', 'cause', 'lag']}
+    return {
+        name: pd.DataFrame(rows).sort_values(sort_keys[name], ignore_index=True) if rows else pd.DataFrame()
+        for name, rows in results.items()
+    }
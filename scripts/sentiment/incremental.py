@@ -0,0 +1,156 @@
+"""
+Incremental scoring: only posts scraped since the last run are classified.
+
+A watermark per model configuration (sentiment_watermarks) remembers the
+highest stocktwits_posts.id scored. Scrapers insert concurrently, so an id
+can commit after a higher one was already scored: each run therefore
+re-scans SCORING_LOOKBACK ids below the watermark and skips the ids already
+recorded in sentiment_scored_ids. The newer posts are streamed through a
+server-side cursor in chunks, scored and appended to the partitioned
+dataset; the hourly/daily rollups, the scored ids and the watermark move
+together, in one transaction per chunk, so an interrupted run resumes where
+it stopped without counting a chunk twice. The files of a chunk whose
+transaction never ran are deleted at the start of the next run.
+"""
+import os
+import glob
+import time
+import pandas as pd
+from psycopg2.extras import execute_values
+from config.database import cursor, iter_query, execute_query
+from sentiment.text import clean_text_for_finbert
+from sentiment.inference import Scorer
+from sentiment.storage import SENTIMENT_DATA_DIR, append_partitioned, model_dir
+from sentiment import rollups
+
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", 5000))
+SCORING_LOOKBACK = int(os.getenv("SCORING_LOOKBACK", 5000))  # ids below the watermark re-checked for late commits
+
+UNSCORED_POSTS_SQL = (
+    "SELECT p.id, p.symbol, p.post_id, p.post_author, p.post_date, p.post_text, "
+    "p.post_likes, p.post_comments, p.post_reshares "
+    "FROM stocktwits_posts p WHERE p.id > %s AND NOT EXISTS ("
+    "    SELECT 1 FROM sentiment_scored_ids s WHERE s.model_key = %s AND s.id = p.id"
+    ") ORDER BY p.id"
+)
+
+# ids_from: every scored id above it is in sentiment_scored_ids (NULL for watermarks older than that table)
+GET_WATERMARK_SQL = (
+    "SELECT last_post_id, COALESCE(ids_from, last_post_id) AS ids_from, pending_part "
+    "FROM sentiment_watermarks WHERE model_key = %s"
+)
+
+SET_WATERMARK_SQL = (
+    "INSERT INTO sentiment_watermarks (model_key, last_post_id, last_post_date, scored, ids_from, updated_at) "
+    "VALUES (%s, %s, %s, %s, 0, now()) "
+    "ON CONFLICT (model_key) DO UPDATE SET "
+    "last_post_id = GREATEST(sentiment_watermarks.last_post_id, EXCLUDED.last_post_id), "
+    "last_post_date = GREATEST(sentiment_watermarks.last_post_date, EXCLUDED.last_post_date), "
+    "scored = sentiment_watermarks.scored + EXCLUDED.scored, pending_part = NULL, updated_at = now()"
+)
+
+SET_PENDING_SQL = (
+    "INSERT INTO sentiment_watermarks (model_key, ids_from, pending_part) VALUES (%s, 0, %s) "
+    "ON CONFLICT (model_key) DO UPDATE SET pending_part = EXCLUDED.pending_part"
+)
+
+RECORD_SCORED_SQL = "INSERT INTO sentiment_scored_ids (model_key, id) VALUES %s ON CONFLICT DO NOTHING"
+
+PRUNE_SCORED_SQL = "DELETE FROM sentiment_scored_ids WHERE model_key = %s AND id <= %s"
+
+RAISE_IDS_FROM_SQL = (
+    "UPDATE sentiment_watermarks SET ids_from = GREATEST(COALESCE(ids_from, last_post_id), %s) "
+    "WHERE model_key = %s"
+)
+
+
+def get_watermark(key: str) -> dict:
+    """last_post_id, ids_from and pending_part of `key` (zeros for a model never run)."""
+    rows = execute_query(GET_WATERMARK_SQL, (key,))
+    return dict(rows[0]) if rows else {'last_post_id': 0, 'ids_from': 0, 'pending_part': None}
+
+
+def set_watermark(cur, key: str, last_post_id: int, last_post_date, scored: int):
+    cur.execute(SET_WATERMARK_SQL, (key, last_post_id, last_post_date, scored))
+
+
+def record_scored(cur, key: str, ids):
+    execute_values(cur, RECORD_SCORED_SQL, [(key, int(i)) for i in ids], page_size=SCORING_CHUNK_SIZE)
+
+
+def set_pending(key: str, basename):
+    with cursor() as cur:
+        cur.execute(SET_PENDING_SQL, (key, basename))
+
+
+def discard_pending(root: str, basename) -> int:
+    """Delete the files of a chunk written by an interrupted run (its transaction never committed)."""
+    if not basename:
+        return 0
+    paths = glob.glob(os.path.join(root, "**", f"{basename}.parquet"), recursive=True)
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+
+def prune_scored(key: str, below: int):
+    """Forget the scored ids at or below `below`; the next runs do not look back that far."""
+    with cursor() as cur:
+        cur.execute(PRUNE_SCORED_SQL, (key, below))
+        cur.execute(RAISE_IDS_FROM_SQL, (below, key))
+
+
+def iter_chunks(key: str, after_id: int, chunk_size=SCORING_CHUNK_SIZE):
+    """DataFrames of up to `chunk_size` posts with id > after_id not scored yet by `key`, in id order."""
+    rows = []
+    for row in iter_query(UNSCORED_POSTS_SQL, (after_id, key), itersize=chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def score_chunk(scorer: Scorer, df: pd.DataFrame):
+    df['cleaned_text'] = df['post_text'].map(clean_text_for_finbert)
+    results, stats = scorer.predict(df['cleaned_text'].tolist())
+    df['sentiment_label'] = [label for label, _ in results]
+    df['confidence'] = [score for _, score in results]
+    return df, stats
+
+
+def run(scorer: Scorer, out_dir=SENTIMENT_DATA_DIR, chunk_size=SCORING_CHUNK_SIZE, on_chunk=print) -> dict:
+    """Score every post newer than the watermark of `scorer`'s model; returns run totals."""
+    key = scorer.key
+    root = os.path.join(out_dir, f"model={model_dir(key)}")
+    state = get_watermark(key)
+    discard_pending(root, state['pending_part'])
+    watermark = state['last_post_id']
+    floor = max(state['ids_from'], watermark - SCORING_LOOKBACK)
+    totals = {'model': key, 'from_id': floor, 'posts': 0, 'inferred': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+
+    for df in iter_chunks(key, floor, chunk_size):
+        df, stats = score_chunk(scorer, df)
+        first_id, last_id = int(df['id'].iloc[0]), int(df['id'].iloc[-1])
+        # Named by the first id: the files are deleted by the next run unless the transaction below commits
+        basename = f"part-{first_id:012d}"
+        set_pending(key, basename)
+        append_partitioned(df, root, basename)
+        with cursor() as cur:
+            rollups.update(cur, key, df)
+            record_scored(cur, key, df['id'])
+            set_watermark(cur, key, last_id, df['post_date'].max(), len(df))
+
+        watermark = max(watermark, last_id)
+        totals['posts'] += len(df)
+        totals['inferred'] += stats['inferred']
+        totals['to_id'] = watermark
+        on_chunk(f"Scored posts {first_id}..{last_id}: {len(df)} posts, {stats['inferred']} inferred, "
+                 f"{stats['texts_per_sec']:.1f} texts/sec")
+
+    prune_scored(key, watermark - SCORING_LOOKBACK)
+    totals['seconds'] = time.perf_counter() - start
+    totals['posts_per_sec'] = totals['posts'] / totals['seconds'] if totals['seconds'] else 0.0
+    return totals
@@ -0,0 +1,272 @@
+import os
+import time
+import concurrent.futures
+import numpy as np
+
+MODEL_ID = os.getenv("SENTIMENT_MODEL", "StephanAkkerman/FinTwitBERT-sentiment")
+SENTIMENT_RUNTIME = os.getenv("SENTIMENT_RUNTIME", "torch")  # torch | onnx
+SENTIMENT_ONNX_DIR = os.getenv("SENTIMENT_ONNX_DIR", "models/fintwitbert-onnx")
+SENTIMENT_MAX_LENGTH = int(os.getenv("SENTIMENT_MAX_LENGTH", 512))
+SENTIMENT_TOKEN_BUDGET = int(os.getenv("SENTIMENT_TOKEN_BUDGET", 8192))  # padded tokens per batch
+SENTIMENT_MAX_BATCH = int(os.getenv("SENTIMENT_MAX_BATCH", 256))
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", 1))
+SENTIMENT_THREADS = int(os.getenv("SENTIMENT_THREADS", 0))  # per worker, 0 = cores / workers
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_FILE = "model.int8.onnx"
+
+
+def threads_per_worker(workers=SENTIMENT_WORKERS, threads=SENTIMENT_THREADS) -> int:
+    return threads or max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def token_batches(lengths, token_budget=SENTIMENT_TOKEN_BUDGET, max_batch=SENTIMENT_MAX_BATCH):
+    """
+    Indices grouped into batches of similar length: texts are sorted by token
+    count and a batch grows while rows x longest row stays within
+    `token_budget`, so short posts are never padded to a long one.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches, batch, longest = [], [], 0
+    for index in order:
+        length = int(lengths[index])
+        if batch and (len(batch) >= max_batch or (len(batch) + 1) * max(longest, length) > token_budget):
+            batches.append(batch)
+            batch, longest = [], 0
+        batch.append(int(index))
+        longest = max(longest, length)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class SentimentModel:
+    """
+    FinTwitBERT classifier with the output of the transformers pipeline
+    (top label and its softmax score) but length-bucketed dynamic batches.
+
+    runtime='onnx' runs the graph exported by export_onnx() on onnxruntime
+    (the int8 file when `quantized`), otherwise the PyTorch model on CPU/GPU.
+    """
+
+    def __init__(self, model_id=MODEL_ID, runtime=SENTIMENT_RUNTIME, onnx_dir=SENTIMENT_ONNX_DIR,
+                 quantized=True, threads=None, max_length=SENTIMENT_MAX_LENGTH,
+                 token_budget=SENTIMENT_TOKEN_BUDGET, max_batch=SENTIMENT_MAX_BATCH):
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.model_id = model_id
+        self.runtime = runtime
+        self.max_length = max_length
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+
+        if runtime == 'onnx':
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = 1
+            path = os.path.join(onnx_dir, ONNX_QUANTIZED_FILE if quantized else ONNX_MODEL_FILE)
+            self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+            self.input_names = {i.name for i in self.session.get_inputs()}
+            self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+            config = AutoConfig.from_pretrained(onnx_dir)
+        else:
+            import torch
+            from transformers import AutoModelForSequenceClassification
+
+            if threads:
+                torch.set_num_threads(threads)
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_id).to(self.device).eval()
+            self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+            config = self.model.config
+        self.id2label = {int(k): v for k, v in config.id2label.items()}
+
+    def _logits(self, encoded):
+        if self.runtime == 'onnx':
+            feed = {k: np.asarray(v, dtype=np.int64) for k, v in encoded.items() if k in self.input_names}
+            return self.session.run(None, feed)[0]
+        import torch
+
+        with torch.inference_mode():
+            tensors = {k: torch.as_tensor(v, device=self.device) for k, v in encoded.items()}
+            return self.model(**tensors).logits.float().cpu().numpy()
+
+    def predict(self, texts) -> list:
+        """(label, score) per text, in input order."""
+        texts = [text or "" for text in texts]
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
+
+        labels = np.empty(len(texts), dtype=object)
+        scores = np.empty(len(texts), dtype=np.float64)
+        for batch in token_batches(lengths, self.token_budget, self.max_batch):
+            features = [{k: encoded[k][i] for k in encoded.keys()} for i in batch]
+            padded = self.tokenizer.pad(features, padding=True, return_tensors="np")
+            logits = self._logits(dict(padded))
+            logits = logits - logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            best = probs.argmax(axis=1)
+            labels[batch] = [self.id2label[int(i)] for i in best]
+            scores[batch] = probs[np.arange(len(batch)), best]
+        return list(zip(labels.tolist(), scores.tolist()))
+
+
+_worker_model = None
+
+
+def _init_worker(model_kwargs, threads):
+    global _worker_model
+    # Pin the math libraries before torch/onnxruntime create their thread pools
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    _worker_model = SentimentModel(threads=threads, **model_kwargs)
+
+
+def _predict_shard(texts):
+    return _worker_model.predict(texts)
+
+
+def model_key(model_id=MODEL_ID, runtime=SENTIMENT_RUNTIME, quantized=True, **_):
+    """Identity of the scores a configuration produces (int8 ONNX scores differ from torch)."""
+    if runtime == 'onnx':
+        return f"{model_id}|onnx|{'int8' if quantized else 'fp32'}"
+    return f"{model_id}|torch"
+
+
+class Scorer:
+    """
+    Model (or pool of model worker processes) kept loaded across calls, so a
+    job scoring chunk after chunk pays the load once.
+
+    With `workers` > 1 each process loads the model once with `threads`
+    intra-op threads; shards are dealt round-robin over the length-sorted
+    texts, so every worker gets the same mix of long and short. Identical
+    texts are scored once, and with a PredictionCache only the texts it does
+    not know yet reach the model.
+    """
+
+    def __init__(self, workers=SENTIMENT_WORKERS, threads=None, cache=None, **model_kwargs):
+        self.workers = max(1, workers)
+        self.threads = threads or threads_per_worker(self.workers)
+        self.cache = cache
+        self.model_kwargs = model_kwargs
+        self.key = model_key(**model_kwargs)
+        self._model = None
+        self._executor = None
+
+    def _predict_texts(self, texts):
+        if self.workers == 1 or len(texts) < self.workers:
+            if self._model is None:
+                self._model = SentimentModel(threads=self.threads, **self.model_kwargs)
+            return self._model.predict(texts)
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.model_kwargs, self.threads)
+            )
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        shards = [order[w::self.workers] for w in range(self.workers)]
+        results = [None] * len(texts)
+        futures = {self._executor.submit(_predict_shard, [texts[i] for i in shard]): shard for shard in shards}
+        for future in concurrent.futures.as_completed(futures):
+            for index, result in zip(futures[future], future.result()):
+                results[index] = result
+        return results
+
+    def predict(self, texts):
+        """Returns ((label, score) per text, stats dict with texts/sec and the cache hit rate)."""
+        texts = [text or "" for text in texts]
+        start = time.perf_counter()
+
+        unique = list(dict.fromkeys(texts))
+        known = {}
+        if self.cache is not None:
+            from sentiment.cache import cache_key
+
+            keys = {text: cache_key(self.key, text) for text in unique}
+            cached = self.cache.get_many(keys.values())
+            known = {text: cached[k] for text, k in keys.items() if k in cached}
+        misses = [text for text in unique if text not in known]
+
+        scored = self._predict_texts(misses) if misses else []
+        known.update(zip(misses, scored))
+        if self.cache is not None and misses:
+            self.cache.put_many((keys[text], label, score) for text, (label, score) in zip(misses, scored))
+        results = [known[text] for text in texts]
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'texts': len(texts),
+            'unique': len(unique),
+            'inferred': len(misses),
+            'cache_hit_rate': (len(unique) - len(misses)) / len(unique) if self.cache is not None and unique else 0.0,
+            'seconds': elapsed,
+            'texts_per_sec': len(texts) / elapsed if elapsed else 0.0,
+            'workers': self.workers,
+            'threads_per_worker': self.threads,
+        }
+        return results, stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._model = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def predict(texts, workers=SENTIMENT_WORKERS, threads=None, cache=None, **model_kwargs):
+    """One-shot scoring of `texts`; see Scorer."""
+    with Scorer(workers, threads, cache, **model_kwargs) as scorer:
+        return scorer.predict(texts)
+
+
+def score_dataframe(df, text_column='cleaned_text', **kwargs):
+    """Add the notebook's sentiment_label/confidence columns to `df`; returns (df, stats)."""
+    results, stats = predict(df[text_column].tolist(), **kwargs)
+    df['sentiment_label'] = [label for label, _ in results]
+    df['confidence'] = [score for _, score in results]
+    return df, stats
+
+
+def export_onnx(model_id=MODEL_ID, out_dir=SENTIMENT_ONNX_DIR, quantize=True):
+    """
+    Export the classifier to ONNX (dynamic batch and sequence axes) next to
+    its tokenizer and config, plus a dynamically int8-quantized copy for CPU.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+    sample = tokenizer(["$AAPL to the moon"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes["logits"] = {0: "batch"}
+    model_path = os.path.join(out_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), model_path,
+            input_names=names, output_names=["logits"], dynamic_axes=axes, opset_version=17,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(model_path, os.path.join(out_dir, ONNX_QUANTIZED_FILE), weight_type=QuantType.QInt8)
+    return model_path
@@ -0,0 +1,168 @@
+"""
+Streaming scoring pipeline: reader -> cleaning -> inference -> writer.
+
+Each stage runs in its own thread and hands chunks to the next one through
+a bounded queue, so a slow stage blocks the ones before it instead of
+letting chunks pile up: at most PIPELINE_QUEUE_DEPTH chunks wait between
+two stages and peak memory depends on the chunk size, not on the dataset.
+Cleaning (Arrow kernels) and inference (torch/onnxruntime) release the GIL,
+so they overlap with reading and writing.
+"""
+import os
+import time
+import queue
+import resource
+import threading
+import pandas as pd
+from sentiment.text import clean_series
+from sentiment.storage import append_partitioned, open_dataset
+
+PIPELINE_CHUNK_ROWS = int(os.getenv("PIPELINE_CHUNK_ROWS", 20_000))
+PIPELINE_QUEUE_DEPTH = int(os.getenv("PIPELINE_QUEUE_DEPTH", 2))
+
+_DONE = object()
+
+
+def read_csv_chunks(path, chunk_rows=PIPELINE_CHUNK_ROWS, columns=None):
+    yield from pd.read_csv(path, chunksize=chunk_rows, usecols=columns, low_memory=False)
+
+
+def read_parquet_chunks(root, chunk_rows=PIPELINE_CHUNK_ROWS, columns=None, filter=None, exclude=None):
+    for batch in open_dataset(root, exclude=exclude).to_batches(columns=columns, filter=filter, batch_size=chunk_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def csv_writer(path):
+    """Appends chunks to one CSV, writing the header with the first chunk."""
+    state = {'header': True}
+
+    def write(df, number):
+        df.to_csv(path, mode='w' if state['header'] else 'a', header=state['header'], index=False)
+        state['header'] = False
+    return write
+
+
+def parquet_writer(root, dataset='sentiment'):
+    def write(df, number):
+        append_partitioned(df, root, f"part-{number:05d}", dataset)
+    return write
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+
+
+def _put(outbox, item, errors) -> bool:
+    # Blocking put is the backpressure; give up only if another stage failed
+    while not errors:
+        try:
+            outbox.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class _Stage(threading.Thread):
+    def __init__(self, name, func, inbox, outbox, errors):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.errors = errors
+        self.seconds = 0.0
+
+    def run(self):
+        try:
+            while not self.errors:
+                try:
+                    item = self.inbox.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                result = self.func(*item)
+                self.seconds += time.perf_counter() - start
+                if self.outbox is not None and not _put(self.outbox, result, self.errors):
+                    return
+        except Exception as exc:
+            self.errors.append(exc)
+        finally:
+            if self.outbox is not None:
+                _put(self.outbox, _DONE, self.errors)
+
+
+def run_pipeline(chunks, scorer, write, text_column='post_text', queue_depth=PIPELINE_QUEUE_DEPTH,
+                 on_chunk=None) -> dict:
+    """
+    Score every chunk of `chunks` (an iterator of DataFrames with `text_column`)
+    with `scorer` and hand the result, with cleaned_text/sentiment_label/confidence
+    added, to write(df, chunk_number). Returns throughput, per-stage busy time
+    and peak RSS.
+    """
+    errors = []
+    totals = {'rows': 0, 'chunks': 0, 'inferred': 0}
+
+    def clean(number, df):
+        df['cleaned_text'] = clean_series(df[text_column])
+        return number, df
+
+    def infer(number, df):
+        results, stats = scorer.predict(df['cleaned_text'].tolist())
+        df['sentiment_label'] = [label for label, _ in results]
+        df['confidence'] = [score for _, score in results]
+        totals['inferred'] += stats['inferred']
+        return number, df
+
+    def store(number, df):
+        write(df, number)
+        totals['rows'] += len(df)
+        totals['chunks'] += 1
+        if on_chunk is not None:
+            on_chunk(number, len(df))
+
+    to_clean, to_infer, to_write = (queue.Queue(maxsize=queue_depth) for _ in range(3))
+    stages = [
+        _Stage("clean", clean, to_clean, to_infer, errors),
+        _Stage("infer", infer, to_infer, to_write, errors),
+        _Stage("write", store, to_write, None, errors),
+    ]
+    start = time.perf_counter()
+    for stage in stages:
+        stage.start()
+
+    # The reader is the calling thread
+    reading = 0.0
+    iterator = iter(chunks)
+    number = 0
+    try:
+        while not errors:
+            t = time.perf_counter()
+            try:
+                df = next(iterator)
+            except StopIteration:
+                break
+            reading += time.perf_counter() - t
+            if not _put(to_clean, (number, df), errors):
+                break
+            number += 1
+    except Exception as exc:
+        # A failing reader stops the stages like a failing stage does
+        errors.append(exc)
+    finally:
+        _put(to_clean, _DONE, errors)
+        for stage in stages:
+            stage.join()
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - start
+    return dict(
+        totals,
+        seconds=elapsed,
+        rows_per_sec=totals['rows'] / elapsed if elapsed else 0.0,
+        busy={'read': reading, **{stage.name: stage.seconds for stage in stages}},
+        peak_rss_mb=peak_rss_mb(),
+    )
@@ -0,0 +1,176 @@
+"""
+Precomputed sentiment index: hourly and daily aggregates per symbol and
+for all symbols together (symbol '*').
+
+Every bucket stores additive sums (posts per label, sentiment sum,
+confidence sum, confidence-weighted sentiment sum), so a chunk of newly
+scored posts is folded in with one upsert, and any ratio (mean sentiment,
+weighted sentiment, label shares) is derived at query time without touching
+the raw posts.
+"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from config.database import DB_PAGE_SIZE, cursor, execute_query
+from sentiment.storage import dataset_root
+from sentiment.pipeline import read_parquet_chunks
+
+GRANULARITIES = {'hour': 'h', 'day': 'D'}
+ALL_SYMBOLS = '*'
+
+# The notebook's index (BEARISH -1 / NEUTRAL 0 / BULLISH 1), plus the 3-class names other models use
+SENTIMENT_VALUES = {
+    'bearish': -1, 'negative': -1,
+    'neutral': 0,
+    'bullish': 1, 'positive': 1,
+}
+
+ROLLUP_COLUMNS = ['posts', 'bullish', 'bearish', 'neutral', 'sentiment_sum', 'confidence_sum', 'weighted_sum']
+
+UPSERT_ROLLUPS_SQL = (
+    "INSERT INTO sentiment_rollups AS r "
+    "(model_key, granularity, bucket, symbol, posts, bullish, bearish, neutral, "
+    " sentiment_sum, confidence_sum, weighted_sum) "
+    "VALUES %s "
+    "ON CONFLICT (model_key, granularity, bucket, symbol) DO UPDATE SET "
+    "posts = r.posts + EXCLUDED.posts, "
+    "bullish = r.bullish + EXCLUDED.bullish, "
+    "bearish = r.bearish + EXCLUDED.bearish, "
+    "neutral = r.neutral + EXCLUDED.neutral, "
+    "sentiment_sum = r.sentiment_sum + EXCLUDED.sentiment_sum, "
+    "confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum, "
+    "weighted_sum = r.weighted_sum + EXCLUDED.weighted_sum, "
+    "updated_at = now()"
+)
+
+QUERY_ROLLUPS_SQL = (
+    "SELECT bucket, symbol, posts, bullish, bearish, neutral, sentiment_sum, confidence_sum, weighted_sum "
+    "FROM sentiment_rollups "
+    "WHERE model_key = %s AND granularity = %s AND symbol = ANY(%s) "
+    "AND bucket >= %s AND bucket < %s "
+    "ORDER BY symbol, bucket"
+)
+
+# Readers go on; incremental runs block on their upsert until the rebuild commits
+LOCK_ROLLUPS_SQL = "LOCK TABLE sentiment_rollups IN SHARE ROW EXCLUSIVE MODE"
+
+# Holds back set_pending of the next chunk; returns the one written but not committed yet
+LOCK_WATERMARK_SQL = "SELECT pending_part FROM sentiment_watermarks WHERE model_key = %s FOR UPDATE"
+
+DELETE_ROLLUPS_SQL = "DELETE FROM sentiment_rollups WHERE model_key = %s"
+
+
+def aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bucket sums of scored posts (post_date, symbol, sentiment_label,
+    confidence) for every granularity, per symbol and across symbols.
+    """
+    label = df['sentiment_label'].astype(str).str.lower()
+    sentiment = label.map(SENTIMENT_VALUES).astype(float)
+    confidence = df['confidence'].astype(float)
+    base = pd.DataFrame({
+        'symbol': df['symbol'].astype(str),
+        'posts': 1,
+        'bullish': (sentiment == 1).astype(int),
+        'bearish': (sentiment == -1).astype(int),
+        'neutral': (sentiment == 0).astype(int),
+        'sentiment_sum': sentiment.fillna(0),
+        'confidence_sum': confidence.where(sentiment.notna(), 0),
+        'weighted_sum': (sentiment * confidence).fillna(0),
+    })
+    dates = pd.to_datetime(df['post_date'])
+
+    frames = []
+    for granularity, freq in GRANULARITIES.items():
+        base['bucket'] = dates.dt.floor(freq)
+        per_symbol = base.groupby(['bucket', 'symbol'], sort=False)[ROLLUP_COLUMNS].sum().reset_index()
+        overall = base.groupby('bucket', sort=False)[ROLLUP_COLUMNS].sum().reset_index()
+        overall['symbol'] = ALL_SYMBOLS
+        frame = pd.concat([per_symbol, overall], ignore_index=True)
+        frame['granularity'] = granularity
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _rows(model_key, rollup):
+    return [
+        (model_key, r.granularity, r.bucket.to_pydatetime(), r.symbol, int(r.posts), int(r.bullish),
+         int(r.bearish), int(r.neutral), float(r.sentiment_sum), float(r.confidence_sum), float(r.weighted_sum))
+        for r in rollup.itertuples(index=False)
+    ]
+
+
+def update(cur, model_key: str, df: pd.DataFrame) -> int:
+    """
+    Fold a chunk of scored posts into the rollups with cursor `cur`; callers
+    run it in the transaction that records the chunk as scored, so a retried
+    chunk is never counted twice.
+    """
+    if df.empty:
+        return 0
+    rows = _rows(model_key, aggregate(df))
+    execute_values(cur, UPSERT_ROLLUPS_SQL, rows, page_size=DB_PAGE_SIZE)
+    return len(rows)
+
+
+def rebuild(model_key: str, root=None, chunk_rows=200_000) -> int:
+    """
+    Recompute the rollups of one model from its scored dataset (first run or
+    after a schema change).
+
+    The DELETE and the re-aggregation run in one transaction that locks
+    sentiment_rollups against writes and the model's watermark row, so a
+    failed rebuild leaves the old rollups in place and a concurrent
+    incremental run waits for it instead of being wiped or counted twice.
+    The chunk such a run has written but not committed yet is skipped; its
+    own transaction folds it in once the rebuild commits.
+    """
+    root = root or dataset_root('sentiment', model_key)
+    columns = ['post_date', 'symbol', 'sentiment_label', 'confidence']
+    posts = 0
+    with cursor() as cur:
+        cur.execute(LOCK_ROLLUPS_SQL)
+        cur.execute(LOCK_WATERMARK_SQL, (model_key,))
+        row = cur.fetchone()
+        pending = row['pending_part'] if row else None
+        cur.execute(DELETE_ROLLUPS_SQL, (model_key,))
+        for df in read_parquet_chunks(root, chunk_rows, columns=columns, exclude=pending):
+            update(cur, model_key, df)
+            posts += len(df)
+    return posts
+
+
+def query(model_key: str, symbols=None, start=None, end=None, granularity='day') -> pd.DataFrame:
+    """
+    Sentiment index from the rollup table.
+
+    symbols: list of symbols, None for the all-symbols index; start/end:
+    half-open range of bucket starts; granularity: 'hour' or 'day'. Columns:
+    volume, counts per label, label shares, mean sentiment, mean confidence
+    and confidence-weighted sentiment, indexed by (symbol, bucket).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {sorted(GRANULARITIES)}")
+    symbols = list(symbols) if symbols else [ALL_SYMBOLS]
+    start = pd.Timestamp(start).to_pydatetime() if start is not None else datetime.min
+    end = pd.Timestamp(end).to_pydatetime() if end is not None else datetime.max
+
+    rows = execute_query(QUERY_ROLLUPS_SQL, (model_key, granularity, symbols, start, end)) or []
+    df = pd.DataFrame(rows, columns=['bucket', 'symbol'] + ROLLUP_COLUMNS)
+    labelled = df['bullish'] + df['bearish'] + df['neutral']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = pd.DataFrame({
+            'bucket': pd.to_datetime(df['bucket']),
+            'symbol': df['symbol'],
+            'volume': df['posts'],
+            'bullish': df['bullish'],
+            'bearish': df['bearish'],
+            'neutral': df['neutral'],
+            'bullish_share': df['bullish'] / labelled,
+            'bearish_share': df['bearish'] / labelled,
+            'sentiment': df['sentiment_sum'] / labelled,
+            'confidence': df['confidence_sum'] / labelled,
+            'weighted_sentiment': df['weighted_sum'] / df['confidence_sum'],
+        })
+    return result.set_index(['symbol', 'bucket'])
@@ -0,0 +1,172 @@
+"""
+Columnar storage for the analysis datasets.
+
+Each dataset is a directory of Parquet files partitioned hive-style by
+symbol and month (symbol=AAPL/month=2024-12/part-*.parquet), with
+categorical symbol/label/author columns and typed timestamps. load_dataset()
+prunes partitions from the symbol list and date range, pushes the date
+filter down to the row groups and reads only the requested columns through
+memory-mapped files.
+"""
+import os
+import re
+import pandas as pd
+
+SENTIMENT_DATA_DIR = os.getenv("SENTIMENT_DATA_DIR", "../data/sentiment")
+PARQUET_DATA_DIR = os.getenv("PARQUET_DATA_DIR", "../data/parquet")
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 500_000))
+PARTITION_COLS = ['symbol', 'month']
+
+# time: timestamp column (month partitions come from it); symbol: column that becomes the symbol partition
+DATASETS = {
+    'sentiment': {
+        'time': 'post_date',
+        'symbol': 'symbol',
+        'categories': ['sentiment_label', 'post_author'],
+    },
+    'market': {
+        'time': os.getenv("MARKET_DATE_COLUMN", "Date"),
+        'symbol': os.getenv("MARKET_SYMBOL_COLUMN", "symbol"),
+        'categories': [],
+    },
+    'authors': {
+        'time': None,
+        'symbol': None,
+        'categories': ['author'],
+    },
+}
+
+
+def model_dir(key: str) -> str:
+    """Filesystem-safe partition value of a model configuration (sentiment dataset: model=<dir>/...)."""
+    return re.sub(r"[^\w.-]+", "_", key)
+
+
+def dataset_root(dataset: str, model_key=None) -> str:
+    if dataset == 'sentiment':
+        return os.path.join(SENTIMENT_DATA_DIR, f"model={model_dir(model_key)}") if model_key else SENTIMENT_DATA_DIR
+    return os.path.join(PARQUET_DATA_DIR, dataset)
+
+
+def prepare(df: pd.DataFrame, dataset='sentiment') -> pd.DataFrame:
+    """Typed copy of `df`: timestamps parsed, low-cardinality strings as categoricals, partition columns added."""
+    spec = DATASETS[dataset]
+    df = df.copy()
+    for column in spec['categories']:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    if spec['time']:
+        df[spec['time']] = pd.to_datetime(df[spec['time']], errors='coerce').astype('datetime64[us]')
+        df['month'] = df[spec['time']].dt.strftime('%Y-%m').fillna('unknown')
+    if spec['symbol'] and spec['symbol'] != 'symbol':
+        df = df.rename(columns={spec['symbol']: 'symbol'})
+    return df
+
+
+def _write(table_df, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(table_df, preserve_index=False)
+    pq.write_table(table, path, compression="zstd", row_group_size=128_000)
+
+
+def append_partitioned(df: pd.DataFrame, root: str, basename: str, dataset='sentiment'):
+    """
+    Write `df` under root/symbol=<S>/month=<YYYY-MM>/<basename>.parquet.
+
+    Existing files are never rewritten; re-running with the same `basename`
+    replaces only the files of that run, so a retried chunk does not duplicate rows.
+    """
+    if df.empty:
+        return 0
+    df = prepare(df, dataset)
+    partition_cols = [column for column in PARTITION_COLS if column in df.columns]
+    if not partition_cols:
+        os.makedirs(root, exist_ok=True)
+        _write(df, os.path.join(root, f"{basename}.parquet"))
+        return len(df)
+
+    for values, part in df.groupby(partition_cols, sort=False, observed=True):
+        values = values if isinstance(values, tuple) else (values,)
+        path = os.path.join(root, *(f"{col}={val}" for col, val in zip(partition_cols, values)))
+        os.makedirs(path, exist_ok=True)
+        part = part.drop(columns=partition_cols)
+        for column in part.select_dtypes('category').columns:
+            part[column] = part[column].cat.remove_unused_categories()
+        _write(part, os.path.join(path, f"{basename}.parquet"))
+    return len(df)
+
+
+def export_csv(csv_path: str, dataset: str, root=None, model_key=None, chunk_rows=EXPORT_CHUNK_ROWS) -> int:
+    """
+    Convert one of the CSV exports to a partitioned dataset, chunk by chunk
+    (never the whole file in memory). Sentiment rows go under the partition
+    of `model_key`, the model that scored them.
+    """
+    root = root or dataset_root(dataset, model_key)
+    rows = 0
+    for number, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunk_rows, low_memory=False)):
+        rows += append_partitioned(chunk, root, f"part-{number:05d}", dataset)
+    return rows
+
+
+def _filter(dataset, symbols, start, end, model_key=None):
+    import pyarrow.dataset as ds
+
+    spec = DATASETS[dataset]
+    expression = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if model_key is not None:
+        expression = both(expression, ds.field('model') == model_dir(model_key))
+    if symbols is not None and spec['symbol']:
+        expression = both(expression, ds.field('symbol').isin(list(symbols)))
+    if spec['time']:
+        # Month partitions prune whole directories; the timestamp filter uses row group statistics
+        if start is not None:
+            start = pd.Timestamp(start)
+            expression = both(expression, ds.field('month') >= start.strftime('%Y-%m'))
+            expression = both(expression, ds.field(spec['time']) >= start.to_pydatetime())
+        if end is not None:
+            end = pd.Timestamp(end)
+            expression = both(expression, ds.field('month') <= end.strftime('%Y-%m'))
+            expression = both(expression, ds.field(spec['time']) < end.to_pydatetime())
+    return expression
+
+
+def open_dataset(root: str, memory_map=True, exclude=None):
+    """Partitioned dataset under `root`; the files named `exclude` (basename without .parquet) are left out."""
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    data = ds.dataset(
+        os.path.abspath(root), format="parquet", partitioning="hive",
+        filesystem=fs.LocalFileSystem(use_mmap=memory_map),
+    )
+    if exclude:
+        fragments = [f for f in data.get_fragments() if os.path.basename(f.path) != f"{exclude}.parquet"]
+        data = ds.FileSystemDataset(fragments, data.schema, data.format, data.filesystem)
+    return data
+
+
+def load_dataset(dataset='sentiment', columns=None, symbols=None, start=None, end=None,
+                 model_key=None, root=None, memory_map=True) -> pd.DataFrame:
+    """
+    Load a partitioned dataset into pandas.
+
+    columns: only these columns are read (None = all); symbols: list of
+    symbols to keep; start/end: half-open [start, end) range on the
+    dataset's timestamp column; model_key: scores of one model only
+    (sentiment). Partition columns come back as categoricals.
+    """
+    root = root or dataset_root(dataset)
+    data = open_dataset(root, memory_map)
+    table = data.to_table(columns=columns, filter=_filter(dataset, symbols, start, end, model_key))
+    df = table.to_pandas()
+    for column in ['model'] + PARTITION_COLS:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    return df
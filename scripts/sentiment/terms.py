@@ -0,0 +1,221 @@
+"""
+Term statistics for the word clouds, built in streaming chunks.
+
+Each chunk of scored posts (cleaned_text, sentiment_label, symbol,
+post_date) is tokenized once, the way WordCloud tokenizes, against the
+symbol-aware stopword set of the notebook. The result is sparse term counts
+per (label, symbol, day). Terms are dense integer ids and counts are a Series
+over that key, so chunks and saved runs merge by addition. The word clouds
+(WordCloud.generate_from_frequencies), top-k queries and bullish-vs-bearish
+log-odds read those counts directly instead of joining the corpus into one
+string and re-tokenizing it.
+"""
+import os
+import numpy as np
+import pandas as pd
+from sentiment.storage import PARQUET_DATA_DIR
+
+TERM_COUNTS_PATH = os.getenv("TERM_COUNTS_PATH", os.path.join(PARQUET_DATA_DIR, "term_counts.parquet"))
+TERM_COMPACT_EVERY = int(os.getenv("TERM_COMPACT_EVERY", 20))  # chunks buffered before merging
+
+# WordCloud's default regexp: words of two or more characters
+TOKEN_PATTERN = r"\w[\w']+"
+KEY = ['label', 'symbol', 'day', 'term_id']
+
+# The notebook's additions to wordcloud.STOPWORDS
+EXTRA_STOPWORDS = [
+    "stock", "market", "going", "bullish", "bearish", "xrpx", "btcx", "dogex",
+    "ethx", "now", "will", "today", "need", "see", "make", "look",
+    "still", "time", "year", "new", "oneday", "well", "think", "row", "company",
+    "markets", "money", "buy", "good", "dip", "sell", "sold", "dump", "shit",
+    "bear", "bull", "lol", "4chanx", "solx", "one", "u",
+]
+
+
+def build_stopwords(symbols, extra=EXTRA_STOPWORDS) -> set:
+    """
+    The notebook's my_stopwords: wordcloud.STOPWORDS, every symbol lowercased
+    (for BTC-USD also "btc" and "btcx", the cleaned form of $BTC.X) and `extra`.
+    """
+    from wordcloud import STOPWORDS
+
+    words = [str(s).lower() for s in symbols]
+    for s in list(words):
+        if s.endswith('-usd'):
+            words += [s[:-4], s[:-4] + 'x']
+    return {word.lower() for word in set(STOPWORDS) | set(words) | set(extra)}
+
+
+def tokenize(texts: pd.Series, stopwords=frozenset()) -> pd.Series:
+    """
+    Lowercased tokens of `texts` as one long Series indexed by the row they
+    came from; "'s" is stripped, digits and stopwords are dropped (as in
+    WordCloud.process_text).
+    """
+    tokens = texts.fillna("").astype(str).str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    tokens = tokens.str.replace(r"'s$", "", regex=True)
+    keep = (tokens.str.len() > 1) & ~tokens.str.isdigit() & ~tokens.isin(stopwords)
+    return tokens[keep]
+
+
+class TermCounts:
+    """
+    Sparse term counts per (label, symbol, day).
+
+        counts = TermCounts(build_stopwords(symbols))
+        for chunk in read_parquet_chunks(root, columns=TermCounts.COLUMNS):
+            counts.add(chunk)
+        counts.top_terms(20, label='BULLISH')
+    """
+
+    COLUMNS = ['cleaned_text', 'sentiment_label', 'symbol', 'post_date']
+
+    def __init__(self, stopwords=frozenset(), terms=None, counts=None):
+        self.stopwords = frozenset(stopwords)
+        self.terms = list(terms or [])
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.counts = counts if counts is not None else self._empty()
+        self._pending = []
+
+    @staticmethod
+    def _empty():
+        index = pd.MultiIndex.from_arrays([[], [], pd.DatetimeIndex([]), np.array([], dtype=np.int64)], names=KEY)
+        return pd.Series([], index=index, dtype=np.int64, name='count')
+
+    def _ids(self, tokens: pd.Series) -> np.ndarray:
+        # Only the distinct tokens of the chunk touch the vocabulary dict
+        codes, uniques = pd.factorize(tokens)
+        for term in uniques:
+            if term not in self.term_ids:
+                self.term_ids[term] = len(self.terms)
+                self.terms.append(term)
+        unique_ids = np.fromiter((self.term_ids[term] for term in uniques), dtype=np.int64, count=len(uniques))
+        return unique_ids[codes]
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Count the terms of a chunk of scored posts; returns the number of tokens kept."""
+        df = df.reset_index(drop=True)
+        tokens = tokenize(df['cleaned_text'], self.stopwords)
+        if tokens.empty:
+            return 0
+        rows = tokens.index
+        frame = pd.DataFrame({
+            'label': df['sentiment_label'].astype(str).loc[rows].to_numpy(),
+            'symbol': df['symbol'].astype(str).loc[rows].to_numpy(),
+            'day': pd.to_datetime(df['post_date']).dt.floor('D').loc[rows].to_numpy(),
+            'term_id': self._ids(tokens),
+        })
+        self._pending.append(frame.groupby(KEY, sort=False).size().rename('count'))
+        if len(self._pending) >= TERM_COMPACT_EVERY:
+            self.compact()
+        return len(tokens)
+
+    def compact(self):
+        """Fold the buffered chunk counts into the totals (one groupby instead of one merge per chunk)."""
+        if self._pending:
+            merged = pd.concat([self.counts, *self._pending])
+            self.counts = merged.groupby(level=KEY, sort=False).sum().astype(np.int64)
+            self._pending = []
+        return self
+
+    def merge(self, other: 'TermCounts') -> 'TermCounts':
+        """Add the counts of another run (its term ids are remapped onto this vocabulary)."""
+        other.compact()
+        if other.counts.empty:
+            return self
+        remap = self._ids(pd.Series(other.terms, dtype=object))
+        index = other.counts.index
+        term_ids = remap[index.get_level_values('term_id').to_numpy()]
+        index = pd.MultiIndex.from_arrays([index.get_level_values(name) for name in KEY[:-1]] + [term_ids], names=KEY)
+        self._pending.append(pd.Series(other.counts.to_numpy(), index=index, name='count'))
+        return self.compact()
+
+    def select(self, label=None, symbols=None, start=None, end=None) -> pd.Series:
+        """Counts of one label (None = all), list of symbols and [start, end) day range."""
+        self.compact()
+        counts = self.counts
+        mask = np.ones(len(counts), dtype=bool)
+        index = counts.index
+        if label is not None:
+            mask &= index.get_level_values('label') == label
+        if symbols is not None:
+            mask &= index.get_level_values('symbol').isin([str(s) for s in symbols])
+        if start is not None:
+            mask &= index.get_level_values('day') >= pd.Timestamp(start)
+        if end is not None:
+            mask &= index.get_level_values('day') < pd.Timestamp(end)
+        return counts[mask]
+
+    def term_totals(self, **selection) -> pd.Series:
+        """Count per term (indexed by the term string) for a selection, see select()."""
+        selected = self.select(**selection)
+        totals = np.bincount(selected.index.get_level_values('term_id').to_numpy(),
+                             weights=selected.to_numpy(), minlength=len(self.terms))
+        nonzero = np.flatnonzero(totals)
+        return pd.Series(totals[nonzero].astype(np.int64), index=np.asarray(self.terms, dtype=object)[nonzero])
+
+    def frequencies(self, normalize_plurals=True, **selection) -> dict:
+        """
+        term -> count, ready for WordCloud.generate_from_frequencies. Plurals
+        are folded into the singular when both occur, like WordCloud does.
+        """
+        totals = self.term_totals(**selection)
+        if normalize_plurals and not totals.empty:
+            words = totals.index.to_series()
+            plural = words.str.endswith('s') & ~words.str.endswith('ss') & words.str[:-1].isin(totals.index)
+            singular = words.where(~plural, words.str[:-1])
+            totals = totals.groupby(singular.to_numpy()).sum()
+        return totals.to_dict()
+
+    def top_terms(self, k=20, **selection) -> pd.Series:
+        return self.term_totals(**selection).nlargest(k)
+
+    def log_odds(self, a='BULLISH', b='BEARISH', prior=0.01, min_count=5, **selection) -> pd.DataFrame:
+        """
+        Terms that separate label `a` from label `b`: log-odds ratio with an
+        informative Dirichlet prior (Monroe et al. 2008, `prior` x overall
+        counts) and its z-score. Positive = more typical of `a`.
+        """
+        counts_a = self.term_totals(label=a, **selection)
+        counts_b = self.term_totals(label=b, **selection)
+        background = self.term_totals(**selection)
+        frame = pd.DataFrame({'count_a': counts_a, 'count_b': counts_b}).fillna(0)
+        frame = frame[(frame['count_a'] + frame['count_b']) >= min_count]
+        alpha = background.reindex(frame.index).to_numpy() * prior
+        alpha0 = background.sum() * prior
+        n_a, n_b = counts_a.sum(), counts_b.sum()
+        ya, yb = frame['count_a'].to_numpy(), frame['count_b'].to_numpy()
+        delta = (np.log((ya + alpha) / (n_a + alpha0 - ya - alpha))
+                 - np.log((yb + alpha) / (n_b + alpha0 - yb - alpha)))
+        variance = 1.0 / (ya + alpha) + 1.0 / (yb + alpha)
+        frame['log_odds'] = delta
+        frame['z'] = delta / np.sqrt(variance)
+        return frame.sort_values('z', ascending=False)
+
+    def wordcloud(self, width=800, height=400, **selection):
+        """WordCloud of a selection (see select()), as in the notebook but without the joined corpus."""
+        from wordcloud import WordCloud
+
+        return WordCloud(width=width, height=height).generate_from_frequencies(self.frequencies(**selection))
+
+    def save(self, path=TERM_COUNTS_PATH):
+        self.compact()
+        frame = self.counts.reset_index()
+        frame['term'] = pd.Categorical.from_codes(frame.pop('term_id').astype(np.int64), categories=self.terms)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        frame.to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path=TERM_COUNTS_PATH, stopwords=frozenset()) -> 'TermCounts':
+        """Saved counts, or empty ones."""
+        counts = cls(stopwords)
+        if not os.path.exists(path):
+            return counts
+        frame = pd.read_parquet(path)
+        term = frame.pop('term').astype('category')
+        counts.terms = list(term.cat.categories)
+        counts.term_ids = {t: i for i, t in enumerate(counts.terms)}
+        frame['term_id'] = term.cat.codes.astype(np.int64)
+        frame['day'] = pd.to_datetime(frame['day'])
+        counts.counts = frame.set_index(KEY)['count'].astype(np.int64)
+        return counts
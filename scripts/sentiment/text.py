@@ -0,0 +1,36 @@
+import re
+import pandas as pd
+
+MENTION_URL_RE = re.compile(r'@\w+|https?://\S+')
+PUNCTUATION_RE = re.compile(r'[^\w\s$#]')
+
+# Same patterns for Arrow's RE2 engine, whose \w and \s are ASCII-only:
+# spelled out with Unicode classes so accented words survive as they do with `re`
+ARROW_MENTION_URL = r'@[\p{L}\p{N}_]+|https?://[^\s\p{Z}\x{85}]+'
+ARROW_PUNCTUATION = r'[^\p{L}\p{N}_\s\x{0b}\p{Z}\x{1c}-\x{1f}\x{85}$#]'
+
+
+def clean_text_for_finbert(text):
+    """Same cleaning as notebooks/sentiment_analysis.ipynb: drop mentions, URLs and punctuation but $ and #."""
+    if isinstance(text, str):
+        text = MENTION_URL_RE.sub('', text)
+        text = PUNCTUATION_RE.sub('', text)
+
+        return text.lower().strip()
+    return ""
+
+
+def clean_series(texts: pd.Series) -> pd.Series:
+    """
+    clean_text_for_finbert over a whole column with Arrow string kernels
+    (no Python call per row; the kernels release the GIL). Non-strings become "".
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    is_text = texts.map(type).eq(str).to_numpy()
+    array = pa.array(texts.where(is_text, ""), type=pa.large_string(), from_pandas=True)
+    array = pc.replace_substring_regex(array, ARROW_MENTION_URL, "")
+    array = pc.replace_substring_regex(array, ARROW_PUNCTUATION, "")
+    array = pc.utf8_trim_whitespace(pc.utf8_lower(array))
+    return pd.Series(array.to_numpy(zero_copy_only=False), index=texts.index, dtype=object)
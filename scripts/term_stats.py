@@ -0,0 +1,72 @@
+import os
+import sys
+sys.path.insert(0, '../')
+import time
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from sentiment.terms import TERM_COUNTS_PATH, TermCounts, build_stopwords
+from sentiment.storage import dataset_root, load_dataset
+from sentiment.pipeline import PIPELINE_CHUNK_ROWS, read_csv_chunks, read_parquet_chunks
+from sentiment.inference import model_key
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count terms per sentiment label, symbol and day for word clouds and log-odds.")
+    parser.add_argument("--csv", help="scored CSV (default: the Parquet dataset of --model-key)")
+    parser.add_argument("--model-key", default=model_key())
+    parser.add_argument("--counts", default=TERM_COUNTS_PATH, help="where the counts are saved")
+    parser.add_argument("--append", action="store_true",
+                        help="add the posts of --csv (new posts only) to the saved counts instead of replacing them")
+    parser.add_argument("--chunk-rows", type=int, default=PIPELINE_CHUNK_ROWS)
+    parser.add_argument("--labels", nargs=2, default=["BULLISH", "BEARISH"], help="labels compared by log-odds")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--wordclouds", help="directory for one word cloud PNG per label")
+    args = parser.parse_args()
+    if args.append and not args.csv:
+        # The Parquet dataset holds every scored post, so appending it would count the saved ones again
+        parser.error("--append needs --csv with posts not counted yet")
+
+    # The stopword set needs every symbol up front; only the symbol column is read for it
+    if args.csv:
+        symbols = pd.read_csv(args.csv, usecols=['symbol'])['symbol'].dropna().unique()
+        chunks = read_csv_chunks(args.csv, args.chunk_rows, columns=TermCounts.COLUMNS)
+    else:
+        symbols = load_dataset('sentiment', columns=['symbol'], model_key=args.model_key)['symbol'].unique()
+        chunks = read_parquet_chunks(dataset_root('sentiment', args.model_key), args.chunk_rows, columns=TermCounts.COLUMNS)
+    stopwords = build_stopwords(symbols)
+
+    start = time.perf_counter()
+    counts = TermCounts(stopwords)
+    posts = tokens = 0
+    for chunk in chunks:
+        tokens += counts.add(chunk)
+        posts += len(chunk)
+    counts.compact()
+    print(f"Counted {tokens} tokens of {posts} posts ({len(counts.terms)} terms) in {time.perf_counter() - start:.1f}s")
+
+    if args.append:
+        counts = TermCounts.load(args.counts, stopwords).merge(counts)
+    counts.save(args.counts)
+    print(f"Term counts -> {args.counts}")
+
+    a, b = args.labels
+    for label in (a, b):
+        top = counts.top_terms(args.top, label=label)
+        print(f"{label}: " + ", ".join(f"{term} ({n})" for term, n in top.items()))
+    odds = counts.log_odds(a, b)
+    print(f"Most {a} vs {b}: " + ", ".join(odds.index[:args.top]))
+    print(f"Most {b} vs {a}: " + ", ".join(odds.index[::-1][:args.top]))
+
+    if args.wordclouds:
+        os.makedirs(args.wordclouds, exist_ok=True)
+        for label in (a, b):
+            path = os.path.join(args.wordclouds, f"{label.lower()}.png")
+            counts.wordcloud(label=label).to_file(path)
+            print(f"Word cloud -> {path}")
+
+
+if __name__ == "__main__":
+    main()
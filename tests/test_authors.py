@@ -0,0 +1,73 @@
+from datetime import datetime
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from sentiment.authors import AuthorIndex, weighted_index  # noqa: E402
+
+
+def author_index():
+    index = AuthorIndex()
+    index.update(pd.DataFrame({'author': ['big', 'small'], 'total_followers': [1000, 0]}))
+    return index
+
+
+def posts(labels, authors=('big', 'small', 'nobody')):
+    return pd.DataFrame({
+        'post_date': [datetime(2024, 1, 1, 10)] * len(labels),
+        'symbol': ['AAPL'] * len(labels),
+        'post_author': list(authors)[:len(labels)],
+        'sentiment_label': labels,
+    })
+
+
+def test_encode_gathers_ids_and_marks_unknown_and_null_authors():
+    index = author_index()
+    authors = pd.Series(['small', None, 'big', 'nobody', 'small'])
+    assert index.encode(authors).tolist() == [1, -1, 0, -1, 1]
+    assert index.encode(authors.astype('category')).tolist() == [1, -1, 0, -1, 1]
+
+
+def test_encode_all_null_authors():
+    assert author_index().encode(pd.Series([None, None], dtype=object)).tolist() == [-1, -1]
+
+
+def test_weighted_index_weighs_authors_by_followers():
+    result = weighted_index(author_index(), posts(['Bullish', 'Bearish', 'Bearish']), weight='followers')
+    row = result.iloc[0]
+    assert row['volume'] == 3
+    assert row['sentiment'] == pytest.approx(-1 / 3)
+    big = 1 + np.log1p(1000)
+    assert row['followers_weighted_sentiment'] == pytest.approx((big - 1 - 1) / (big + 1 + 1))
+
+
+def test_weighted_index_skips_unlabelled_posts():
+    row = weighted_index(author_index(), posts(['Bullish', None, 'unknown'])).iloc[0]
+    assert row['volume'] == 3
+    assert row['sentiment'] == 1
+    assert row['followers_weighted_sentiment'] == 1
+
+
+def test_weighted_index_with_all_null_labels():
+    result = weighted_index(author_index(), posts([None, None]), by_symbol=False)
+    assert result['volume'].tolist() == [2]
+    assert np.isnan(result['sentiment'].iloc[0])
+    assert np.isnan(result['followers_weighted_sentiment'].iloc[0])
+
+
+def test_save_load_round_trip(tmp_path):
+    index = author_index()
+    index.watermark = pd.Timestamp('2024-01-02 03:04:05')
+    path = str(tmp_path / "author_index.parquet")
+    index.save(path)
+    loaded = AuthorIndex.load(path)
+    assert loaded.names == ['big', 'small'] and loaded.watermark == index.watermark
+    np.testing.assert_allclose(loaded.weights['followers'], index.weights['followers'])
+    # Loaded attribute arrays are writable copies
+    loaded.update(pd.DataFrame({'author': ['small', 'new'], 'total_followers': [5, 7]}))
+    assert loaded.encode(pd.Series(['new'])).tolist() == [2]
+    assert AuthorIndex.load(str(tmp_path / "missing.parquet")).names == []
@@ -0,0 +1,60 @@
+import itertools
+from unittest import mock
+import pytest
+
+from sentiment import cache
+
+
+@pytest.fixture
+def clock():
+    # time.time() can repeat within a test; used_at must order every write and read
+    ticks = itertools.count(1)
+    with mock.patch.object(cache.time, 'time', lambda: float(next(ticks))):
+        yield
+
+
+def open_cache(tmp_path, max_rows):
+    return cache.PredictionCache(str(tmp_path / "cache" / "sentiment.sqlite"), max_rows=max_rows)
+
+
+def keys(*texts):
+    return [cache.cache_key("model|torch", text) for text in texts]
+
+
+def test_evicts_the_least_recently_used_rows(tmp_path, clock):
+    a, b, c, d = keys("a", "b", "c", "d")
+    with open_cache(tmp_path, max_rows=3) as store, \
+            mock.patch.object(cache, 'SENTIMENT_CACHE_EVICT_FRACTION', 0):
+        store.put_many([(a, "Bullish", 0.9), (b, "Bearish", 0.8), (c, "Neutral", 0.7)])
+        assert store.get_many([a]) == {a: ("Bullish", 0.9)}
+        store.put_many([(d, "Bullish", 0.6)])
+        assert set(store.get_many([a, b, c, d])) == {a, c, d}
+
+
+def test_eviction_frees_a_fraction_below_the_limit(tmp_path, clock):
+    with open_cache(tmp_path, max_rows=10) as store, \
+            mock.patch.object(cache, 'SENTIMENT_CACHE_EVICT_FRACTION', 0.2):
+        store.put_many([(key, "Neutral", 0.5) for key in keys(*"abcdefghijk")])
+        assert store._count() == 8
+        assert set(store.get_many(keys(*"defghijk"))) == set(keys(*"defghijk"))
+
+
+def test_replacing_keys_does_not_evict(tmp_path, clock):
+    a, b = keys("a", "b")
+    with open_cache(tmp_path, max_rows=2) as store:
+        for _ in range(3):
+            store.put_many([(a, "Bullish", 0.9), (b, "Bearish", 0.8)])
+        assert set(store.get_many([a, b])) == {a, b}
+
+
+def test_hit_rate_and_persistence(tmp_path, clock):
+    a, b = keys("a", "b")
+    with open_cache(tmp_path, max_rows=10) as store:
+        store.put_many([(a, "Bullish", 0.9)])
+    with open_cache(tmp_path, max_rows=10) as store:
+        assert store.get_many([a, b]) == {a: ("Bullish", 0.9)}
+        assert store.hit_rate == 0.5
+
+
+def test_cache_key_depends_on_the_model():
+    assert cache.cache_key("model|torch", "text") != cache.cache_key("model|onnx|int8", "text")
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from unittest import mock
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from config import database  # noqa: E402
+
+
+class FakeCursor:
+    """Records the statements execute_values sends; rowcount is that of the last one."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.statements = []
+        self.rowcount = -1
+        self.connection = mock.Mock(encoding='UTF8')
+        self._values = 0
+
+    def mogrify(self, template, args):
+        self._values += 1
+        return b"(" + b",".join(str(a).encode() for a in args) + b")"
+
+    def execute(self, query, vars=None):
+        if self.fail:
+            raise database.psycopg2.OperationalError("connection lost")
+        self.statements.append(query)
+        self.rowcount, self._values = self._values, 0
+
+    def fetchall(self):
+        return [{'id': i} for i in range(self.rowcount)]
+
+
+def patch_cursor(cur):
+    @contextmanager
+    def fake_cursor(*args, **kwargs):
+        yield cur
+    return mock.patch.object(database, 'cursor', fake_cursor)
+
+
+def test_execute_values_query_counts_rows_over_all_pages():
+    cur = FakeCursor()
+    with patch_cursor(cur):
+        result = database.execute_values_query("UPDATE t SET x = v.x FROM (VALUES %s) AS v (id, x)",
+                                               [(i, i) for i in range(5)], page_size=2)
+    assert result == 5
+    assert len(cur.statements) == 3
+
+
+def test_execute_values_query_without_rows_is_a_success():
+    assert database.execute_values_query("INSERT INTO t (id) VALUES %s", []) == 0
+    assert database.execute_values_query("INSERT INTO t (id) VALUES %s RETURNING id", []) == []
+
+
+def test_execute_values_query_returns_the_returning_rows():
+    with patch_cursor(FakeCursor()):
+        result = database.execute_values_query("INSERT INTO t (id) VALUES %s RETURNING id", [(1,), (2,)])
+    assert result == [{'id': 0}, {'id': 1}]
+
+
+def test_execute_values_query_failure_is_none():
+    with patch_cursor(FakeCursor(fail=True)):
+        assert database.execute_values_query("INSERT INTO t (id) VALUES %s", [(1,)]) is None
+
+
+class FakePool:
+    """Fails like ThreadedConnectionPool once `maxconn` connections are out."""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.maxconn = maxconn
+        self.out = 0
+
+    def getconn(self):
+        if self.out >= self.maxconn:
+            raise database.PoolError("connection pool exhausted")
+        self.out += 1
+        return mock.Mock(closed=0)
+
+    def putconn(self, conn, close=False):
+        self.out -= 1
+
+    def closeall(self):
+        pass
+
+
+def test_borrowing_waits_for_a_free_connection():
+    import threading
+
+    database.close_pool()
+    with mock.patch.object(database, 'ThreadedConnectionPool', FakePool), \
+            mock.patch.object(database, 'DB_POOL_MAX', 1):
+        first = database.get_connection()
+        timer = threading.Timer(0.2, database.release_connection, (first,))
+        timer.start()
+        second = database.get_connection()
+        timer.join()
+        assert second is not None
+        with pytest.raises(database.PoolError):
+            database._borrow(timeout=0)
+        database.release_connection(second)
+    database.close_pool()
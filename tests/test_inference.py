@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sentiment.inference import token_batches, threads_per_worker  # noqa: E402
+
+
+def padded_tokens(batch, lengths):
+    return len(batch) * max(lengths[i] for i in batch)
+
+
+def test_token_batches_group_similar_lengths_within_the_budget():
+    lengths = [5, 100, 6, 90, 7, 5]
+    batches = token_batches(lengths, token_budget=200, max_batch=10)
+    assert batches == [[0, 5, 2, 4], [3, 1]]
+    assert all(padded_tokens(batch, lengths) <= 200 for batch in batches)
+
+
+def test_token_batches_cover_every_text_once():
+    lengths = np.random.default_rng(0).integers(1, 512, size=1000)
+    batches = token_batches(lengths, token_budget=4096, max_batch=64)
+    assert sorted(i for batch in batches for i in batch) == list(range(1000))
+    assert all(len(batch) <= 64 and padded_tokens(batch, lengths) <= 4096 for batch in batches)
+
+
+def test_text_over_the_budget_gets_a_batch_of_its_own():
+    assert token_batches([600, 10, 10], token_budget=100, max_batch=10) == [[1, 2], [0]]
+
+
+def test_token_batches_respect_max_batch():
+    assert token_batches([1] * 5, token_budget=1000, max_batch=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_token_batches_without_texts():
+    assert token_batches([], token_budget=100, max_batch=10) == []
+
+
+def test_threads_per_worker_is_at_least_one():
+    assert threads_per_worker(workers=10_000, threads=0) == 1
+    assert threads_per_worker(workers=2, threads=3) == 3
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from unittest import mock
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from config import jobs  # noqa: E402
+
+
+class FakeJobs:
+    """scrape_jobs for the statements JobQueue sends, with a clock that stands in for now()."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.rows = {}
+        self.rowcount = -1
+
+    def add(self, item_key, priority=0.0, status='pending', attempts=0):
+        job_id = len(self.rows) + 1
+        self.rows[job_id] = dict(id=job_id, item_key=item_key, payload={'key': item_key}, priority=priority,
+                                 status=status, attempts=attempts, leased_until=None, last_error=None)
+        return job_id
+
+    def execute_query(self, query, params=None):
+        assert query == jobs.EXPIRE_JOBS_SQL
+        name, max_attempts = params
+        for row in self.rows.values():
+            if row['status'] == 'running' and row['leased_until'] < self.now and row['attempts'] >= max_attempts:
+                row.update(status='failed', last_error='lease expired')
+        return []
+
+    def execute_prepared(self, name, params):
+        assert name == 'claim_jobs'
+        worker, timeout, queue, max_attempts, limit = params
+        claimable = [row for row in self.rows.values() if row['attempts'] < max_attempts and (
+            row['status'] == 'pending' or (row['status'] == 'running' and row['leased_until'] < self.now))]
+        claimable.sort(key=lambda row: (-row['priority'], row['id']))
+        for row in claimable[:limit]:
+            row.update(status='running', attempts=row['attempts'] + 1, leased_until=self.now + timeout)
+        return [{k: row[k] for k in ('id', 'item_key', 'payload', 'attempts', 'priority')} for row in claimable[:limit]]
+
+    def execute(self, query, params):
+        if query == jobs.COMPLETE_JOBS_SQL:
+            (ids,) = params
+            updated = [self.rows[i] for i in ids]
+            for row in updated:
+                row.update(status='done', leased_until=None, last_error=None)
+        elif query == jobs.FAIL_JOB_SQL:
+            max_attempts, error, job_id = params
+            row = self.rows[job_id]
+            row.update(status='failed' if row['attempts'] >= max_attempts else 'pending',
+                       leased_until=None, last_error=error)
+            updated = [row]
+        elif query == jobs.EXTEND_JOBS_SQL:
+            timeout, ids = params
+            updated = [self.rows[i] for i in ids if self.rows[i]['status'] == 'running']
+            for row in updated:
+                row['leased_until'] = self.now + timeout
+        else:
+            raise AssertionError(query)
+        self.rowcount = len(updated)
+
+    def status(self, job_id):
+        return self.rows[job_id]['status']
+
+
+@pytest.fixture
+def table():
+    table = FakeJobs()
+
+    @contextmanager
+    def fake_cursor(*args, **kwargs):
+        yield table
+
+    with mock.patch.object(jobs, 'execute_query', table.execute_query), \
+            mock.patch.object(jobs, 'execute_prepared', table.execute_prepared), \
+            mock.patch.object(jobs, 'cursor', fake_cursor), \
+            mock.patch.object(jobs.time, 'monotonic', lambda: table.now):
+        yield table
+
+
+def test_claims_highest_priority_first_and_completes(table):
+    low, high = table.add('a', priority=1), table.add('b', priority=5)
+    queue = jobs.JobQueue('test', lease_size=1)
+    claimed = []
+    for job in queue.jobs():
+        claimed.append(job['id'])
+        queue.complete([job['id']])
+    assert claimed == [high, low]
+    assert table.status(low) == table.status(high) == 'done'
+    assert queue.claim() == []
+
+
+def test_expired_lease_is_claimed_again_until_max_attempts(table):
+    job_id = table.add('a')
+    queue = jobs.JobQueue('test', visibility_timeout=10, max_attempts=2)
+    assert [job['id'] for job in queue.claim()] == [job_id]
+    table.now = 5
+    assert queue.claim() == []  # still leased
+    table.now = 11
+    assert [job['attempts'] for job in queue.claim()] == [2]
+    table.now = 22
+    assert queue.claim() == []
+    assert table.status(job_id) == 'failed'
+    assert table.rows[job_id]['last_error'] == 'lease expired'
+
+
+def test_failed_job_is_retried_until_max_attempts(table):
+    job_id = table.add('a')
+    queue = jobs.JobQueue('test', max_attempts=2)
+    queue.fail(queue.claim()[0], ValueError("boom"))
+    assert table.status(job_id) == 'pending'
+    queue.fail(queue.claim()[0], ValueError("boom"))
+    assert table.status(job_id) == 'failed'
+    assert queue.claim() == []
+
+
+def test_keep_alive_extends_an_expiring_lease(table):
+    job_id = table.add('a')
+    queue = jobs.JobQueue('test', visibility_timeout=100)
+    job = queue.claim()[0]
+    table.now = 50
+    assert not queue.keep_alive(job, margin=0.25)
+    table.now = 80
+    assert queue.keep_alive(job, margin=0.25)
+    assert table.rows[job_id]['leased_until'] == 180
+    # The lease clock restarts from the extension
+    table.now = 120
+    assert not queue.expiring(job, margin=0.25)
+    assert queue.claim() == []
+
+
+def test_lost_status_update_raises(table):
+    table.add('a')
+    queue = jobs.JobQueue('test')
+    job = queue.claim()[0]
+    with mock.patch.object(table, 'execute', side_effect=RuntimeError("connection lost")):
+        with pytest.raises(RuntimeError):
+            queue.complete([job['id']])
+    assert table.status(job['id']) == 'running'
@@ -0,0 +1,65 @@
+import itertools
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from sentiment import pipeline  # noqa: E402
+
+
+class FakeScorer:
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def predict(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise ValueError("inference failed")
+        return [("Neutral", 0.5)] * len(texts), {'inferred': len(texts)}
+
+
+def chunks(count=None, rows=3):
+    numbers = range(count) if count is not None else itertools.count()
+    for number in numbers:
+        yield pd.DataFrame({'post_text': [f"post {number}-{i} $AAPL https://x.y" for i in range(rows)]})
+
+
+def test_every_chunk_is_scored_and_written_in_order():
+    written = []
+    stats = pipeline.run_pipeline(chunks(5), FakeScorer(), lambda df, number: written.append((number, df)),
+                                  queue_depth=1)
+    assert [number for number, _ in written] == list(range(5))
+    assert (stats['rows'], stats['chunks'], stats['inferred']) == (15, 5, 15)
+    df = written[0][1]
+    assert list(df['sentiment_label']) == ["Neutral"] * 3
+    assert "https" not in df['cleaned_text'].iloc[0]
+
+
+def test_failing_stage_stops_the_reader_and_raises():
+    # An endless reader: run_pipeline only returns if the failure reaches it
+    written = []
+    with pytest.raises(ValueError, match="inference failed"):
+        pipeline.run_pipeline(chunks(), FakeScorer(fail_at=3), lambda df, number: written.append(number),
+                              queue_depth=1)
+    # Chunks scored before the failure may or may not reach the writer, later ones never do
+    assert written in ([], [0], [0, 1])
+
+
+def test_failing_writer_raises():
+    def write(df, number):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        pipeline.run_pipeline(chunks(), FakeScorer(), write, queue_depth=1)
+
+
+def test_failing_reader_stops_the_stages_and_raises():
+    def reader():
+        yield from chunks(2)
+        raise KeyError("post_text")
+
+    written = []
+    with pytest.raises(KeyError):
+        pipeline.run_pipeline(reader(), FakeScorer(), lambda df, number: written.append(number))
+    assert written in ([], [0], [0, 1])
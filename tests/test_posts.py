@@ -0,0 +1,145 @@
+from datetime import datetime
+from unittest import mock
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from config import posts  # noqa: E402
+
+COLUMNS = posts.POST_COLUMNS
+
+
+def post(post_id, **fields):
+    return dict({
+        'symbol': 'AAPL', 'post_id': post_id, 'post_author': 'someone',
+        'post_date': datetime(2024, 1, 1), 'post_text': 'text',
+    }, **fields)
+
+
+class FakeTable:
+    """stocktwits_posts for INSERT_POSTS_SQL: a NULL in a NOT NULL column fails the whole statement."""
+
+    def __init__(self, reachable=True):
+        self.reachable = reachable
+        self.rows = {}
+        self.statements = 0
+
+    def execute_values_query(self, query, rows, *args, **kwargs):
+        self.statements += 1
+        if not self.reachable:
+            return None
+        rows = [dict(zip(COLUMNS, row)) for row in rows]
+        if any(row[column] is None for row in rows for column in posts.REQUIRED_COLUMNS):
+            return None
+        new = [row for row in rows if (row['post_id'], row['symbol']) not in self.rows]
+        for row in new:
+            self.rows[(row['post_id'], row['symbol'])] = row
+        return [{'post_id': row['post_id']} for row in new]
+
+    def execute_query(self, query, params=None):
+        return [{'?column?': 1}] if self.reachable else None
+
+
+@pytest.fixture
+def table():
+    table = FakeTable()
+    with mock.patch.object(posts, 'execute_values_query', table.execute_values_query), \
+            mock.patch.object(posts, 'execute_query', table.execute_query):
+        yield table
+
+
+def test_null_post_date_is_dropped_on_add(table):
+    with posts.PostWriter(batch_size=10) as writer:
+        writer.add(post(1))
+        writer.add(post(2, post_date=None))
+        writer.add(post(3))
+    assert sorted(table.rows) == [(1, 'AAPL'), (3, 'AAPL')]
+    assert (writer.inserted, writer.duplicates, writer.rejected) == (2, 0, 1)
+
+
+def test_rejected_row_does_not_block_its_batch(table):
+    writer = posts.PostWriter(batch_size=10)
+    # Bypasses add(), like a row the database rejects for a reason add() does not check
+    writer.rows = [tuple(p.get(c) for c in COLUMNS) for p in (post(1), post(2, post_date=None), post(1))]
+    assert writer.flush() == 1
+    writer.close()
+    assert sorted(table.rows) == [(1, 'AAPL')]
+    assert (writer.inserted, writer.duplicates, writer.rejected) == (1, 1, 1)
+    assert writer.rows == []
+
+
+def test_rows_are_kept_while_the_database_is_down(table):
+    table.reachable = False
+    writer = posts.PostWriter(batch_size=10)
+    writer.add(post(1))
+    assert writer.flush() == 0
+    assert len(writer.rows) == 1
+    table.reachable = True
+    writer.close()
+    assert sorted(table.rows) == [(1, 'AAPL')]
+
+
+def test_close_raises_when_rows_cannot_be_written(table):
+    table.reachable = False
+    writer = posts.PostWriter(batch_size=10)
+    writer.add(post(1))
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+
+class FakeStream:
+    """The stored ids of one symbol, as RECENT_POSTS_SQL and the 'existing_posts' lookup see them."""
+
+    def __init__(self, stored):
+        self.stored = sorted(stored, reverse=True)
+        self.lookups = []
+
+    def known_posts(self, limit=3, stop_after=2):
+        recent = [{'post_id': post_id, 'post_date': datetime(2024, 1, 1)} for post_id in self.stored[:limit]]
+        with mock.patch.object(posts, 'execute_query', return_value=recent):
+            return posts.KnownPosts('AAPL', limit=limit, stop_after=stop_after)
+
+    def execute_prepared(self, name, params):
+        symbol, post_ids = params
+        self.lookups.append(post_ids)
+        return [{'post_id': post_id} for post_id in post_ids if post_id in self.stored]
+
+
+@pytest.fixture
+def stream():
+    stream = FakeStream([10, 20, 30, 40, 50])
+    with mock.patch.object(posts, 'execute_prepared', stream.execute_prepared):
+        yield stream
+
+
+def test_filter_new_keeps_stream_order_and_checks_older_ids_in_the_database(stream):
+    known = stream.known_posts(limit=3)
+    assert (known.newest_id, known.floor) == (50, 30)
+    assert known.filter_new(['60', 50, 25, 20, 5]) == [60, 25, 5]
+    assert stream.lookups == [[25, 20, 5]]
+    # Ids seen earlier in this crawl count as known on the next page
+    assert known.filter_new([60, 25]) == []
+
+
+def test_small_symbol_needs_no_database_lookup(stream):
+    known = stream.known_posts(limit=10)
+    assert known.floor is None
+    assert known.filter_new([60, 20, 5]) == [60, 5]
+    assert stream.lookups == []
+
+
+def test_caught_up_after_consecutive_known_messages(stream):
+    known = stream.known_posts(stop_after=2)
+    known.filter_new([60, 50])
+    assert not known.caught_up
+    known.filter_new([45, 40])
+    assert not known.caught_up  # the new 45 reset the streak
+    known.filter_new([30])
+    assert known.caught_up
+
+
+def test_caught_up_is_off_when_early_stop_is_disabled(stream):
+    known = stream.known_posts(stop_after=0)
+    known.filter_new([50, 40, 30])
+    assert not known.caught_up
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from sentiment import rollups  # noqa: E402
+from sentiment.storage import append_partitioned  # noqa: E402
+
+
+def scored(rows):
+    return pd.DataFrame(rows, columns=['post_date', 'symbol', 'sentiment_label', 'confidence'])
+
+
+POSTS = scored([
+    (datetime(2024, 1, 1, 9, 10), 'AAPL', 'Bullish', 0.9),
+    (datetime(2024, 1, 1, 9, 50), 'AAPL', 'Bearish', 0.6),
+    (datetime(2024, 1, 1, 15, 0), 'AAPL', 'neutral', 0.5),
+    (datetime(2024, 1, 1, 9, 30), 'TSLA', 'positive', 0.8),
+    (datetime(2024, 1, 1, 9, 40), 'TSLA', None, 0.7),
+])
+
+
+def bucket(rollup, granularity, symbol, start):
+    row = rollup[(rollup['granularity'] == granularity) & (rollup['symbol'] == symbol)
+                 & (rollup['bucket'] == pd.Timestamp(start))]
+    assert len(row) == 1
+    return row.iloc[0]
+
+
+def test_aggregate_sums_per_bucket_and_symbol():
+    rollup = rollups.aggregate(POSTS)
+    hour = bucket(rollup, 'hour', 'AAPL', '2024-01-01 09:00')
+    assert (hour.posts, hour.bullish, hour.bearish, hour.neutral) == (2, 1, 1, 0)
+    assert hour.sentiment_sum == 0
+    assert hour.confidence_sum == pytest.approx(1.5)
+    assert hour.weighted_sum == pytest.approx(0.9 - 0.6)
+    day = bucket(rollup, 'day', 'AAPL', '2024-01-01')
+    assert (day.posts, day.bullish, day.bearish, day.neutral) == (3, 1, 1, 1)
+
+
+def test_aggregate_all_symbols_bucket():
+    day = bucket(rollups.aggregate(POSTS), 'day', rollups.ALL_SYMBOLS, '2024-01-01')
+    assert (day.posts, day.bullish, day.bearish, day.neutral) == (5, 2, 1, 1)
+    assert day.sentiment_sum == 1
+
+
+def test_unlabelled_post_counts_as_volume_only():
+    hour = bucket(rollups.aggregate(POSTS), 'hour', 'TSLA', '2024-01-01 09:00')
+    assert (hour.posts, hour.bullish, hour.bearish, hour.neutral) == (2, 1, 0, 0)
+    # Its confidence stays out of the sums the ratios divide by
+    assert hour.confidence_sum == pytest.approx(0.8)
+    assert hour.weighted_sum == pytest.approx(0.8)
+
+
+def test_chunks_add_up_to_the_whole():
+    whole = rollups.aggregate(POSTS).groupby(['granularity', 'bucket', 'symbol'])[rollups.ROLLUP_COLUMNS].sum()
+    parts = pd.concat([rollups.aggregate(POSTS.iloc[:2]), rollups.aggregate(POSTS.iloc[2:])])
+    parts = parts.groupby(['granularity', 'bucket', 'symbol'])[rollups.ROLLUP_COLUMNS].sum()
+    pd.testing.assert_frame_equal(whole.sort_index(), parts.sort_index())
+
+
+class FakeCursor:
+    def __init__(self, pending_part=None):
+        self.statements = []
+        self.upserted = []
+        self.pending_part = pending_part
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+
+    def fetchone(self):
+        return {'pending_part': self.pending_part}
+
+
+def test_rebuild_runs_in_one_locked_transaction_without_the_pending_chunk(tmp_path):
+    root = str(tmp_path / "model=m")
+    append_partitioned(POSTS.iloc[:3], root, "part-000000000001")
+    append_partitioned(POSTS.iloc[3:], root, "part-000000000004")
+    cur = FakeCursor(pending_part="part-000000000004")
+    transactions = []
+
+    @contextmanager
+    def fake_cursor(*args, **kwargs):
+        transactions.append(cur)
+        yield cur
+
+    def execute_values(cur, query, rows, page_size=None):
+        cur.upserted.extend(rows)
+
+    with mock.patch.object(rollups, 'cursor', fake_cursor), \
+            mock.patch.object(rollups, 'execute_values', execute_values):
+        assert rollups.rebuild('m', root=root, chunk_rows=2) == 3
+    assert len(transactions) == 1
+    assert cur.statements == [rollups.LOCK_ROLLUPS_SQL, rollups.LOCK_WATERMARK_SQL, rollups.DELETE_ROLLUPS_SQL]
+    assert {row[3] for row in cur.upserted} == {'AAPL', rollups.ALL_SYMBOLS}
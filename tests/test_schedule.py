@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+from config import schedule  # noqa: E402
+
+NOW = datetime(2024, 1, 1, 12)
+
+
+@pytest.fixture(autouse=True)
+def settings():
+    with mock.patch.multiple(schedule, SCHEDULE_TARGET_POSTS=30, SCHEDULE_MIN_INTERVAL=300,
+                             SCHEDULE_MAX_INTERVAL=86400, SCHEDULE_ALPHA=0.5, SCHEDULE_MIN_CRAWL_SECONDS=5):
+        yield
+
+
+def test_interval_gives_the_target_posts_within_bounds():
+    assert schedule.interval_seconds(30) == 3600
+    assert schedule.interval_seconds(10_000) == 300
+    assert schedule.interval_seconds(0.01) == 86400
+    assert schedule.interval_seconds(0) == 86400
+
+
+def schedule_row(**fields):
+    return dict({'symbol': 'AAPL', 'velocity': 10.0, 'crawl_seconds': 20.0, 'new_posts': 5.0, 'crawls': 3,
+                 'last_crawl_at': NOW - timedelta(hours=2), 'now': NOW}, **fields)
+
+
+def test_priority_is_expected_posts_per_crawl_second():
+    assert schedule.priority(schedule_row()) == pytest.approx(10 * 2 / 20)
+    # Very short crawls are not taken at face value
+    assert schedule.priority(schedule_row(crawl_seconds=0.1)) == pytest.approx(10 * 2 / 5)
+    assert schedule.priority(schedule_row(crawls=0, last_crawl_at=None)) == float('inf')
+
+
+def test_due_symbols_best_first():
+    rows = [schedule_row(symbol='SLOW', velocity=1.0), schedule_row(symbol='NEW', crawls=0, last_crawl_at=None),
+            schedule_row(symbol='FAST', velocity=100.0)]
+    with mock.patch.object(schedule, 'execute_query', return_value=rows):
+        assert [symbol for symbol, _ in schedule.due_symbols(limit=0)] == ['NEW', 'FAST', 'SLOW']
+        assert [symbol for symbol, _ in schedule.due_symbols(limit=2)] == ['NEW', 'FAST']
+
+
+class FakeCursor:
+    def __init__(self, row, recent_per_hour=0):
+        self.row = row
+        self.recent_per_hour = recent_per_hour
+        self.result = None
+        self.update = None
+
+    def execute(self, query, params=None):
+        if query == schedule.LOCK_SYMBOL_SQL:
+            self.result = self.row
+        elif query == schedule.RECENT_RATE_SQL:
+            self.result = {'per_hour': self.recent_per_hour}
+        elif query == schedule.UPDATE_SCHEDULE_SQL:
+            self.update = params
+        else:
+            raise AssertionError(query)
+
+    def fetchone(self):
+        return self.result
+
+
+def record(cur, *args):
+    @contextmanager
+    def fake_cursor(*a, **kw):
+        yield cur
+
+    with mock.patch.object(schedule, 'cursor', fake_cursor):
+        return schedule.record_crawl('AAPL', *args)
+
+
+def test_record_crawl_smooths_velocity_and_crawl_time():
+    cur = FakeCursor(schedule_row())
+    plan = record(cur, 40, 30.0, True)
+    # 40 posts in the 2 h since the last crawl: 20/h, averaged with the previous 10/h
+    assert plan['velocity'] == pytest.approx(15)
+    assert plan['crawl_seconds'] == pytest.approx(25)
+    assert plan['interval'] == pytest.approx(30 / 15 * 3600)
+    assert not plan['missed']
+    velocity, crawl_seconds, new_posts, missed, last_crawl_at, due_from, interval, symbol = cur.update
+    assert (new_posts, missed, last_crawl_at, due_from, symbol) == (22.5, 0, NOW, NOW, 'AAPL')
+
+
+def test_crawl_that_did_not_catch_up_is_missed_and_keeps_the_observed_rate():
+    plan = record(FakeCursor(schedule_row()), 40, 30.0, False)
+    assert plan['missed']
+    assert plan['velocity'] == pytest.approx(20)
+
+
+def test_first_crawl_uses_the_stored_post_rate():
+    cur = FakeCursor(schedule_row(crawls=0, last_crawl_at=None, velocity=0.0), recent_per_hour=60)
+    plan = record(cur, 500, 12.0, False)
+    assert (plan['velocity'], plan['crawl_seconds'], plan['missed']) == (60, 12.0, False)
+    assert plan['interval'] == 1800
+
+
+def test_unknown_symbol_is_not_scheduled():
+    assert record(FakeCursor(None), 10, 5.0, True) is None
@@ -0,0 +1,74 @@
+from datetime import datetime
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from sentiment.terms import TermCounts, tokenize  # noqa: E402
+
+
+def chunk(rows):
+    return pd.DataFrame(rows, columns=['cleaned_text', 'sentiment_label', 'symbol', 'post_date'])
+
+
+DAY = datetime(2024, 1, 1, 10)
+
+FIRST = chunk([
+    ("Apple's earnings beat, calls calls", 'BULLISH', 'AAPL', DAY),
+    ("earnings miss puts 2024", 'BEARISH', 'AAPL', DAY),
+])
+SECOND = chunk([
+    ("calls on tesla", 'BULLISH', 'TSLA', datetime(2024, 1, 2, 9)),
+    ("earnings", 'BULLISH', 'AAPL', datetime(2024, 1, 1, 23)),
+])
+
+
+def test_tokenize_drops_stopwords_digits_and_possessives():
+    tokens = tokenize(pd.Series(["Apple's calls ON 2024 a", None]), stopwords={'on'})
+    assert tokens.tolist() == ['apple', 'calls']
+    assert tokens.index.tolist() == [0, 0]
+
+
+def test_add_counts_per_label_symbol_and_day():
+    counts = TermCounts(stopwords={'on'})
+    assert counts.add(FIRST) == 8
+    assert counts.add(SECOND) == 3
+    assert counts.add(chunk([("a 1", 'BULLISH', 'AAPL', DAY)])) == 0
+    assert counts.term_totals(label='BULLISH').to_dict() == {'apple': 1, 'earnings': 2, 'beat': 1, 'calls': 3, 'tesla': 1}
+    assert counts.term_totals(symbols=['AAPL'], start='2024-01-01', end='2024-01-02')['earnings'] == 3
+    assert counts.top_terms(2).to_dict() == {'earnings': 3, 'calls': 3}
+
+
+def test_merge_remaps_term_ids():
+    first, second = TermCounts(), TermCounts()
+    first.add(FIRST)
+    second.add(SECOND)
+    assert first.terms[0] != second.terms[0]
+    both = TermCounts()
+    both.add(FIRST)
+    both.add(SECOND)
+    merged = first.merge(second)
+    assert merged.term_totals().sort_index().to_dict() == both.term_totals().sort_index().to_dict()
+    # Merging an empty run changes nothing
+    assert merged.merge(TermCounts()).term_totals().sum() == both.term_totals().sum()
+
+
+def test_save_load_round_trip(tmp_path):
+    counts = TermCounts()
+    counts.add(FIRST)
+    counts.add(SECOND)
+    path = str(tmp_path / "terms" / "term_counts.parquet")
+    counts.save(path)
+    loaded = TermCounts.load(path)
+    assert loaded.terms == counts.terms
+    pd.testing.assert_series_equal(loaded.counts.sort_index(), counts.counts.sort_index(), check_index_type=False)
+    # New terms after a load get ids past the saved vocabulary
+    loaded.add(chunk([("fresh calls", 'BULLISH', 'AAPL', DAY)]))
+    assert loaded.term_totals(label='BULLISH')[['fresh', 'calls']].tolist() == [1, 4]
+
+
+def test_save_load_empty_counts(tmp_path):
+    path = str(tmp_path / "term_counts.parquet")
+    TermCounts().save(path)
+    assert TermCounts.load(path).term_totals().empty
+    assert TermCounts.load(str(tmp_path / "missing.parquet")).terms == []